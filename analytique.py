@@ -0,0 +1,225 @@
+"""
+Analyse sectorielle - Smart Business Directory
+Agrégats d'un secteur NAF calculés en flux, en une seule passe
+
+Les enregistrements arrivent par lots (pages data.gouv, curseur SQLite,
+partitions Parquet du pipeline) et ne sont jamais conservés :
+- histogramme exact du Score Santé IA (101 compteurs), dont se déduisent
+  statuts et quantiles ;
+- comptage par tranche d'effectif ;
+- total et quantiles des établissements ouverts via un sketch à erreur
+  relative bornée (type DDSketch).
+Tous les agrégats sont fusionnables : des lots traités séparément (workers,
+partitions) se combinent par `fusionner`.
+"""
+
+import math
+import os
+from collections import Counter
+from typing import Optional, Dict, Any, Iterable, Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ia_model import calculer_scores_vectorises, EFFECTIF_SCORES
+from resultats import Statut, LIBELLES_STATUT
+
+
+# Répertoire Parquet produit par pipeline_sirene.py (source optionnelle)
+SBD_STOCK_SCORE = os.getenv("SBD_STOCK_SCORE")
+
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+# Plages de score [début, fin) des bandes de interpreter_score
+BORNES_STATUT = {Statut.FRAGILE: (0, 40), Statut.MOYENNE: (40, 60), Statut.BONNE: (60, 80), Statut.EXCELLENTE: (80, 101)}
+
+
+class SketchQuantiles:
+    """
+    Quantiles approchés à erreur relative `precision` sur des valeurs >= 0.
+
+    Chaque valeur x > 0 tombe dans le seau ceil(log_gamma(x)) ; deux sketches
+    de même précision se fusionnent en additionnant leurs seaux.
+    """
+
+    def __init__(self, precision: float = 0.01):
+        self.precision = precision
+        self.gamma = (1 + precision) / (1 - precision)
+        self._log_gamma = math.log(self.gamma)
+        self.seaux: Counter = Counter()
+        self.nb_zeros = 0
+        self.n = 0
+
+    def ajouter_lot(self, valeurs: np.ndarray):
+        valeurs = np.asarray(valeurs, dtype=np.float64)
+        valeurs = valeurs[~np.isnan(valeurs)]
+        positives = valeurs[valeurs > 0]
+
+        self.nb_zeros += len(valeurs) - len(positives)
+        self.n += len(valeurs)
+        if len(positives):
+            indices, comptes = np.unique(np.ceil(np.log(positives) / self._log_gamma).astype(np.int64), return_counts=True)
+            self.seaux.update(dict(zip(indices.tolist(), comptes.tolist())))
+
+    def fusionner(self, autre: "SketchQuantiles"):
+        if autre.precision != self.precision:
+            raise ValueError("Sketches de précisions différentes")
+        self.seaux.update(autre.seaux)
+        self.nb_zeros += autre.nb_zeros
+        self.n += autre.n
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.n == 0:
+            return None
+        rang = q * (self.n - 1)
+        if rang < self.nb_zeros:
+            return 0.0
+
+        cumul = self.nb_zeros
+        for indice in sorted(self.seaux):
+            cumul += self.seaux[indice]
+            if cumul > rang:
+                return 2 * self.gamma ** indice / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.seaux) / (self.gamma + 1)
+
+
+class AgregatsSecteur:
+    """Agrégats incrémentaux d'un secteur : `ajouter_lot` par lot, `resume` à tout moment"""
+
+    def __init__(self, precision: float = 0.01):
+        self.histogramme = np.zeros(101, dtype=np.int64)
+        self.tranches: Counter = Counter()
+        self.etablissements = SketchQuantiles(precision)
+        self.total_etablissements = 0
+        self.nb_sans_etablissements = 0
+
+    @property
+    def n(self) -> int:
+        return int(self.histogramme.sum())
+
+    def ajouter_lot(self, scores, tranches, nb_etab):
+        """Ajoute un lot (tableaux de même longueur) ; nb_etab manquant = NaN / None"""
+        scores = np.asarray(scores, dtype=np.uint8)
+        nb_etab = pd.to_numeric(pd.Series(nb_etab, copy=False), errors="coerce").to_numpy(np.float64)
+
+        self.histogramme += np.bincount(scores, minlength=101)
+        self.tranches.update(pd.Series(tranches, copy=False).astype(object).fillna("NN").astype(str).value_counts().to_dict())
+        self.etablissements.ajouter_lot(nb_etab)
+        self.total_etablissements += int(np.nansum(nb_etab))
+        self.nb_sans_etablissements += int(np.isnan(nb_etab).sum())
+
+    def fusionner(self, autre: "AgregatsSecteur"):
+        self.histogramme += autre.histogramme
+        self.tranches.update(autre.tranches)
+        self.etablissements.fusionner(autre.etablissements)
+        self.total_etablissements += autre.total_etablissements
+        self.nb_sans_etablissements += autre.nb_sans_etablissements
+
+    def quantile_score(self, q: float) -> Optional[int]:
+        """Quantile exact du score, lu sur l'histogramme"""
+        n = self.n
+        if n == 0:
+            return None
+        return int(np.searchsorted(np.cumsum(self.histogramme), q * (n - 1), side="right"))
+
+    def histogramme_par_tranche(self, largeur: int = 10) -> pd.Series:
+        bornes = list(range(0, 101, largeur))
+        comptes = np.add.reduceat(self.histogramme, bornes)
+        libelles = [f"{b}-{min(b + largeur - 1, 100)}" for b in bornes]
+        libelles[-1] = f"{bornes[-1]}-100"
+        return pd.Series(comptes, index=libelles, name="Entreprises")
+
+    def comptes_statut(self) -> pd.Series:
+        comptes = {
+            LIBELLES_STATUT[statut]: int(self.histogramme[debut:fin].sum())
+            for statut, (debut, fin) in BORNES_STATUT.items()
+        }
+        return pd.Series(comptes, name="Entreprises").reindex(LIBELLES_STATUT)
+
+    def comptes_tranche(self) -> pd.Series:
+        # Ordre de la nomenclature INSEE, tranches inconnues à la fin
+        ordre = [t for t in EFFECTIF_SCORES if t in self.tranches]
+        ordre += sorted(t for t in self.tranches if t not in EFFECTIF_SCORES)
+        return pd.Series({t: self.tranches[t] for t in ordre}, name="Entreprises", dtype=np.int64)
+
+    def resume(self) -> Dict[str, Any]:
+        n = self.n
+        return {
+            "entreprises": n,
+            "score_moyen": float(np.dot(np.arange(101), self.histogramme) / n) if n else None,
+            "quantiles_score": {q: self.quantile_score(q) for q in QUANTILES},
+            "total_etablissements": self.total_etablissements,
+            "quantiles_etablissements": {q: self.etablissements.quantile(q) for q in QUANTILES},
+            "sans_etablissements": self.nb_sans_etablissements,
+        }
+
+
+def agreger(lots: Iterable[Dict[str, Any]], agregats: Optional[AgregatsSecteur] = None) -> AgregatsSecteur:
+    """Consomme un flux de lots {"score", "tranche_effectif", "nb_etab"} en une passe"""
+    agregats = agregats or AgregatsSecteur()
+    for lot in lots:
+        agregats.ajouter_lot(lot["score"], lot["tranche_effectif"], lot["nb_etab"])
+    return agregats
+
+
+# ================== SOURCES ==================
+
+def lots_datagouv(codes: Sequence[str], nombre: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Pages recherche-entreprises des sous-classes `codes`, scorées à la volée"""
+    from api_sirene import iterer_pages_naf_datagouv
+
+    for page in iterer_pages_naf_datagouv(",".join(codes), nombre):
+        if not page:
+            continue
+        tranches = [r.get("tranche_effectif_salarie") for r in page]
+        nb_etab = [r.get("nombre_etablissements_ouverts") for r in page]
+        yield {
+            "score": calculer_scores_vectorises(
+                [t or "00" for t in tranches], nb_etab, [r.get("activite_principale") for r in page]
+            ),
+            "tranche_effectif": tranches,
+            "nb_etab": nb_etab,
+        }
+
+
+def lots_base_locale(conn, codes: Sequence[str], taille_lot: int = 10_000) -> Iterator[Dict[str, Any]]:
+    """Secteur lu dans la base locale ; les scores absents sont recalculés"""
+    import base_locale
+
+    for lignes in base_locale.iterer_secteur(conn, codes, taille_lot):
+        tranches = [r["tranche_effectif"] for r in lignes]
+        nb_etab = [r["nb_etab"] for r in lignes]
+        scores = np.array([-1 if r["score"] is None else r["score"] for r in lignes], dtype=np.int16)
+
+        manquants = scores < 0
+        if manquants.any():
+            scores[manquants] = calculer_scores_vectorises(
+                [t or "00" for t, m in zip(tranches, manquants) if m],
+                np.asarray(nb_etab)[manquants],
+                [r["naf"] for r, m in zip(lignes, manquants) if m],
+            )
+        yield {"score": scores, "tranche_effectif": tranches, "nb_etab": nb_etab}
+
+
+def lots_parquet(chemin: str, codes: Sequence[str], taille_lot: int = 500_000) -> Iterator[Dict[str, Any]]:
+    """Sortie de pipeline_sirene.py, lue par lots de colonnes (pip install pyarrow)"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    colonnes = ["naf", "score", "tranche_effectif", "nb_etablissements_ouverts"]
+    codes = pa.array(list(codes), type=pa.string())
+    for batch in ds.dataset(chemin, format="parquet").to_batches(columns=colonnes, batch_size=taille_lot):
+        naf_col = batch.column("naf")
+        if pa.types.is_dictionary(naf_col.type):
+            naf_col = naf_col.cast("string")
+        masque = pc.fill_null(pc.is_in(naf_col, value_set=codes), False)
+        if not pc.any(masque).as_py():
+            continue
+
+        batch = batch.filter(masque)
+        yield {
+            "score": batch.column("score").to_numpy(zero_copy_only=False),
+            "tranche_effectif": batch.column("tranche_effectif").to_pandas(),
+            "nb_etab": batch.column("nb_etablissements_ouverts").to_numpy(zero_copy_only=False),
+        }
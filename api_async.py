@@ -0,0 +1,301 @@
+"""
+Client asynchrone - Smart Business Directory
+Appels INSEE / data.gouv en asyncio, pour les recherches à fort fan-out
+
+Même surface que api_sirene (call_insee, search_entreprises_by_name,
+search_by_naf, enrichir_par_datagouv), en coroutines de ClientAsync :
+- une session aiohttp (pool de connexions) par client, pas de thread par requête ;
+- concurrence bornée par API (sémaphores) ; disjoncteurs et limiteurs de débit
+  partagés avec api_sirene : les quotas restent globaux au processus, si bien
+  que le débit réel est celui du limiteur (data.gouv : DATAGOUV_QUOTA_PAR_SECONDE), quel que soit
+  le nombre de requêtes simultanées ;
+- échéance : les requêtes encore en vol sont annulées.
+Les fonctions synchrones du même nom exécutent ces coroutines sur une boucle
+de fond unique, pour le code UI et les jobs existants.
+
+Les URL de base sont injectables (serveur de test asyncio local).
+Dépendance optionnelle : pip install aiohttp
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, List, Sequence, Iterable, Callable, Awaitable, Tuple
+
+import aiohttp
+import requests
+
+from api_sirene import (
+    CHAMPS_UNITE_LEGALE,
+    DISJONCTEUR_INSEE,
+    DISJONCTEUR_DATAGOUV,
+    LIMITEUR_INSEE,
+    LIMITEUR_DATAGOUV,
+    INSEE_BASE_URL,
+    RECHERCHE_ENTREPRISES_URL,
+    Disjoncteur,
+    DisjoncteurOuvert,
+    LimiteurDebit,
+    charger_json,
+    entetes_insee,
+    enrichissement_de_repli,
+    memoriser_enrichissement,
+    params_recherche_nom,
+    projection,
+    requete_insee_naf,
+)
+from nomenclature_naf import developper
+
+
+# Requêtes simultanées par API (le débit reste plafonné par les limiteurs)
+CONCURRENCE_INSEE = int(os.getenv("SBD_CONCURRENCE_INSEE", "8"))
+CONCURRENCE_DATAGOUV = int(os.getenv("SBD_CONCURRENCE_DATAGOUV", "32"))
+
+TAILLE_POOL = 100
+
+
+class ErreurHTTP(requests.HTTPError):
+    """Réponse amont en erreur : requests.HTTPError avec une réponse portant le statut"""
+
+    def __init__(self, status: int, url: str):
+        self.status = status
+        reponse = requests.Response()
+        reponse.status_code = status
+        reponse.url = url
+        super().__init__(f"{status} pour {url}", response=reponse)
+
+
+async def acquerir_jeton(limiteur: LimiteurDebit):
+    """Jeton du limiteur partagé, sans bloquer la boucle"""
+    while not limiteur.acquerir(bloquant=False):
+        await asyncio.sleep(1 / limiteur.taux)
+
+
+class ApiAmont:
+    """Disjoncteur, limiteur et sémaphore d'une API"""
+
+    def __init__(self, url: str, disjoncteur: Disjoncteur, limiteur: Optional[LimiteurDebit], concurrence: int):
+        self.url = url.rstrip("/")
+        self.disjoncteur = disjoncteur
+        self.limiteur = limiteur
+        self.concurrence = concurrence
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+    def ouvrir(self):
+        # Créé dans la boucle qui l'utilise (Python 3.9 lie le sémaphore à la boucle courante)
+        self.semaphore = asyncio.Semaphore(self.concurrence)
+
+
+class ClientAsync:
+    """
+    Usage :
+        async with ClientAsync() as client:
+            infos = await client.enrichir_lot(sirens, echeance=5)
+    """
+
+    def __init__(
+        self,
+        insee: Optional[ApiAmont] = None,
+        datagouv: Optional[ApiAmont] = None,
+        taille_pool: int = TAILLE_POOL,
+    ):
+        self.insee = insee or ApiAmont(INSEE_BASE_URL, DISJONCTEUR_INSEE, LIMITEUR_INSEE, CONCURRENCE_INSEE)
+        self.datagouv = datagouv or ApiAmont(RECHERCHE_ENTREPRISES_URL, DISJONCTEUR_DATAGOUV, LIMITEUR_DATAGOUV, CONCURRENCE_DATAGOUV)
+        self.taille_pool = taille_pool
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def ouvrir(self):
+        self.insee.ouvrir()
+        self.datagouv.ouvrir()
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.taille_pool))
+
+    async def fermer(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self) -> "ClientAsync":
+        await self.ouvrir()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.fermer()
+
+    async def _get(
+        self,
+        api: ApiAmont,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 15,
+    ) -> Tuple[int, bytes]:
+        """Équivalent de requete_protegee : 429, 5xx et erreurs réseau comptent comme échecs"""
+        async with api.semaphore:
+            api.disjoncteur.autoriser()
+            debut = time.monotonic()
+            try:
+                if api.limiteur is not None:
+                    await acquerir_jeton(api.limiteur)
+                debut = time.monotonic()
+                async with self.session.get(
+                    url,
+                    params={k: v for k, v in (params or {}).items() if v is not None},
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                ) as resp:
+                    status, contenu = resp.status, await resp.read()
+            except asyncio.CancelledError:
+                # Échéance de l'appelant, pas une défaillance de l'API
+                api.disjoncteur.abandonner()
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                api.disjoncteur.enregistrer(False, time.monotonic() - debut)
+                raise
+
+        api.disjoncteur.enregistrer(status != 429 and status < 500, time.monotonic() - debut)
+        return status, contenu
+
+    # ---------- INSEE ----------
+
+    async def call_insee(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        url = f"{self.insee.url}/{path.lstrip('/')}"
+        status, contenu = await self._get(self.insee, url, params=params, headers=entetes_insee())
+        if status >= 400:
+            raise ErreurHTTP(status, url)
+        return charger_json(contenu)
+
+    async def search_by_naf(self, naf: str, nombre: int = 10, champs: Optional[Sequence[str]] = CHAMPS_UNITE_LEGALE):
+        q = requete_insee_naf(developper(naf))
+        try:
+            return await self.call_insee("siren", params={"q": q, "nombre": nombre, **projection(champs)})
+        except ErreurHTTP as e:
+            if e.status == 404:
+                return {"unitesLegales": []}
+            raise
+
+    # ---------- data.gouv ----------
+
+    async def search_entreprises_by_name(
+        self,
+        texte: str,
+        max_results: int = 10,
+        tranche_effectif: str = None,
+        etab_min: int = None,
+        etab_max: int = None,
+        code_naf: str = None
+    ) -> List[Dict[str, Any]]:
+        results = []
+        page = 1
+
+        while len(results) < max_results:
+            params = params_recherche_nom(texte, page, tranche_effectif, etab_min, etab_max, code_naf)
+            status, contenu = await self._get(self.datagouv, self.datagouv.url, params=params)
+            if status >= 400:
+                raise ErreurHTTP(status, self.datagouv.url)
+
+            page_results = charger_json(contenu).get("results", [])
+            if not page_results:
+                break
+
+            results.extend(page_results)
+            page += 1
+
+        return results[:max_results]
+
+    async def enrichir_par_datagouv(self, siren: str) -> Optional[Dict[str, Any]]:
+        params = {"siren": siren, "per_page": 1, "minimal": "true"}
+
+        try:
+            status, contenu = await self._get(self.datagouv, self.datagouv.url, params=params, timeout=10)
+        except (DisjoncteurOuvert, aiohttp.ClientError, asyncio.TimeoutError):
+            return await asyncio.to_thread(enrichissement_de_repli, siren)
+
+        if status != 200:
+            return None
+
+        data = charger_json(contenu).get("results", [])
+        if not data:
+            return None
+
+        info = {
+            "tranche_effectif_salarie": data[0].get("tranche_effectif_salarie"),
+            "nombre_etablissements_ouverts": data[0].get("nombre_etablissements_ouverts"),
+        }
+        memoriser_enrichissement(siren, info)
+        return info
+
+    async def enrichir_lot(self, sirens: Iterable[str], echeance: Optional[float] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Enrichissements simultanés. À l'échéance, les requêtes en vol sont
+        annulées : seuls les SIREN déjà servis ont une valeur, les autres None.
+        """
+        sirens = list(dict.fromkeys(sirens))
+        taches = {asyncio.ensure_future(self.enrichir_par_datagouv(s)): s for s in sirens}
+        if not taches:
+            return {}
+
+        termines, en_vol = await asyncio.wait(taches, timeout=echeance)
+        for tache in en_vol:
+            tache.cancel()
+        await asyncio.gather(*en_vol, return_exceptions=True)
+
+        resultats: Dict[str, Optional[Dict[str, Any]]] = dict.fromkeys(sirens)
+        for tache in termines:
+            if tache.exception() is None:
+                resultats[taches[tache]] = tache.result()
+        return resultats
+
+
+# ================== ENVELOPPES SYNCHRONES ==================
+
+_boucle: Optional[asyncio.AbstractEventLoop] = None
+_client: Optional[ClientAsync] = None
+_verrou = threading.Lock()
+
+
+def _client_partage() -> Tuple[asyncio.AbstractEventLoop, ClientAsync]:
+    """Boucle de fond (un thread) et client partagés par le processus"""
+    global _boucle, _client
+    with _verrou:
+        if _boucle is None:
+            boucle = asyncio.new_event_loop()
+            threading.Thread(target=boucle.run_forever, name="sbd-async", daemon=True).start()
+            client = ClientAsync()
+            asyncio.run_coroutine_threadsafe(client.ouvrir(), boucle).result()
+            _boucle, _client = boucle, client
+    return _boucle, _client
+
+
+async def _avec_echeance(coroutine: Awaitable, echeance: Optional[float]):
+    return await asyncio.wait_for(coroutine, echeance)
+
+
+def executer(appel: Callable[[ClientAsync], Awaitable], echeance: Optional[float] = None):
+    """
+    Exécute `appel(client)` sur la boucle de fond depuis du code synchrone.
+    Au-delà de `echeance` secondes la coroutine est annulée (TimeoutError).
+    """
+    boucle, client = _client_partage()
+    return asyncio.run_coroutine_threadsafe(_avec_echeance(appel(client), echeance), boucle).result()
+
+
+def call_insee(path: str, params: Optional[Dict[str, Any]] = None, echeance: Optional[float] = None) -> Dict[str, Any]:
+    return executer(lambda client: client.call_insee(path, params), echeance)
+
+
+def search_by_naf(naf: str, nombre: int = 10, champs: Optional[Sequence[str]] = CHAMPS_UNITE_LEGALE, echeance: Optional[float] = None):
+    return executer(lambda client: client.search_by_naf(naf, nombre, champs), echeance)
+
+
+def search_entreprises_by_name(texte: str, max_results: int = 10, echeance: Optional[float] = None, **filtres) -> List[Dict[str, Any]]:
+    return executer(lambda client: client.search_entreprises_by_name(texte, max_results, **filtres), echeance)
+
+
+def enrichir_par_datagouv(siren: str, echeance: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    return executer(lambda client: client.enrichir_par_datagouv(siren), echeance)
+
+
+def enrichir_lot(sirens: Iterable[str], echeance: Optional[float] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+    # L'échéance est gérée par enrichir_lot lui-même : résultats partiels, pas d'exception
+    return executer(lambda client: client.enrichir_lot(sirens, echeance))
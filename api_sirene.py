@@ -0,0 +1,847 @@
+"""
+Clients API - Smart Business Directory
+Accès aux données officielles : API INSEE Sirene et recherche-entreprises (data.gouv)
+
+Module sans dépendance à Streamlit, partagé par l'application et les jobs batch
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date
+from typing import Optional, Dict, Any, Iterator, List, Sequence
+
+import requests
+from dotenv import load_dotenv
+
+from identifiants import valider_siren, valider_siret
+from nomenclature_naf import developper, motifs_couvrants, normaliser_code
+
+# Décodeur JSON rapide si disponible (pip install orjson), sinon module standard
+try:
+    import orjson
+
+    charger_json = orjson.loads
+except ImportError:
+    charger_json = json.loads
+
+
+# ================== CONFIG ==================
+
+load_dotenv()
+INSEE_API_KEY = os.getenv("INSEE_API_KEY")
+
+INSEE_BASE_URL = "https://api.insee.fr/api-sirene/3.11"
+RECHERCHE_ENTREPRISES_URL = "https://recherche-entreprises.api.gouv.fr/search"
+
+# Quotas publics : 30 requêtes/minute (INSEE), 7 requêtes/seconde (data.gouv)
+INSEE_QUOTA_PAR_MINUTE = int(os.getenv("INSEE_QUOTA_PAR_MINUTE", "30"))
+DATAGOUV_QUOTA_PAR_SECONDE = int(os.getenv("DATAGOUV_QUOTA_PAR_SECONDE", "7"))
+
+# Projection des champs INSEE : seuls les champs utilisés par l'application
+# (lecture, scoring, synchronisation) sont demandés via le paramètre `champs`
+CHAMPS_UNITE_LEGALE = (
+    "siren",
+    "denominationUniteLegale",
+    "nomUniteLegale",
+    "prenom1UniteLegale",
+    "activitePrincipaleUniteLegale",
+    "categorieJuridiqueUniteLegale",
+    "etatAdministratifUniteLegale",
+    "trancheEffectifsUniteLegale",
+    "dateDernierTraitementUniteLegale",
+)
+
+CHAMPS_ETABLISSEMENT = (
+    "siret",
+    "siren",
+    "activitePrincipaleEtablissement",
+    "etatAdministratifEtablissement",
+    "trancheEffectifsEtablissement",
+    "dateDernierTraitementEtablissement",
+)
+
+# Listing d'établissements : adresse, enseigne et champs de l'unité légale pour le scoring
+CHAMPS_ETABLISSEMENT_LISTE = CHAMPS_ETABLISSEMENT + (
+    "etablissementSiege",
+    "enseigne1Etablissement",
+    "codePostalEtablissement",
+    "libelleCommuneEtablissement",
+    "denominationUniteLegale",
+    "activitePrincipaleUniteLegale",
+    "trancheEffectifsUniteLegale",
+)
+
+# Taille de page maximale autorisée par l'API Sirene en pagination par curseur
+NOMBRE_PAR_PAGE_CURSEUR = 1000
+
+# SIREN par requête multicritère (longueur de l'URL)
+SIREN_PAR_REQUETE = 50
+
+# Requêtes INSEE dupliquées quand la réponse tarde (opt-in)
+SBD_HEDGING_INSEE = os.getenv("SBD_HEDGING_INSEE", "0") == "1"
+
+
+# ================== LIMITEUR DE DÉBIT ==================
+
+class LimiteurDebit:
+    """Seau à jetons partagé entre threads (UI et jobs de fond)"""
+
+    def __init__(self, nb_requetes: int, periode: float):
+        self.capacite = nb_requetes
+        self.taux = nb_requetes / periode
+        self.jetons = float(nb_requetes)
+        self.dernier = time.monotonic()
+        self.verrou = threading.Lock()
+
+    def _remplir(self):
+        maintenant = time.monotonic()
+        self.jetons = min(self.capacite, self.jetons + (maintenant - self.dernier) * self.taux)
+        self.dernier = maintenant
+
+    def acquerir(self, bloquant: bool = True) -> bool:
+        """Consomme un jeton ; attend s'il n'y en a plus (ou renvoie False si non bloquant)"""
+        while True:
+            with self.verrou:
+                self._remplir()
+                if self.jetons >= 1:
+                    self.jetons -= 1
+                    return True
+                if not bloquant:
+                    return False
+                attente = (1 - self.jetons) / self.taux
+            time.sleep(attente)
+
+
+LIMITEUR_INSEE = LimiteurDebit(INSEE_QUOTA_PAR_MINUTE, 60)
+LIMITEUR_DATAGOUV = LimiteurDebit(DATAGOUV_QUOTA_PAR_SECONDE, 1)
+
+
+# ================== DISJONCTEUR ==================
+
+class DisjoncteurOuvert(RuntimeError):
+    """Appel refusé immédiatement : l'API amont est considérée comme dégradée"""
+
+
+class Disjoncteur:
+    """
+    Disjoncteur par API amont : fermé -> ouvert -> semi-ouvert -> fermé.
+
+    S'ouvre quand, sur les derniers appels, le taux d'erreurs ou d'appels lents
+    dépasse son seuil. Ouvert, il refuse les appels sans attendre ; après
+    `duree_ouverture` secondes, un appel de test (semi-ouvert) décide de la
+    fermeture ou d'une nouvelle ouverture.
+    """
+
+    FERME = "fermé"
+    OUVERT = "ouvert"
+    SEMI_OUVERT = "semi-ouvert"
+
+    def __init__(
+        self,
+        nom: str,
+        taille_fenetre: int = 20,
+        min_appels: int = 5,
+        seuil_erreurs: float = 0.5,
+        seuil_latence: float = 5.0,
+        seuil_lents: float = 0.5,
+        duree_ouverture: float = 30.0,
+    ):
+        self.nom = nom
+        self.min_appels = min_appels
+        self.seuil_erreurs = seuil_erreurs
+        self.seuil_latence = seuil_latence
+        self.seuil_lents = seuil_lents
+        self.duree_ouverture = duree_ouverture
+        self.fenetre = deque(maxlen=taille_fenetre)
+        self.etat = self.FERME
+        self.ouvert_depuis = 0.0
+        self.test_en_cours = False
+        self.nb_refus = 0
+        self.verrou = threading.Lock()
+
+    def autoriser(self):
+        """Lève DisjoncteurOuvert si l'appel doit échouer immédiatement"""
+        with self.verrou:
+            if self.etat == self.OUVERT:
+                if time.monotonic() - self.ouvert_depuis < self.duree_ouverture:
+                    self.nb_refus += 1
+                    raise DisjoncteurOuvert(f"API {self.nom} indisponible (disjoncteur ouvert)")
+                self.etat = self.SEMI_OUVERT
+                self.test_en_cours = False
+
+            if self.etat == self.SEMI_OUVERT:
+                if self.test_en_cours:
+                    self.nb_refus += 1
+                    raise DisjoncteurOuvert(f"API {self.nom} en cours de test (disjoncteur semi-ouvert)")
+                self.test_en_cours = True
+
+    def enregistrer(self, succes: bool, duree: float):
+        with self.verrou:
+            if self.etat == self.SEMI_OUVERT:
+                if succes and duree < self.seuil_latence:
+                    self.etat = self.FERME
+                    self.fenetre.clear()
+                else:
+                    self._ouvrir()
+                return
+
+            self.fenetre.append((succes, duree))
+            n = len(self.fenetre)
+            if n < self.min_appels:
+                return
+
+            taux_erreurs = sum(1 for ok, _ in self.fenetre if not ok) / n
+            taux_lents = sum(1 for _, d in self.fenetre if d >= self.seuil_latence) / n
+            if taux_erreurs >= self.seuil_erreurs or taux_lents >= self.seuil_lents:
+                self._ouvrir()
+
+    def abandonner(self):
+        """Appel autorisé puis annulé avant sa réponse : libère l'appel de test"""
+        with self.verrou:
+            if self.etat == self.SEMI_OUVERT:
+                self.test_en_cours = False
+
+    def _ouvrir(self):
+        self.etat = self.OUVERT
+        self.ouvert_depuis = time.monotonic()
+        self.test_en_cours = False
+        self.fenetre.clear()
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self.verrou:
+            n = len(self.fenetre)
+            return {
+                "nom": self.nom,
+                "etat": self.etat,
+                "appels": n,
+                "taux_erreurs": sum(1 for ok, _ in self.fenetre if not ok) / n if n else 0.0,
+                "latence_moyenne": sum(d for _, d in self.fenetre) / n if n else 0.0,
+                "refus": self.nb_refus,
+            }
+
+
+DISJONCTEUR_INSEE = Disjoncteur("INSEE")
+DISJONCTEUR_DATAGOUV = Disjoncteur("data.gouv")
+
+
+def requete_protegee(disjoncteur: Disjoncteur, limiteur: Optional[LimiteurDebit], url: str, **kwargs) -> requests.Response:
+    """
+    GET protégé par disjoncteur et limiteur de débit.
+
+    Les erreurs réseau, 429 et 5xx comptent comme des échecs de l'API ;
+    les autres réponses (y compris 404) sont renvoyées telles quelles.
+    `limiteur=None` quand l'appelant a déjà obtenu l'autorisation du
+    disjoncteur puis le jeton de débit.
+    """
+    if limiteur is not None:
+        disjoncteur.autoriser()
+        limiteur.acquerir()
+
+    debut = time.monotonic()
+    try:
+        resp = requests.get(url, **kwargs)
+    except requests.RequestException:
+        disjoncteur.enregistrer(False, time.monotonic() - debut)
+        raise
+
+    succes = resp.status_code != 429 and resp.status_code < 500
+    disjoncteur.enregistrer(succes, time.monotonic() - debut)
+    return resp
+
+
+# ================== HEDGING ==================
+
+class PolitiqueHedging:
+    """
+    Duplication des GET idempotents lents.
+
+    Si la requête n'a pas répondu après un délai égal au percentile observé
+    des latences (p95 par défaut), une copie est envoyée et la première réponse
+    valide (2xx ou 404) l'emporte. Le taux de copies est plafonné et chaque
+    copie, une fois autorisée par le disjoncteur, consomme un jeton du
+    limiteur (sans attendre) : le quota n'est jamais dépassé.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        delai_initial: float = 1.0,
+        delai_min: float = 0.05,
+        taux_max: float = 0.05,
+        taille_fenetre: int = 500,
+        min_echantillons: int = 20,
+    ):
+        self.percentile = percentile
+        self.delai_initial = delai_initial
+        self.delai_min = delai_min
+        self.taux_max = taux_max
+        self.min_echantillons = min_echantillons
+        self.latences = deque(maxlen=taille_fenetre)
+        self.latences_servies = deque(maxlen=taille_fenetre)
+        self.nb_requetes = 0
+        self.nb_hedges = 0
+        self.nb_hedges_gagnants = 0
+        self.verrou = threading.Lock()
+
+    @staticmethod
+    def _quantile(valeurs, q: float) -> float:
+        triees = sorted(valeurs)
+        return triees[min(len(triees) - 1, int(q * len(triees)))]
+
+    def delai(self) -> float:
+        with self.verrou:
+            if len(self.latences) < self.min_echantillons:
+                return self.delai_initial
+            return max(self.delai_min, self._quantile(self.latences, self.percentile))
+
+    def reserver_hedge(self) -> bool:
+        """Vrai si une copie peut être envoyée sans dépasser le taux plafond"""
+        with self.verrou:
+            if self.nb_hedges + 1 > self.taux_max * self.nb_requetes:
+                return False
+            self.nb_hedges += 1
+            return True
+
+    def annuler_hedge(self):
+        """Réservation rendue : la copie n'a pas été envoyée (pas de jeton de débit)"""
+        with self.verrou:
+            self.nb_hedges -= 1
+
+    def enregistrer_latence(self, duree: float):
+        with self.verrou:
+            self.latences.append(duree)
+
+    def enregistrer_reponse(self, duree: float, hedge_gagnant: bool):
+        with self.verrou:
+            self.latences_servies.append(duree)
+            if hedge_gagnant:
+                self.nb_hedges_gagnants += 1
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self.verrou:
+            servies = list(self.latences_servies)
+            stats = {
+                "requetes": self.nb_requetes,
+                "hedges": self.nb_hedges,
+                "hedges_gagnants": self.nb_hedges_gagnants,
+                "taux_hedge": self.nb_hedges / self.nb_requetes if self.nb_requetes else 0.0,
+            }
+        stats["delai"] = self.delai()
+        for nom, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            stats[nom] = self._quantile(servies, q) if servies else 0.0
+        return stats
+
+
+HEDGING_INSEE = PolitiqueHedging()
+
+
+def reponse_valide(resp: requests.Response) -> bool:
+    """Réponse définitive d'une copie : 2xx, ou 404 (objet inexistant)"""
+    return resp.ok or resp.status_code == 404
+
+_executeur_hedging = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedging")
+
+
+def requete_avec_hedging(
+    politique: PolitiqueHedging,
+    disjoncteur: Disjoncteur,
+    limiteur: LimiteurDebit,
+    url: str,
+    **kwargs,
+) -> requests.Response:
+    """requete_protegee doublée d'une copie si la première réponse dépasse le délai adaptatif"""
+    with politique.verrou:
+        politique.nb_requetes += 1
+
+    debut = time.monotonic()
+
+    def lancer(limiteur_copie):
+        depart = time.monotonic()
+        future = _executeur_hedging.submit(requete_protegee, disjoncteur, limiteur_copie, url, **kwargs)
+        future.add_done_callback(lambda f: politique.enregistrer_latence(time.monotonic() - depart))
+        return future
+
+    principale = lancer(limiteur)
+    en_cours = {principale}
+    termines, en_cours = wait(en_cours, timeout=politique.delai())
+
+    if not termines and politique.reserver_hedge():
+        # Une copie n'est comptée que si elle part réellement : disjoncteur
+        # d'abord (un semi-ouvert la refuse), jeton de débit ensuite
+        try:
+            disjoncteur.autoriser()
+        except DisjoncteurOuvert:
+            politique.annuler_hedge()
+        else:
+            if limiteur.acquerir(bloquant=False):
+                en_cours.add(lancer(None))
+            else:
+                disjoncteur.abandonner()
+                politique.annuler_hedge()
+
+    # Réponse 429 / 5xx ou exception : on attend l'autre copie avant de la renvoyer
+    repli = None
+    while True:
+        for future in termines:
+            if future.exception() is None and reponse_valide(future.result()):
+                politique.enregistrer_reponse(time.monotonic() - debut, future is not principale)
+                return future.result()
+            if repli is None or future is principale:
+                repli = future
+        if not en_cours:
+            return repli.result()
+        termines, en_cours = wait(en_cours, return_when=FIRST_COMPLETED)
+
+
+# ================== API INSEE ==================
+
+def decoder_json(resp: requests.Response) -> Dict[str, Any]:
+    return charger_json(resp.content)
+
+
+def projection(champs: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """Paramètre INSEE `champs` (aucun = document complet)"""
+    return {"champs": ",".join(champs)} if champs else {}
+
+
+def entetes_insee() -> Dict[str, str]:
+    if not INSEE_API_KEY:
+        raise RuntimeError("INSEE_API_KEY manquante dans .env")
+    return {
+        "X-INSEE-Api-Key-Integration": INSEE_API_KEY,
+        "Accept": "application/json",
+    }
+
+
+def call_insee(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    url = f"{INSEE_BASE_URL}/{path.lstrip('/')}"
+    headers = entetes_insee()
+
+    if SBD_HEDGING_INSEE:
+        resp = requete_avec_hedging(HEDGING_INSEE, DISJONCTEUR_INSEE, LIMITEUR_INSEE, url, headers=headers, params=params, timeout=15)
+    else:
+        resp = requete_protegee(DISJONCTEUR_INSEE, LIMITEUR_INSEE, url, headers=headers, params=params, timeout=15)
+    resp.raise_for_status()
+    return decoder_json(resp)
+
+
+def get_unite_legale_by_siren(siren: str, champs: Optional[Sequence[str]] = CHAMPS_UNITE_LEGALE):
+    # Clé de Luhn contrôlée localement : un SIREN mal formé ne coûte aucun appel
+    siren = valider_siren(siren)
+    # `date` : seule la période en cours est renvoyée, pas tout l'historique
+    params = {**projection(champs), "date": date.today().isoformat()}
+    return call_insee(f"siren/{siren}", params=params)
+
+
+def get_etablissement_by_siret(siret: str, champs: Optional[Sequence[str]] = CHAMPS_ETABLISSEMENT):
+    siret = valider_siret(siret)
+    params = {**projection(champs), "date": date.today().isoformat()}
+    return call_insee(f"siret/{siret}", params=params)
+
+
+def iterer_pages_curseur(
+    path: str,
+    q: str,
+    cle: str,
+    champs: Optional[Sequence[str]] = None,
+    **params,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Pages d'une recherche multicritère INSEE, par curseur (aucun résultat = aucune page)"""
+    curseur = "*"
+    params = {"q": q, "nombre": NOMBRE_PAR_PAGE_CURSEUR, **projection(champs), **params}
+
+    while True:
+        try:
+            data = call_insee(path, params={**params, "curseur": curseur})
+        except requests.HTTPError as e:
+            # 404 = aucun objet ne correspond
+            if e.response is not None and e.response.status_code == 404:
+                return
+            raise
+
+        yield data.get(cle, [])
+
+        suivant = (data.get("header") or {}).get("curseurSuivant")
+        if not suivant or suivant == curseur:
+            return
+        curseur = suivant
+
+
+def iterer_etablissements(
+    sirens: Sequence[str],
+    ouverts_seulement: bool = False,
+    champs: Optional[Sequence[str]] = CHAMPS_ETABLISSEMENT_LISTE,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Établissements d'un ou plusieurs SIREN, page par page (jusqu'à 1000 par
+    requête). Les SIREN sont contrôlés avant le premier appel.
+    """
+    sirens = list(dict.fromkeys(valider_siren(s) for s in sirens))
+
+    for i in range(0, len(sirens), SIREN_PAR_REQUETE):
+        q = " OR ".join(f"siren:{s}" for s in sirens[i:i + SIREN_PAR_REQUETE])
+        if ouverts_seulement:
+            q = f"({q}) AND periode(etatAdministratifEtablissement:A)"
+        yield from iterer_pages_curseur("siret", q, "etablissements", champs, date=date.today().isoformat())
+
+
+def extract_infos_etablissement(etab: Dict[str, Any]) -> Dict[str, Any]:
+    periodes = etab.get("periodesEtablissement") or []
+    periode = periodes[0] if periodes else {}
+    adresse = etab.get("adresseEtablissement") or {}
+    ul = etab.get("uniteLegale") or {}
+
+    return {
+        "siret": etab.get("siret"),
+        "siren": etab.get("siren"),
+        "nom": periode.get("enseigne1Etablissement") or ul.get("denominationUniteLegale"),
+        "adresse": " ".join(filter(None, (adresse.get("codePostalEtablissement"), adresse.get("libelleCommuneEtablissement")))) or None,
+        "naf": periode.get("activitePrincipaleEtablissement") or etab.get("activitePrincipaleEtablissement"),
+        "etat": periode.get("etatAdministratifEtablissement") or etab.get("etatAdministratifEtablissement"),
+        "siege": etab.get("etablissementSiege"),
+        "tranche_effectif": etab.get("trancheEffectifsEtablissement"),
+        "naf_unite_legale": ul.get("activitePrincipaleUniteLegale"),
+        "tranche_unite_legale": ul.get("trancheEffectifsUniteLegale"),
+    }
+
+
+def normaliser_naf(naf: str) -> str:
+    return normaliser_code(naf)
+
+
+def requete_insee_naf(codes: List[str]) -> str:
+    """Filtre `q` INSEE couvrant une liste de sous-classes (postes complets en jokers)"""
+    motifs = motifs_couvrants(codes)
+    if len(motifs) == 1 and "*" not in motifs[0]:
+        return f"periode(activitePrincipaleUniteLegale:{motifs[0]})"
+    return " OR ".join(f"activitePrincipaleUniteLegale:{m}" for m in motifs)
+
+
+def search_by_naf(naf: str, nombre: int = 10, champs: Optional[Sequence[str]] = CHAMPS_UNITE_LEGALE):
+    """Unités légales d'un code, poste ou motif NAF ; lève CodeNafInvalide avant tout appel réseau"""
+    q = requete_insee_naf(developper(naf))
+
+    try:
+        return call_insee("siren", params={"q": q, "nombre": nombre, **projection(champs)})
+    except requests.HTTPError as e:
+        # INSEE répond 404 quand aucune unité légale ne correspond ;
+        # les autres erreurs (API dégradée, disjoncteur ouvert) remontent
+        if e.response is not None and e.response.status_code == 404:
+            return {"unitesLegales": []}
+        raise
+
+
+def extract_infos_unite_legale(ul: Dict[str, Any]):
+    periodes = ul.get("periodesUniteLegale") or []
+    periode = periodes[0] if periodes else {}
+
+    denomination = (
+        periode.get("denominationUniteLegale")
+        or periode.get("nomUniteLegale")
+        or ul.get("denominationUniteLegale")
+        or ul.get("nomUniteLegale")
+    )
+
+    naf = periode.get("activitePrincipaleUniteLegale") or ul.get("activitePrincipaleUniteLegale")
+    catjur = periode.get("categorieJuridiqueUniteLegale") or ul.get("categorieJuridiqueUniteLegale")
+
+    return denomination, naf, catjur
+
+
+# ================== API data.gouv ==================
+
+def params_recherche_nom(
+    texte: str,
+    page: int,
+    tranche_effectif: str = None,
+    etab_min: int = None,
+    etab_max: int = None,
+    code_naf: str = None,
+    per_page: int = 25,
+) -> Dict[str, Any]:
+    # minimal : sans dirigeants, finances, compléments ni matching_etablissements
+    params = {
+        "q": texte,
+        "per_page": per_page,
+        "page": page,
+        "minimal": "true",
+        "include": "siege",
+    }
+
+    if tranche_effectif:
+        params["tranche_effectif_salarie"] = tranche_effectif
+
+    if etab_min is not None:
+        params["nombre_etablissements_ouverts_min"] = etab_min
+
+    if etab_max is not None:
+        params["nombre_etablissements_ouverts_max"] = etab_max
+
+    if code_naf:
+        # Validé localement (CodeNafInvalide) : un code inconnu ne coûte aucun appel
+        params["activite_principale"] = ",".join(developper(code_naf))
+
+    return params
+
+
+def search_entreprises_by_name(
+    texte: str,
+    max_results: int = 10,
+    tranche_effectif: str = None,
+    etab_min: int = None,
+    etab_max: int = None,
+    code_naf: str = None
+) -> List[Dict[str, Any]]:
+
+    results = []
+    page = 1
+
+    while len(results) < max_results:
+        params = params_recherche_nom(texte, page, tranche_effectif, etab_min, etab_max, code_naf)
+        resp = requete_protegee(DISJONCTEUR_DATAGOUV, LIMITEUR_DATAGOUV, RECHERCHE_ENTREPRISES_URL, params=params, timeout=15)
+        resp.raise_for_status()
+
+        data_page = decoder_json(resp)
+        page_results = data_page.get("results", [])
+
+        if not page_results:
+            break
+
+        results.extend(page_results)
+        page += 1
+
+    return results[:max_results]
+
+
+# Derniers enrichissements réussis, servis en repli quand data.gouv est indisponible
+TAILLE_CACHE_ENRICHISSEMENT = 10_000
+_cache_enrichissement: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_verrou_cache = threading.Lock()
+
+
+def memoriser_enrichissement(siren: str, info: Dict[str, Any]):
+    with _verrou_cache:
+        _cache_enrichissement[siren] = info
+        _cache_enrichissement.move_to_end(siren)
+        if len(_cache_enrichissement) > TAILLE_CACHE_ENRICHISSEMENT:
+            _cache_enrichissement.popitem(last=False)
+
+
+def enrichissement_de_repli(siren: str) -> Optional[Dict[str, Any]]:
+    """Effectif et établissements depuis le cache mémoire, sinon la base locale"""
+    with _verrou_cache:
+        info = _cache_enrichissement.get(siren)
+    if info is not None:
+        return info
+
+    # Import local : la base locale est optionnelle pour l'application
+    import base_locale
+
+    if not os.path.exists(base_locale.SBD_DB_PATH):
+        return None
+    conn = base_locale.connecter()
+    try:
+        # Base sans import des stocks : comptes d'établissements partiels
+        if not base_locale.etablissements_complets(conn):
+            return None
+        ul = base_locale.lire_unite_legale(conn, siren)
+        if ul is None:
+            return None
+        return {
+            "tranche_effectif_salarie": ul["tranche_effectif"],
+            "nombre_etablissements_ouverts": base_locale.compter_etablissements_ouverts(conn, siren),
+        }
+    finally:
+        conn.close()
+
+
+def unite_legale_locale(siren: str) -> Optional[Dict[str, Any]]:
+    """Unité légale de la base locale au format de la réponse INSEE (repli)"""
+    import base_locale
+
+    if not os.path.exists(base_locale.SBD_DB_PATH):
+        return None
+    conn = base_locale.connecter()
+    try:
+        ul = base_locale.lire_unite_legale(conn, siren)
+    finally:
+        conn.close()
+    if ul is None:
+        return None
+
+    return {
+        "uniteLegale": {
+            "siren": ul["siren"],
+            "trancheEffectifsUniteLegale": ul["tranche_effectif"],
+            "periodesUniteLegale": [{
+                "denominationUniteLegale": ul["denomination"],
+                "activitePrincipaleUniteLegale": ul["naf"],
+                "categorieJuridiqueUniteLegale": ul["catjur"],
+                "etatAdministratifUniteLegale": ul["etat_administratif"],
+            }],
+        }
+    }
+
+
+def enrichir_par_datagouv(siren: str):
+    params = {"siren": siren, "per_page": 1, "minimal": "true"}
+
+    try:
+        resp = requete_protegee(DISJONCTEUR_DATAGOUV, LIMITEUR_DATAGOUV, RECHERCHE_ENTREPRISES_URL, params=params, timeout=10)
+    except (DisjoncteurOuvert, requests.RequestException):
+        return enrichissement_de_repli(siren)
+
+    if resp.status_code != 200:
+        return None
+
+    data = decoder_json(resp).get("results", [])
+    if not data:
+        return None
+
+    r = data[0]
+
+    info = {
+        "tranche_effectif_salarie": r.get("tranche_effectif_salarie"),
+        "nombre_etablissements_ouverts": r.get("nombre_etablissements_ouverts"),
+    }
+    memoriser_enrichissement(siren, info)
+    return info
+
+
+def enrichir_plusieurs(sirens: Sequence[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Enrichissement d'une liste de SIREN, en parallèle via api_async si aiohttp est installé"""
+    try:
+        import api_async
+    except ImportError:
+        return {siren: enrichir_par_datagouv(siren) for siren in sirens}
+    return api_async.enrichir_lot(sirens)
+
+
+# ================== PLANIFICATEUR DE SOURCES (NAF) ==================
+
+# Champs nécessaires au scoring, tous renvoyés en ligne par recherche-entreprises
+CHAMPS_SCORING = ("tranche_effectif_salarie", "nombre_etablissements_ouverts")
+
+
+def iterer_pages_naf_datagouv(naf: str, nombre: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Pages successives d'un secteur via recherche-entreprises ; `nombre=None` parcourt tout le secteur.
+
+    `per_page` reste fixe : le décalage de la page N est (N - 1) * 25. La
+    dernière page est tronquée à `nombre` côté client.
+    """
+    per_page_api = 25
+    nb_recus = 0
+    page = 1
+
+    while nombre is None or nb_recus < nombre:
+        params = {
+            "activite_principale": naf,
+            "per_page": per_page_api,
+            "page": page,
+            "minimal": "true",
+        }
+
+        resp = requete_protegee(DISJONCTEUR_DATAGOUV, LIMITEUR_DATAGOUV, RECHERCHE_ENTREPRISES_URL, params=params, timeout=15)
+        resp.raise_for_status()
+
+        data_page = decoder_json(resp)
+        page_results = data_page.get("results", [])
+        complete = len(page_results) == per_page_api
+        if nombre is not None:
+            page_results = page_results[:nombre - nb_recus]
+        nb_recus += len(page_results)
+        yield page_results
+
+        if not complete or page >= data_page.get("total_pages", page):
+            break
+        page += 1
+
+
+def lister_par_naf_datagouv(naf: str, nombre: int = 10):
+    """Listing paginé d'un secteur via recherche-entreprises (25 résultats par requête)"""
+    results = []
+    nb_requetes = 0
+
+    for page_results in iterer_pages_naf_datagouv(naf, nombre):
+        results.extend(page_results)
+        nb_requetes += 1
+
+    return results[:nombre], nb_requetes
+
+
+def planifier_recherche_naf(naf: str, nombre: int = 10) -> Dict[str, Any]:
+    """
+    Choisit la source la moins coûteuse pour lister un secteur NAF.
+
+    La saisie est validée et développée localement en sous-classes (code,
+    poste de niveau supérieur ou jokers 62*, 62.0?) : un code inconnu lève
+    CodeNafInvalide sans appel réseau. Les sous-classes sont servies en une
+    passe par recherche-entreprises, qui renvoie directement effectif et
+    établissements : l'enrichissement par SIREN n'est appelé que pour les
+    champs absents. INSEE reste la source de repli (listing + enrichissement).
+    """
+    codes = developper(naf)
+    entreprises = []
+    nb_requetes = 0
+
+    try:
+        results, nb_requetes = lister_par_naf_datagouv(",".join(codes), nombre)
+    except (requests.RequestException, DisjoncteurOuvert, ValueError):
+        results = None
+
+    if results is not None:
+        for r in results:
+            entreprise = {
+                "siren": r.get("siren"),
+                "denomination": r.get("nom_complet") or r.get("nom_raison_sociale"),
+                "naf": r.get("activite_principale"),
+                "catjur": r.get("nature_juridique"),
+                "tranche_effectif_salarie": r.get("tranche_effectif_salarie"),
+                "nombre_etablissements_ouverts": r.get("nombre_etablissements_ouverts"),
+                "brut": r,
+            }
+
+            # Repli par entreprise uniquement si la source groupée omet un champ
+            if all(champ in r for champ in CHAMPS_SCORING):
+                memoriser_enrichissement(entreprise["siren"], {champ: r[champ] for champ in CHAMPS_SCORING})
+            else:
+                info = enrichir_par_datagouv(entreprise["siren"])
+                nb_requetes += 1
+                if info:
+                    for champ in CHAMPS_SCORING:
+                        if champ not in r:
+                            entreprise[champ] = info.get(champ)
+
+            entreprises.append(entreprise)
+
+        return {"source": "data.gouv", "requetes": nb_requetes, "entreprises": entreprises}
+
+    # Repli : listing INSEE puis enrichissement data.gouv de chaque SIREN
+    data = search_by_naf(naf, nombre)
+    nb_requetes += 1
+
+    unites = [u.get("uniteLegale", u) for u in data.get("unitesLegales", [])]
+    infos = enrichir_plusieurs([ul.get("siren") for ul in unites])
+    nb_requetes += len(unites)
+
+    for ul in unites:
+        siren_val = ul.get("siren")
+        info = infos.get(siren_val)
+        denomination, naf_code, catjur = extract_infos_unite_legale(ul)
+
+        entreprises.append({
+            "siren": siren_val,
+            "denomination": denomination,
+            "naf": naf_code,
+            "catjur": catjur,
+            "tranche_effectif_salarie": info.get("tranche_effectif_salarie") if info else None,
+            "nombre_etablissements_ouverts": info.get("nombre_etablissements_ouverts") if info else None,
+            "brut": ul,
+        })
+
+    return {"source": "INSEE", "requetes": nb_requetes, "entreprises": entreprises}
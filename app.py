@@ -1,70 +1,99 @@
 import os
-import io
-from typing import Optional, Dict, Any, List
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any
 
-import requests
 import streamlit as st
 import pandas as pd
-from dotenv import load_dotenv
 
-
-# ================== CONFIG ==================
-
-load_dotenv()
-INSEE_API_KEY = os.getenv("INSEE_API_KEY")
-
-INSEE_BASE_URL = "https://api.insee.fr/api-sirene/3.11"
-RECHERCHE_ENTREPRISES_URL = "https://recherche-entreprises.api.gouv.fr/search"
+from api_sirene import (
+    get_unite_legale_by_siren,
+    get_etablissement_by_siret,
+    extract_infos_unite_legale,
+    search_entreprises_by_name,
+    enrichir_par_datagouv,
+    planifier_recherche_naf,
+    iterer_etablissements,
+    extract_infos_etablissement,
+    enrichir_plusieurs,
+    unite_legale_locale,
+    DisjoncteurOuvert,
+    DISJONCTEUR_INSEE,
+    DISJONCTEUR_DATAGOUV,
+    HEDGING_INSEE,
+    SBD_HEDGING_INSEE,
+)
+from resultats import ResultSet, COLONNES_SIREN, COLONNES_SIRET, COLONNES_NAF, COLONNES_NOM, COLONNES_ETABLISSEMENTS
+from identifiants import IdentifiantInvalide, analyser_saisie, sirens_de
+from ia_model import calculer_score_sante_ia, generer_resume_ia
+from surveillance import Planificateur
+from suggestions import IndexSuggestions, construire_index, NB_NOMS_VUS_MAX
+from geo_index import IndexGeo, VILLES
+from similarite import IndexPairs, construire_index as construire_index_pairs
+from exports import FileExports
+from analytique import AgregatsSecteur, lots_datagouv, lots_base_locale, lots_parquet, SBD_STOCK_SCORE
+from nomenclature_naf import CodeNafInvalide, developper, libelle, normaliser_code
+from resultats_session import ResultatsSession, cle_requete
+from memoire import BudgetSession, SUIVI_MEMOIRE, arreter_suivi, demarrer_suivi, principaux_postes
+import base_locale
+
+
+# Suivi tracemalloc dès le lancement sur demande explicite (sinon depuis le panneau mémoire)
+if SUIVI_MEMOIRE:
+    demarrer_suivi()
 
 
 # ================== UTILS ==================
 
-def df_to_excel_bytes(df: pd.DataFrame) -> bytes:
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="resultats")
-    return output.getvalue()
+@st.cache_resource
+def file_exports() -> FileExports:
+    """File d'exports (et son cache) partagée par toutes les sessions"""
+    return FileExports()
+
+
+@st.fragment(run_every=0.5)
+def suivi_export(cle: str):
+    # Seul ce fragment est réexécuté pendant la préparation, pas le script entier
+    file = file_exports()
+    travail = file.travail(cle)
+
+    if file.resultat(cle) is not None or travail is None or travail.etat == "erreur":
+        # Classeur prêt, évincé du cache ou en erreur : réexécution complète, qui
+        # affiche le bouton ou l'erreur sans relancer ce fragment
+        st.rerun()
+
+    st.progress(travail.progression, text=f"⏳ Préparation de l'export : {travail.message}")
+
+
+def bouton_export(df: pd.DataFrame, titre: str, nom_fichier: str, label: str = "📥 Télécharger tous les résultats en Excel"):
+    """Classeur multi-feuilles préparé en tâche de fond, servi depuis le cache dès qu'il est prêt"""
+    file = file_exports()
+    cle = file.soumettre(df, titre)
+    budget_session().noter_export(cle)
+
+    travail = file.travail(cle)
+    if travail is not None and travail.etat == "erreur":
+        st.error(f"❌ Erreur lors de l'export : {travail.erreur}")
+        if not st.button("🔁 Relancer l'export", key=f"relancer_export_{cle}"):
+            return
+        file.soumettre(df, titre, relancer=True)
+
+    octets = file.resultat(cle)
+    if octets is None:
+        suivi_export(cle)
+        return
+
+    st.download_button(
+        label=label,
+        data=octets,
+        file_name=nom_fichier,
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        use_container_width=True
+    )
 
 
 # ================== FONCTIONS IA ==================
 
-def calculer_score_sante_ia(effectif, nb_etab, naf):
-    """Score de santé d'entreprise de 0 à 100"""
-    score = 50  # Base
-    
-    # Analyse effectif (30 points max)
-    effectif_scores = {
-        "51": 30, "52": 30, "53": 30,  # > 250 salariés
-        "42": 25, "41": 20,            # 50-250
-        "32": 15, "31": 10,            # 10-50
-        "22": 5, "21": 5,              # 3-10
-        "12": 2, "11": 2,              # 1-3
-        "00": 0, "01": 0, "02": 0, "03": 0
-    }
-    score += effectif_scores.get(str(effectif), 5)
-    
-    # Analyse établissements (20 points max)
-    if nb_etab:
-        try:
-            score += min(20, int(nb_etab) * 2)
-        except:
-            pass
-    
-    # Analyse secteur NAF (bonus/malus)
-    if naf:
-        naf_prefix = str(naf)[:2]
-        secteur_risques = {
-            "47": -5,  # Commerce détail (risque)
-            "56": -5,  # Restauration (risque)
-            "62": +10, # IT (croissance)
-            "63": +10, # Info services
-            "72": +10, # R&D
-        }
-        score += secteur_risques.get(naf_prefix, 0)
-    
-    return min(100, max(0, score))
-
-
 def interpreter_score(score):
     """Interprétation du score"""
     if score >= 80:
@@ -77,236 +106,6 @@ def interpreter_score(score):
         return "🔴 Santé fragile", "Entreprise à risque"
 
 
-def generer_resume_ia(nom, naf, effectif, nb_etab):
-    """Génère un résumé intelligent automatique"""
-    
-    # Mapping secteurs NAF
-    secteurs = {
-        "01": "agriculture et élevage", "02": "sylviculture", "03": "pêche",
-        "05": "extraction minière", "10": "industries agroalimentaires",
-        "13": "fabrication de textiles", "14": "industrie de l'habillement",
-        "20": "industrie chimique", "21": "industrie pharmaceutique",
-        "26": "fabrication de produits électroniques", "27": "fabrication d'équipements électriques",
-        "28": "fabrication de machines et équipements", "29": "industrie automobile",
-        "30": "fabrication de matériels de transport", "41": "construction de bâtiments",
-        "43": "travaux de construction spécialisés", "45": "commerce et réparation automobiles",
-        "46": "commerce de gros", "47": "commerce de détail",
-        "49": "transports terrestres", "50": "transports par eau", "51": "transports aériens",
-        "55": "hébergement", "56": "restauration",
-        "58": "édition", "59": "production audiovisuelle", "60": "programmation et diffusion",
-        "61": "télécommunications", "62": "programmation et conseil informatique",
-        "63": "services d'information", "64": "activités financières",
-        "65": "assurance", "66": "activités auxiliaires financières et assurance",
-        "68": "activités immobilières", "69": "activités juridiques et comptables",
-        "70": "activités de conseil et de gestion", "71": "activités d'architecture et d'ingénierie",
-        "72": "recherche-développement scientifique", "73": "publicité et études de marché",
-        "74": "autres activités spécialisées", "77": "activités de location",
-        "78": "activités liées à l'emploi", "80": "enquêtes et sécurité",
-        "85": "enseignement", "86": "activités pour la santé humaine",
-        "87": "hébergement médico-social", "88": "action sociale",
-        "90": "activités créatives, artistiques et de spectacle",
-        "91": "bibliothèques, archives, musées", "93": "activités sportives",
-        "95": "réparation d'ordinateurs", "96": "autres services personnels",
-    }
-    
-    secteur_desc = secteurs.get(str(naf)[:2], "activités économiques diversifiées")
-    
-    # Mapping effectif détaillé
-    tailles = {
-        "51": ("grande entreprise", "plus de 250 salariés", "d'envergure majeure"),
-        "52": ("grande entreprise", "plus de 500 salariés", "d'envergure nationale"),
-        "53": ("très grande entreprise", "plus de 2000 salariés", "de dimension internationale"),
-        "42": ("entreprise de taille intermédiaire (ETI)", "entre 100 et 199 salariés", "bien structurée"),
-        "41": ("entreprise moyenne", "entre 50 et 99 salariés", "en développement soutenu"),
-        "32": ("PME", "entre 20 et 49 salariés", "solidement établie"),
-        "31": ("PME", "entre 10 et 19 salariés", "en phase de consolidation"),
-        "22": ("TPE", "entre 6 et 9 salariés", "à taille humaine"),
-        "21": ("TPE", "entre 3 et 5 salariés", "agile et réactive"),
-        "12": ("micro-entreprise", "1 à 2 salariés", "de type entrepreneurial"),
-        "11": ("micro-entreprise", "1 salarié", "en mode startup"),
-        "00": ("structure", "sans salarié déclaré", "en phase de lancement"),
-        "01": ("entreprise individuelle", "sans salarié", "indépendante"),
-        "02": ("entreprise individuelle", "1 ou 2 salariés", "en croissance"),
-        "03": ("petite structure", "3 à 5 salariés", "en développement"),
-    }
-    
-    taille_info = tailles.get(str(effectif), ("entreprise", "effectif variable", "active"))
-    taille, detail_effectif, qualificatif = taille_info
-    
-    # Construction du résumé élaboré
-    resume = f"{nom} est une {taille} ({detail_effectif}) {qualificatif} spécialisée dans {secteur_desc}. "
-    
-    # Expansion géographique
-    try:
-        nb = int(nb_etab) if nb_etab else 1
-        if nb > 50:
-            resume += f"Son réseau de {nb} établissements témoigne d'une implantation territoriale exceptionnelle et d'une stratégie d'expansion ambitieuse. "
-        elif nb > 20:
-            resume += f"Avec {nb} établissements répartis sur le territoire, elle bénéficie d'une présence géographique significative. "
-        elif nb > 10:
-            resume += f"Sa présence à travers {nb} établissements illustre une stratégie de développement multi-sites réussie. "
-        elif nb > 5:
-            resume += f"Disposant de {nb} établissements, elle affiche une expansion géographique progressive. "
-        elif nb > 1:
-            resume += f"Elle opère depuis {nb} établissements, permettant une proximité régionale. "
-        else:
-            resume += "Structure centralisée sur un établissement unique, favorisant une gestion directe et réactive. "
-    except:
-        resume += "Organisation établie avec une structure opérationnelle cohérente. "
-    
-    # Analyse prédictive avancée basée sur score
-    score = calculer_score_sante_ia(effectif, nb_etab, naf)
-    
-    if score >= 85:
-        resume += "Les indicateurs structurels révèlent une entreprise au profil exceptionnel, combinant taille critique, expansion territoriale et positionnement sectoriel favorable, suggérant un potentiel de croissance élevé et une résilience remarquable."
-    elif score >= 70:
-        resume += "L'analyse des données met en évidence des fondamentaux solides, avec une structure robuste et un positionnement stratégique pertinent, laissant présager une trajectoire de développement positive et une stabilité financière durable."
-    elif score >= 55:
-        resume += "Les critères évalués indiquent une situation stable, avec des bases saines permettant d'envisager des opportunités de développement à moyen terme, sous réserve d'une gestion proactive et adaptée aux évolutions du marché."
-    elif score >= 40:
-        resume += "Le profil actuel suggère une phase de vigilance, nécessitant une attention particulière aux équilibres opérationnels et financiers, avec des marges d'optimisation identifiées dans l'organisation ou le positionnement sectoriel."
-    else:
-        resume += "Les indicateurs appellent à une surveillance accrue, dans un contexte où les facteurs structurels (taille, secteur, maillage territorial) présentent des fragilités potentielles requérant un pilotage stratégique renforcé."
-    
-    return resume
-
-
-# ================== API INSEE ==================
-
-def call_insee(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    if not INSEE_API_KEY:
-        raise RuntimeError("INSEE_API_KEY manquante dans .env")
-
-    url = f"{INSEE_BASE_URL}/{path.lstrip('/')}"
-    headers = {
-        "X-INSEE-Api-Key-Integration": INSEE_API_KEY,
-        "Accept": "application/json",
-    }
-
-    resp = requests.get(url, headers=headers, params=params, timeout=15)
-    resp.raise_for_status()
-    return resp.json()
-
-
-def get_unite_legale_by_siren(siren: str):
-    return call_insee(f"siren/{siren}")
-
-
-def get_etablissement_by_siret(siret: str):
-    return call_insee(f"siret/{siret}")
-
-
-def normaliser_naf(naf: str) -> str:
-    naf = naf.strip().upper()
-    if "*" in naf or "?" in naf:
-        return naf
-    if "." in naf:
-        return naf
-    if len(naf) == 5 and naf[:4].isdigit() and naf[-1].isalpha():
-        return naf[:2] + "." + naf[2:]
-    return naf
-
-
-def search_by_naf(naf: str, nombre: int = 10):
-    naf = normaliser_naf(naf)
-
-    if "*" in naf or "?" in naf:
-        q = f"activitePrincipaleUniteLegale:{naf}"
-    else:
-        q = f"periode(activitePrincipaleUniteLegale:{naf})"
-
-    try:
-        return call_insee("siren", params={"q": q, "nombre": nombre})
-    except:
-        return {"unitesLegales": []}
-
-
-def extract_infos_unite_legale(ul: Dict[str, Any]):
-    periodes = ul.get("periodesUniteLegale") or []
-    periode = periodes[0] if periodes else {}
-
-    denomination = (
-        periode.get("denominationUniteLegale")
-        or periode.get("nomUniteLegale")
-        or ul.get("denominationUniteLegale")
-        or ul.get("nomUniteLegale")
-    )
-
-    naf = periode.get("activitePrincipaleUniteLegale") or ul.get("activitePrincipaleUniteLegale")
-    catjur = periode.get("categorieJuridiqueUniteLegale") or ul.get("categorieJuridiqueUniteLegale")
-
-    return denomination, naf, catjur
-
-
-# ================== API data.gouv ==================
-
-def search_entreprises_by_name(
-    texte: str,
-    max_results: int = 10,
-    tranche_effectif: str = None,
-    etab_min: int = None,
-    etab_max: int = None,
-    code_naf: str = None
-) -> List[Dict[str, Any]]:
-
-    results = []
-    page = 1
-    per_page_api = 25
-
-    while len(results) < max_results:
-
-        params = {
-            "q": texte,
-            "per_page": per_page_api,
-            "page": page,
-        }
-
-        if tranche_effectif:
-            params["tranche_effectif_salarie"] = tranche_effectif
-
-        if etab_min is not None:
-            params["nombre_etablissements_ouverts_min"] = etab_min
-
-        if etab_max is not None:
-            params["nombre_etablissements_ouverts_max"] = etab_max
-
-        if code_naf:
-            params["activite_principale"] = code_naf
-
-        resp = requests.get(RECHERCHE_ENTREPRISES_URL, params=params, timeout=15)
-        resp.raise_for_status()
-
-        data_page = resp.json()
-        page_results = data_page.get("results", [])
-
-        if not page_results:
-            break
-
-        results.extend(page_results)
-        page += 1
-
-    return results[:max_results]
-
-
-def enrichir_par_datagouv(siren: str):
-    params = {"siren": siren, "per_page": 1}
-
-    resp = requests.get(RECHERCHE_ENTREPRISES_URL, params=params, timeout=10)
-    if resp.status_code != 200:
-        return None
-
-    data = resp.json().get("results", [])
-    if not data:
-        return None
-
-    r = data[0]
-
-    return {
-        "tranche_effectif_salarie": r.get("tranche_effectif_salarie"),
-        "nombre_etablissements_ouverts": r.get("nombre_etablissements_ouverts"),
-    }
-
-
 # ================== THEME MODERNE ==================
 
 st.set_page_config(
@@ -556,12 +355,88 @@ mode = st.sidebar.selectbox(
     [
         "Recherche par SIREN (INSEE)",
         "Recherche par SIRET (INSEE)",
+        "Établissements par SIREN (INSEE)",
         "Recherche par Code NAF (INSEE)",
         "Recherche par nom (data.gouv)",
+        "Recherche par proximité (index local)",
+        "Surveillance (watchlist)",
     ],
-    index=0
+    key="mode",
 )
 
+st.sidebar.markdown("---")
+st.sidebar.markdown("### ⚙️ Performance")
+
+ICONES_DISJONCTEUR = {"fermé": "🟢", "semi-ouvert": "🟠", "ouvert": "🔴"}
+
+with st.sidebar.expander("État des API amont", expanded=False):
+    for disjoncteur in (DISJONCTEUR_INSEE, DISJONCTEUR_DATAGOUV):
+        stats = disjoncteur.statistiques()
+        st.markdown(
+            f"{ICONES_DISJONCTEUR[stats['etat']]} **{stats['nom']}** : {stats['etat']}  \n"
+            f"{stats['taux_erreurs']:.0%} d'erreurs · {stats['latence_moyenne'] * 1000:.0f} ms en moyenne · "
+            f"{stats['refus']} appel(s) court-circuité(s)"
+        )
+
+    if SBD_HEDGING_INSEE:
+        stats = HEDGING_INSEE.statistiques()
+        st.markdown(
+            f"🔁 **Hedging INSEE** : {stats['hedges']} copie(s) / {stats['requetes']} requêtes "
+            f"({stats['taux_hedge']:.1%}), {stats['hedges_gagnants']} gagnante(s)  \n"
+            f"Seuil {stats['delai'] * 1000:.0f} ms · p50 {stats['p50'] * 1000:.0f} ms · "
+            f"p95 {stats['p95'] * 1000:.0f} ms · p99 {stats['p99'] * 1000:.0f} ms"
+        )
+
+    magasin = st.session_state.get("resultats_session")
+    if magasin is not None:
+        stats = magasin.statistiques()
+        st.markdown(
+            f"💾 **Résultats de session** : {stats['entrees']}/{stats['capacite']} recherche(s) conservée(s) · "
+            f"{stats['servies']} relance(s) servie(s) sans appel amont ({stats['taux_servies']:.0%})"
+        )
+
+budget = st.session_state.get("budget_session")
+if budget is not None:
+    with st.sidebar.expander("Mémoire de la session", expanded=False):
+        usage = budget.utilisation()
+        st.progress(
+            min(usage["taux"], 1.0),
+            text=f"{usage['octets'] / 1e6:.1f} / {usage['budget'] / 1e6:.0f} Mo",
+        )
+        evictions = usage["evictions"]
+        st.caption(
+            f"Exports en cache : {usage['exports']} ({usage['octets_exports'] / 1e6:.1f} Mo) · "
+            f"libérés : {evictions['bruts']} jeu(x) de données brutes, {evictions['exports']} export(s), "
+            f"{evictions['recherches']} recherche(s), {usage['octets_liberes'] / 1e6:.1f} Mo"
+        )
+        if usage["recherches"]:
+            st.dataframe(
+                pd.DataFrame({
+                    "Recherche": [f"{r['mode']} : {r['requete']}" for r in usage["recherches"]],
+                    "Mo": [round(r["octets"] / 1e6, 2) for r in usage["recherches"]],
+                    "Données brutes": [r["bruts"] for r in usage["recherches"]],
+                }).sort_values("Mo", ascending=False),
+                hide_index=True,
+                use_container_width=True,
+            )
+        if st.toggle("Principaux postes du processus (tracemalloc)", key="postes_memoire"):
+            if demarrer_suivi():
+                st.session_state["suivi_memoire_demarre"] = True
+                st.caption("Suivi démarré : seules les allocations à partir de maintenant sont comptées")
+            postes = principaux_postes()
+            if postes:
+                st.dataframe(
+                    pd.DataFrame({
+                        "Ligne": [p["ligne"] for p in postes],
+                        "Mo": [round(p["octets"] / 1e6, 2) for p in postes],
+                        "Blocs": [p["blocs"] for p in postes],
+                    }),
+                    hide_index=True,
+                    use_container_width=True,
+                )
+        elif st.session_state.pop("suivi_memoire_demarre", False):
+            arreter_suivi()
+
 st.sidebar.markdown("---")
 st.sidebar.markdown("### ℹ️ À propos")
 st.sidebar.info(
@@ -592,6 +467,538 @@ st.sidebar.info(
 )
 
 
+# ================== TÂCHES DE FOND ==================
+
+# Intervalle (secondes) du rafraîchissement de la watchlist hébergé par l'app ;
+# sinon lancer `python surveillance.py executer --boucle` à part
+SURVEILLANCE_INTERVALLE = os.getenv("SBD_SURVEILLANCE_INTERVALLE")
+
+
+@st.cache_resource
+def planificateur_watchlist() -> Planificateur:
+    """Un seul planificateur par processus, partagé par toutes les sessions"""
+    planificateur = Planificateur(intervalle=float(SURVEILLANCE_INTERVALLE))
+    planificateur.demarrer()
+    return planificateur
+
+
+if SURVEILLANCE_INTERVALLE:
+    planificateur_watchlist()
+
+
+# ================== SUGGESTIONS DE NOMS ==================
+
+@st.cache_resource
+def index_suggestions() -> IndexSuggestions:
+    """Index de préfixes construit une fois par processus depuis la base locale"""
+    conn = base_locale.connecter()
+    try:
+        return construire_index(conn)
+    finally:
+        conn.close()
+
+
+@st.cache_resource
+def ecriture_noms_vus() -> ThreadPoolExecutor:
+    """Un seul thread d'écriture SQLite des noms vus, hors du rendu"""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="sbd-noms-vus")
+
+
+def _persister_noms_vus(noms):
+    conn = base_locale.connecter()
+    try:
+        base_locale.enregistrer_noms_vus(conn, noms)
+        base_locale.elaguer_noms_vus(conn, NB_NOMS_VUS_MAX)
+    finally:
+        conn.close()
+
+
+def memoriser_noms_vus(rs: ResultSet):
+    """Alimente l'index (en mémoire) puis la base locale (en tâche de fond) avec les noms d'un jeu de résultats"""
+    noms = [(rs.valeur(i, "nom"), rs.valeur(i, "siren")) for i in range(len(rs))]
+    index_suggestions().ajouter_vus(noms)
+    ecriture_noms_vus().submit(_persister_noms_vus, noms)
+
+
+@st.cache_resource
+def index_pairs() -> IndexPairs:
+    """Index k-NN des entreprises de la base locale, construit une fois par processus"""
+    conn = base_locale.connecter()
+    try:
+        return construire_index_pairs(conn)
+    finally:
+        conn.close()
+
+
+NB_PAIRS = 10
+
+
+# Répertoire de l'index construit par `python geo_index.py construire ...`
+SBD_INDEX_GEO = os.getenv("SBD_INDEX_GEO")
+
+
+@st.cache_resource
+def index_geo() -> IndexGeo:
+    """Index chargé en mmap une fois par processus"""
+    return IndexGeo(SBD_INDEX_GEO)
+
+
+def choisir_suggestion(siren: str):
+    # Callback exécuté avant le rendu des widgets : bascule en mode SIREN
+    st.session_state["mode"] = "Recherche par SIREN (INSEE)"
+    st.session_state["siren_saisi"] = siren
+    st.session_state["recherche_auto"] = True
+
+
+# ================== VUE RÉSULTATS PAGINÉE ==================
+
+TAILLE_PAGE = 20
+
+# Critères de tri proposés -> colonne du tableau de résultats
+CRITERES_TRI = {
+    "Score Santé IA": "Score Santé IA",
+    "Code NAF": "Code NAF",
+    "Tranche effectif": "Tranche effectif salarié",
+}
+
+
+def _cle_tri(serie: pd.Series) -> pd.Series:
+    # Les catégories sont dans l'ordre d'apparition : tri sur les valeurs
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.reorder_categories(sorted(serie.cat.categories))
+    return serie
+
+
+def afficher_resultats_pagines(cle: str, resultats: Dict[str, Any], col_nom: str, source_brut: str):
+    """
+    Tableau compact paginé : seule la page courante est envoyée au navigateur.
+    Le résumé IA et le JSON brut ne sont générés que pour la ligne ouverte.
+    """
+    rs = resultats["rs"]
+    df = rs.to_dataframe()
+    nb_pages = max(1, math.ceil(len(df) / TAILLE_PAGE))
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        critere = st.selectbox("Trier par", list(CRITERES_TRI), key=f"{cle}_tri")
+    with col2:
+        st.markdown("<br>", unsafe_allow_html=True)
+        decroissant = st.toggle("Décroissant", value=True, key=f"{cle}_desc")
+    with col3:
+        page = st.number_input("Page", 1, nb_pages, key=f"{cle}_page")
+
+    df = df.sort_values(
+        CRITERES_TRI[critere],
+        ascending=not decroissant,
+        kind="stable",
+        na_position="last",
+        key=_cle_tri,
+    )
+    debut = (min(page, nb_pages) - 1) * TAILLE_PAGE
+    page_df = df.iloc[debut:debut + TAILLE_PAGE]
+
+    event = st.dataframe(
+        page_df,
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="single-row",
+        key=f"{cle}_table",
+    )
+    st.caption(f"Page {min(page, nb_pages)}/{nb_pages} – sélectionnez une ligne pour afficher son analyse IA")
+
+    selection = [i for i in event.selection.rows if i < len(page_df)]
+    if not selection:
+        return
+
+    # L'index du DataFrame trié conserve la position de la ligne d'origine
+    position = page_df.index[selection[0]]
+    ligne = rs.ligne(position)
+    siren = ligne["SIREN"]
+
+    st.markdown(f"### 🏢 {ligne[col_nom]} – `{siren}`")
+    col1, col2 = st.columns(2)
+    with col1:
+        if "Adresse siège" in ligne:
+            st.markdown(f"**Adresse siège:** {ligne['Adresse siège']}")
+        st.markdown(f"**Code NAF:** `{ligne['Code NAF']}`")
+        if "Catégorie juridique" in ligne:
+            st.markdown(f"**Catégorie juridique:** {ligne['Catégorie juridique']}")
+        st.markdown(f"**Score de Santé IA:** {ligne['Score Santé IA']}/100 - {ligne['Statut']}")
+    with col2:
+        st.markdown(f"**Tranche effectif:** {ligne['Tranche effectif salarié'] or 'N/A'}")
+        st.markdown(f"**Établissements:** {ligne['Établissements ouverts'] or 'N/A'}")
+
+    st.markdown("**🤖 Analyse IA :**")
+    with st.spinner("Génération..."):
+        resume = generer_resume_ia(
+            nom=ligne[col_nom],
+            naf=ligne["Code NAF"] or "N/A",
+            effectif=ligne["Tranche effectif salarié"] or "N/A",
+            nb_etab=ligne["Établissements ouverts"] or "N/A"
+        )
+        st.info(resume)
+
+    with st.expander(f"📄 Données brutes {source_brut}"):
+        brut = rs.brut(position)
+        if brut is None:
+            st.caption("Données brutes libérées (budget mémoire de la session) : relancez la recherche pour les retrouver.")
+        else:
+            st.json(brut)
+
+
+# ================== RÉSULTATS DE SESSION ==================
+
+def resultats_session() -> ResultatsSession:
+    """Magasin de la session courante : les reruns ré-affichent sans rappeler les API"""
+    if "resultats_session" not in st.session_state:
+        st.session_state["resultats_session"] = ResultatsSession()
+    return st.session_state["resultats_session"]
+
+
+def budget_session() -> BudgetSession:
+    """Budget mémoire de la session : recherches mémorisées et exports soumis"""
+    if "budget_session" not in st.session_state:
+        st.session_state["budget_session"] = BudgetSession(resultats_session(), file_exports())
+    return st.session_state["budget_session"]
+
+
+def rechercher(cle, calculer):
+    """Recherche mémorisée pour la session, puis retour sous le budget mémoire"""
+    valeur = resultats_session().rechercher(cle, calculer)
+    budget_session().appliquer()
+    return valeur
+
+
+# ================== CHARGEMENT ET AFFICHAGE DES RÉSULTATS ==================
+
+def charger_fiche_siren(siren: str) -> Dict[str, Any]:
+    """Appels amont, score et résumé d'une entreprise (mémorisés pour la session)"""
+    locale = False
+    try:
+        data = get_unite_legale_by_siren(siren)
+    except DisjoncteurOuvert:
+        # INSEE dégradé : repli immédiat sur la base locale si elle connaît ce SIREN
+        data = unite_legale_locale(siren)
+        if data is None:
+            raise
+        locale = True
+    ul = data.get("uniteLegale", data)
+    info = enrichir_par_datagouv(siren)
+    denomination, naf, catjur = extract_infos_unite_legale(ul)
+
+    score = calculer_score_sante_ia(
+        effectif=info.get("tranche_effectif_salarie") if info else "00",
+        nb_etab=info.get("nombre_etablissements_ouverts") if info else 0,
+        naf=naf
+    )
+    resume = generer_resume_ia(
+        nom=denomination or "Entreprise",
+        naf=naf or "N/A",
+        effectif=info.get("tranche_effectif_salarie") if info else "N/A",
+        nb_etab=info.get("nombre_etablissements_ouverts") if info else "N/A"
+    )
+
+    rs = ResultSet(COLONNES_SIREN)
+    rs.ajouter(
+        siren=ul.get("siren"),
+        nom=denomination,
+        naf=naf,
+        catjur=catjur,
+        tranche_effectif=info.get("tranche_effectif_salarie") if info else None,
+        nb_etab=info.get("nombre_etablissements_ouverts") if info else None,
+        score=score,
+    )
+
+    return {
+        "siren": siren, "ul": ul, "info": info, "locale": locale,
+        "denomination": denomination, "naf": naf, "catjur": catjur,
+        "score": score, "resume": resume, "rs": rs,
+    }
+
+
+def charger_fiche_siret(siret: str) -> Dict[str, Any]:
+    data = get_etablissement_by_siret(siret)
+    etab = data.get("etablissement", data)
+    info = enrichir_par_datagouv(etab.get("siren"))
+
+    score = calculer_score_sante_ia(
+        effectif=info.get("tranche_effectif_salarie") if info else "00",
+        nb_etab=info.get("nombre_etablissements_ouverts") if info else 0,
+        naf=etab.get("activitePrincipaleEtablissement")
+    )
+    resume = generer_resume_ia(
+        nom=f"Établissement {siret}",
+        naf=etab.get("activitePrincipaleEtablissement", "N/A"),
+        effectif=info.get("tranche_effectif_salarie") if info else "N/A",
+        nb_etab=info.get("nombre_etablissements_ouverts") if info else "N/A"
+    )
+
+    rs = ResultSet(COLONNES_SIRET)
+    rs.ajouter(
+        siret=etab.get("siret"),
+        siren=etab.get("siren"),
+        naf=etab.get("activitePrincipaleEtablissement"),
+        tranche_effectif=info.get("tranche_effectif_salarie") if info else None,
+        nb_etab=info.get("nombre_etablissements_ouverts") if info else None,
+        score=score,
+    )
+
+    return {"siret": siret, "etab": etab, "info": info, "score": score, "resume": resume, "rs": rs}
+
+
+def charger_resultats_naf(naf_input: str, nombre: int) -> Dict[str, Any]:
+    plan = planifier_recherche_naf(naf_input, nombre)
+
+    rs = ResultSet(COLONNES_NAF)
+
+    for e in plan["entreprises"]:
+        tranche_effectif = e["tranche_effectif_salarie"]
+        nb_etab_ouverts = e["nombre_etablissements_ouverts"]
+
+        score = calculer_score_sante_ia(
+            effectif=tranche_effectif or "00",
+            nb_etab=nb_etab_ouverts or 0,
+            naf=e["naf"]
+        )
+
+        rs.ajouter(
+            brut=e["brut"],
+            siren=e["siren"],
+            nom=e["denomination"],
+            naf=e["naf"],
+            catjur=e["catjur"],
+            tranche_effectif=tranche_effectif,
+            nb_etab=nb_etab_ouverts,
+            score=score,
+        )
+
+    memoriser_noms_vus(rs)
+    return {"rs": rs, "source": plan["source"], "requetes": plan["requetes"], "requete": naf_input}
+
+
+def charger_resultats_nom(texte: str, max_results: int, filtres: Dict[str, Any]) -> Dict[str, Any]:
+    results = search_entreprises_by_name(texte, max_results=max_results, **filtres)
+
+    rs = ResultSet(COLONNES_NOM)
+    for r in results:
+        siege = r.get("siege") or {}
+        naf = r.get("activite_principale")
+        tranche_effectif_api = r.get("tranche_effectif_salarie")
+        nb_etab_ouverts = r.get("nombre_etablissements_ouverts")
+
+        score = calculer_score_sante_ia(
+            effectif=tranche_effectif_api or "00",
+            nb_etab=nb_etab_ouverts or 0,
+            naf=naf
+        )
+
+        rs.ajouter(
+            brut=r,
+            nom=r.get("nom_complet") or "Sans nom",
+            siren=r.get("siren"),
+            siret_siege=siege.get("siret"),
+            adresse=siege.get("adresse"),
+            naf=naf,
+            tranche_effectif=tranche_effectif_api,
+            nb_etab=nb_etab_ouverts,
+            score=score,
+        )
+
+    memoriser_noms_vus(rs)
+    return {"rs": rs, "requete": texte}
+
+
+SOURCE_ANALYSE_DATAGOUV = "data.gouv (secteur complet)"
+SOURCE_ANALYSE_LOCALE = "Base locale"
+SOURCE_ANALYSE_PARQUET = "Stock Sirene scoré (Parquet)"
+
+
+def charger_analyse_naf(naf_input: str, source: str, nombre: Optional[int], progression) -> Dict[str, Any]:
+    """Agrégats du secteur en une passe ; `progression(n)` après chaque lot"""
+    codes = developper(naf_input)
+    agregats = AgregatsSecteur()
+    conn = None
+
+    try:
+        if source == SOURCE_ANALYSE_DATAGOUV:
+            lots = lots_datagouv(codes, nombre)
+        elif source == SOURCE_ANALYSE_LOCALE:
+            conn = base_locale.connecter()
+            lots = lots_base_locale(conn, codes)
+        else:
+            lots = lots_parquet(SBD_STOCK_SCORE, codes)
+
+        for lot in lots:
+            agregats.ajouter_lot(lot["score"], lot["tranche_effectif"], lot["nb_etab"])
+            progression(agregats.n)
+    finally:
+        if conn is not None:
+            conn.close()
+
+    return {"agregats": agregats, "source": source, "requete": normaliser_code(naf_input)}
+
+
+def charger_etablissements(sirens, ouverts_seulement: bool, progression) -> Dict[str, Any]:
+    """
+    Établissements des SIREN, page INSEE par page, écrits au fil de l'eau dans
+    le jeu de résultats exporté ; `progression(n, requetes)` après chaque page.
+    Chaque ligne porte le score de son unité légale.
+    """
+    # Effectif et établissements ouverts des unités légales (en parallèle si aiohttp)
+    infos = enrichir_plusieurs(sirens)
+    requetes = len(sirens)
+    scores: Dict[str, int] = {}
+
+    rs = ResultSet(COLONNES_ETABLISSEMENTS)
+    for page in iterer_etablissements(sirens, ouverts_seulement):
+        requetes += 1
+        for etab in page:
+            e = extract_infos_etablissement(etab)
+            info = infos.get(e["siren"]) or {}
+            if e["siren"] not in scores:
+                scores[e["siren"]] = calculer_score_sante_ia(
+                    effectif=info.get("tranche_effectif_salarie") or e["tranche_unite_legale"] or "00",
+                    nb_etab=info.get("nombre_etablissements_ouverts") or 0,
+                    naf=e["naf_unite_legale"] or e["naf"],
+                )
+
+            rs.ajouter(
+                brut=etab,
+                siret=e["siret"],
+                siren=e["siren"],
+                nom=e["nom"],
+                adresse=e["adresse"],
+                siege="Oui" if e["siege"] else "Non",
+                etat=e["etat"],
+                naf=e["naf"],
+                tranche_effectif=e["tranche_effectif"],
+                nb_etab=info.get("nombre_etablissements_ouverts"),
+                score=scores[e["siren"]],
+            )
+        progression(len(rs), requetes)
+
+    return {"rs": rs, "requetes": requetes, "sirens": list(sirens)}
+
+
+def afficher_analyse_ia(score: int, resume: str):
+    st.markdown("---")
+    st.markdown("### 🎯 Analyse Intelligente IA")
+
+    statut, description = interpreter_score(score)
+
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        st.metric("📊 Score de Santé", f"{score}/100", delta=statut.split()[0])
+    with col2:
+        # Jauge visuelle
+        if score >= 80:
+            st.markdown("### 🟢")
+        elif score >= 60:
+            st.markdown("### 🟡")
+        elif score >= 40:
+            st.markdown("### 🟠")
+        else:
+            st.markdown("### 🔴")
+        st.markdown(f"**{statut.split()[1]}**")
+    with col3:
+        st.info(f"**Diagnostic:** {description}")
+
+    st.markdown("### 🤖 Résumé Généré par Intelligence Artificielle")
+    st.info(resume)
+
+
+def afficher_fiche_siren(fiche: Dict[str, Any]):
+    ul, info, naf, siren = fiche["ul"], fiche["info"], fiche["naf"], fiche["siren"]
+
+    if fiche["locale"]:
+        st.warning("⚠️ API INSEE indisponible : affichage des données de la base locale")
+    st.success("✅ Entreprise trouvée avec succès !")
+
+    afficher_analyse_ia(fiche["score"], fiche["resume"])
+
+    # Informations principales
+    st.markdown("---")
+    st.markdown("### 📋 Informations Officielles")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f"**🏢 SIREN:** `{ul.get('siren')}`")
+        st.markdown(f"**📝 Dénomination:** {fiche['denomination']}")
+        st.markdown(f"**🏷️ Code NAF:** `{naf}` – {libelle(naf) or 'libellé inconnu'}")
+    with col2:
+        st.markdown(f"**⚖️ Catégorie juridique:** {fiche['catjur']}")
+        if info:
+            st.markdown(f"**👥 Tranche effectif:** {info.get('tranche_effectif_salarie') or 'N/A'}")
+            st.markdown(f"**🏪 Établissements ouverts:** {info.get('nombre_etablissements_ouverts') or 'N/A'}")
+
+    with st.expander("📄 Voir les données JSON (INSEE)"):
+        st.json(ul)
+
+    # Entreprises similaires (base locale, sans appel réseau)
+    st.markdown("---")
+    st.markdown("### 👥 Entreprises similaires")
+    pairs = index_pairs()
+    if len(pairs) == 0:
+        st.caption("Base locale vide : lancez `python sync_sirene.py` pour activer les comparaisons.")
+    else:
+        voisins = pairs.voisins(siren, NB_PAIRS)
+        if voisins is None:
+            voisins = pairs.voisins_profil(
+                naf,
+                info.get("tranche_effectif_salarie") if info else None,
+                info.get("nombre_etablissements_ouverts") if info else None,
+                fiche["score"],
+                NB_PAIRS,
+                siren=siren,
+            )
+        st.caption("Même voisinage NAF, tranche d'effectif, établissements et score proches")
+        st.dataframe(voisins, use_container_width=True, hide_index=True)
+
+    # Export Excel
+    st.markdown("---")
+    bouton_export(
+        fiche["rs"].to_dataframe(),
+        titre=f"Rapport SIREN {siren}",
+        nom_fichier=f"smart_report_siren_{siren}.xlsx",
+        label="📥 Télécharger le rapport Excel",
+    )
+
+
+def afficher_fiche_siret(fiche: Dict[str, Any]):
+    etab, info = fiche["etab"], fiche["info"]
+
+    st.success("✅ Établissement trouvé avec succès !")
+
+    afficher_analyse_ia(fiche["score"], fiche["resume"])
+
+    # Informations principales
+    st.markdown("---")
+    st.markdown("### 📋 Informations Officielles")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f"**🏪 SIRET:** `{etab.get('siret')}`")
+        st.markdown(f"**🏢 SIREN:** `{etab.get('siren')}`")
+        st.markdown(f"**🏷️ Activité principale:** `{etab.get('activitePrincipaleEtablissement')}`")
+    with col2:
+        if info:
+            st.markdown(f"**👥 Tranche effectif:** {info.get('tranche_effectif_salarie') or 'N/A'}")
+            st.markdown(f"**🏪 Établissements ouverts:** {info.get('nombre_etablissements_ouverts') or 'N/A'}")
+
+    with st.expander("📄 Voir les données JSON (INSEE)"):
+        st.json(etab)
+
+    # Export Excel
+    st.markdown("---")
+    bouton_export(
+        fiche["rs"].to_dataframe(),
+        titre=f"Rapport SIRET {fiche['siret']}",
+        nom_fichier=f"smart_report_siret_{fiche['siret']}.xlsx",
+        label="📥 Télécharger le rapport Excel",
+    )
+
+
 # ================== MODES DE RECHERCHE ==================
 
 # MODE SIREN
@@ -601,106 +1008,29 @@ if mode == "Recherche par SIREN (INSEE)":
     
     col1, col2 = st.columns([3, 1])
     with col1:
-        siren = st.text_input("Numéro SIREN", placeholder="ex: 552032534 (Google France)")
+        siren = st.text_input("Numéro SIREN", placeholder="ex: 552032534 (Google France)", key="siren_saisi")
     with col2:
         st.markdown("<br>", unsafe_allow_html=True)
         search_btn = st.button("🚀 Rechercher", key="btn_siren", use_container_width=True)
 
-    if search_btn and siren:
+    # Suggestion choisie en mode nom : recherche directe, sans clic
+    recherche_auto = st.session_state.pop("recherche_auto", False)
+
+    if (search_btn or recherche_auto) and siren:
         with st.spinner("🔄 Recherche en cours..."):
             try:
-                data = get_unite_legale_by_siren(siren)
-                ul = data.get("uniteLegale", data)
-                info = enrichir_par_datagouv(siren)
-                denomination, naf, catjur = extract_infos_unite_legale(ul)
-
-                st.success("✅ Entreprise trouvée avec succès !")
-                
-                # === ANALYSE IA ===
-                st.markdown("---")
-                st.markdown("### 🎯 Analyse Intelligente IA")
-                
-                # Score de santé
-                score = calculer_score_sante_ia(
-                    effectif=info.get("tranche_effectif_salarie") if info else "00",
-                    nb_etab=info.get("nombre_etablissements_ouverts") if info else 0,
-                    naf=naf
-                )
-                statut, description = interpreter_score(score)
-                
-                col1, col2, col3 = st.columns([1, 1, 2])
-                with col1:
-                    st.metric("📊 Score de Santé", f"{score}/100", delta=statut.split()[0])
-                with col2:
-                    # Jauge visuelle
-                    if score >= 80:
-                        st.markdown("### 🟢")
-                    elif score >= 60:
-                        st.markdown("### 🟡")
-                    elif score >= 40:
-                        st.markdown("### 🟠")
-                    else:
-                        st.markdown("### 🔴")
-                    st.markdown(f"**{statut.split()[1]}**")
-                with col3:
-                    st.info(f"**Diagnostic:** {description}")
-                
-                # Résumé IA (CORRIGÉ - sans balise <p>)
-                st.markdown("### 🤖 Résumé Généré par Intelligence Artificielle")
-                with st.spinner("🧠 Analyse en cours..."):
-                    resume = generer_resume_ia(
-                        nom=denomination or "Entreprise",
-                        naf=naf or "N/A",
-                        effectif=info.get("tranche_effectif_salarie") if info else "N/A",
-                        nb_etab=info.get("nombre_etablissements_ouverts") if info else "N/A"
-                    )
-                    # VERSION SIMPLE ET PROPRE
-                    st.info(resume)
-
-                # Informations principales
-                st.markdown("---")
-                st.markdown("### 📋 Informations Officielles")
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.markdown(f"**🏢 SIREN:** `{ul.get('siren')}`")
-                    st.markdown(f"**📝 Dénomination:** {denomination}")
-                    st.markdown(f"**🏷️ Code NAF:** `{naf}`")
-                with col2:
-                    st.markdown(f"**⚖️ Catégorie juridique:** {catjur}")
-                    if info:
-                        st.markdown(f"**👥 Tranche effectif:** {info.get('tranche_effectif_salarie') or 'N/A'}")
-                        st.markdown(f"**🏪 Établissements ouverts:** {info.get('nombre_etablissements_ouverts') or 'N/A'}")
-
-                with st.expander("📄 Voir les données JSON complètes (INSEE)"):
-                    st.json(ul)
-
-                # Export Excel
-                st.markdown("---")
-                rows = [{
-                    "SIREN": ul.get("siren"),
-                    "Nom / Dénomination": denomination,
-                    "Code NAF": naf,
-                    "Catégorie juridique": catjur,
-                    "Tranche effectif salarié": info.get("tranche_effectif_salarie") if info else None,
-                    "Établissements ouverts": info.get("nombre_etablissements_ouverts") if info else None,
-                    "Score Santé IA": score,
-                    "Statut": statut,
-                }]
-
-                df = pd.DataFrame(rows)
-                excel_bytes = df_to_excel_bytes(df)
-                st.download_button(
-                    label="📥 Télécharger le rapport Excel",
-                    data=excel_bytes,
-                    file_name=f"smart_report_siren_{siren}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    use_container_width=True
-                )
-
+                rechercher(cle_requete("siren", siren=siren), lambda: charger_fiche_siren(siren))
+            except IdentifiantInvalide as e:
+                resultats_session().oublier("siren")
+                st.warning(f"⚠️ {e}")
             except Exception as e:
+                resultats_session().oublier("siren")
                 st.error(f"❌ Erreur lors de la recherche : {e}")
 
+    fiche = resultats_session().courant("siren")
+    if fiche is not None:
+        afficher_fiche_siren(fiche)
+
 
 # MODE SIRET
 elif mode == "Recherche par SIRET (INSEE)":
@@ -709,7 +1039,7 @@ elif mode == "Recherche par SIRET (INSEE)":
     
     col1, col2 = st.columns([3, 1])
     with col1:
-        siret = st.text_input("Numéro SIRET", placeholder="ex: 55203253400047")
+        siret = st.text_input("Numéro SIRET", placeholder="ex: 44306184100047")
     with col2:
         st.markdown("<br>", unsafe_allow_html=True)
         search_btn = st.button("🚀 Rechercher", key="btn_siret", use_container_width=True)
@@ -717,93 +1047,77 @@ elif mode == "Recherche par SIRET (INSEE)":
     if search_btn and siret:
         with st.spinner("🔄 Recherche en cours..."):
             try:
-                data = get_etablissement_by_siret(siret)
-                etab = data.get("etablissement", data)
-                siren_val = etab.get("siren")
-                info = enrichir_par_datagouv(siren_val)
-
-                st.success("✅ Établissement trouvé avec succès !")
-                
-                # === ANALYSE IA ===
-                st.markdown("---")
-                st.markdown("### 🎯 Analyse Intelligente IA")
-                
-                score = calculer_score_sante_ia(
-                    effectif=info.get("tranche_effectif_salarie") if info else "00",
-                    nb_etab=info.get("nombre_etablissements_ouverts") if info else 0,
-                    naf=etab.get("activitePrincipaleEtablissement")
-                )
-                statut, description = interpreter_score(score)
-                
-                col1, col2, col3 = st.columns([1, 1, 2])
-                with col1:
-                    st.metric("📊 Score de Santé", f"{score}/100", delta=statut.split()[0])
-                with col2:
-                    if score >= 80:
-                        st.markdown("### 🟢")
-                    elif score >= 60:
-                        st.markdown("### 🟡")
-                    elif score >= 40:
-                        st.markdown("### 🟠")
-                    else:
-                        st.markdown("### 🔴")
-                    st.markdown(f"**{statut.split()[1]}**")
-                with col3:
-                    st.info(f"**Diagnostic:** {description}")
-                
-                # Résumé IA (CORRIGÉ)
-                st.markdown("### 🤖 Résumé Généré par Intelligence Artificielle")
-                with st.spinner("🧠 Analyse en cours..."):
-                    resume = generer_resume_ia(
-                        nom=f"Établissement {siret}",
-                        naf=etab.get("activitePrincipaleEtablissement", "N/A"),
-                        effectif=info.get("tranche_effectif_salarie") if info else "N/A",
-                        nb_etab=info.get("nombre_etablissements_ouverts") if info else "N/A"
-                    )
-                    st.info(resume)
-
-                # Informations principales
-                st.markdown("---")
-                st.markdown("### 📋 Informations Officielles")
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.markdown(f"**🏪 SIRET:** `{etab.get('siret')}`")
-                    st.markdown(f"**🏢 SIREN:** `{etab.get('siren')}`")
-                    st.markdown(f"**🏷️ Activité principale:** `{etab.get('activitePrincipaleEtablissement')}`")
-                with col2:
-                    if info:
-                        st.markdown(f"**👥 Tranche effectif:** {info.get('tranche_effectif_salarie') or 'N/A'}")
-                        st.markdown(f"**🏪 Établissements ouverts:** {info.get('nombre_etablissements_ouverts') or 'N/A'}")
-
-                with st.expander("📄 Voir les données JSON complètes (INSEE)"):
-                    st.json(etab)
-
-                # Export Excel
-                st.markdown("---")
-                rows = [{
-                    "SIRET": etab.get("siret"),
-                    "SIREN": etab.get("siren"),
-                    "Activité principale": etab.get("activitePrincipaleEtablissement"),
-                    "Tranche effectif salarié": info.get("tranche_effectif_salarie") if info else None,
-                    "Établissements ouverts": info.get("nombre_etablissements_ouverts") if info else None,
-                    "Score Santé IA": score,
-                    "Statut": statut,
-                }]
-
-                df = pd.DataFrame(rows)
-                excel_bytes = df_to_excel_bytes(df)
-                st.download_button(
-                    label="📥 Télécharger le rapport Excel",
-                    data=excel_bytes,
-                    file_name=f"smart_report_siret_{siret}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    use_container_width=True
-                )
-
+                rechercher(cle_requete("siret", siret=siret), lambda: charger_fiche_siret(siret))
+            except IdentifiantInvalide as e:
+                resultats_session().oublier("siret")
+                st.warning(f"⚠️ {e}")
             except Exception as e:
+                resultats_session().oublier("siret")
                 st.error(f"❌ Erreur lors de la recherche : {e}")
 
+    fiche = resultats_session().courant("siret")
+    if fiche is not None:
+        afficher_fiche_siret(fiche)
+
+
+# MODE ÉTABLISSEMENTS
+elif mode == "Établissements par SIREN (INSEE)":
+    st.markdown("## 🏪 Établissements par SIREN")
+    st.markdown("*Tous les établissements d'une entreprise ou d'une liste de SIREN / SIRET*")
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        saisie_etab = st.text_area(
+            "SIREN ou SIRET (séparés par des virgules, espaces ou retours à la ligne)",
+            placeholder="ex: 443061841, 552032534",
+        )
+    with col2:
+        ouverts_seulement = st.toggle("Ouverts uniquement", value=True)
+        search_btn = st.button("🚀 Rechercher", key="btn_etab", use_container_width=True)
+
+    # Contrôle local des clés : un identifiant mal formé ne coûte aucune requête
+    saisie = analyser_saisie(saisie_etab)
+    sirens = sirens_de(saisie)
+    if saisie.invalides:
+        st.warning(f"⚠️ {len(saisie.invalides)} identifiant(s) invalide(s) ignoré(s) : {', '.join(saisie.invalides[:10])}")
+
+    if search_btn and sirens:
+        progression = st.empty()
+        try:
+            rechercher(
+                cle_requete("etablissements", sirens=sirens, ouverts=ouverts_seulement),
+                lambda: charger_etablissements(
+                    sirens,
+                    ouverts_seulement,
+                    lambda n, requetes: progression.caption(f"⏳ {n} établissements reçus ({requetes} requête(s) API)..."),
+                ),
+            )
+            st.session_state["etab_page"] = 1
+        except Exception as e:
+            resultats_session().oublier("etablissements")
+            st.error(f"❌ Erreur lors de la recherche : {e}")
+        finally:
+            progression.empty()
+
+    resultats = resultats_session().courant("etablissements")
+    if resultats is not None:
+        rs = resultats["rs"]
+
+        if len(rs) == 0:
+            st.warning("⚠️ Aucun établissement trouvé pour ces SIREN.")
+        else:
+            st.success(f"✅ **{len(rs)} établissements** pour {len(resultats['sirens'])} SIREN")
+            st.caption(f"Source : INSEE – {resultats['requetes']} requête(s) API")
+
+            afficher_resultats_pagines("etab", resultats, col_nom="Enseigne / Dénomination", source_brut="INSEE")
+
+            st.markdown("---")
+            bouton_export(
+                rs.to_dataframe(),
+                titre=f"Établissements de {len(resultats['sirens'])} SIREN",
+                nom_fichier=f"smart_report_etablissements_{resultats['sirens'][0]}.xlsx",
+            )
+
 
 # MODE CODE NAF
 elif mode == "Recherche par Code NAF (INSEE)":
@@ -812,7 +1126,7 @@ elif mode == "Recherche par Code NAF (INSEE)":
     
     col1, col2, col3 = st.columns([2, 1, 1])
     with col1:
-        naf_input = st.text_input("Code NAF", placeholder="ex: 6201Z, 62.01Z, 62*")
+        naf_input = st.text_input("Code NAF", placeholder="ex: 6201Z, 62.01Z, 62, J, 62*")
     with col2:
         nombre = st.slider("Nombre max", 1, 50, 10)
     with col3:
@@ -822,82 +1136,125 @@ elif mode == "Recherche par Code NAF (INSEE)":
     if search_btn and naf_input:
         with st.spinner("🔄 Recherche en cours..."):
             try:
-                data = search_by_naf(naf_input, nombre)
-                results = data.get("unitesLegales", [])
-
-                rows = []
-                total_valides = 0
-
-                for u in results:
-                    ul = u.get("uniteLegale", u)
-                    siren_val = ul.get("siren")
-                    info = enrichir_par_datagouv(siren_val)
-                    denomination, naf_code, catjur = extract_infos_unite_legale(ul)
-                    
-                    score = calculer_score_sante_ia(
-                        effectif=info.get("tranche_effectif_salarie") if info else "00",
-                        nb_etab=info.get("nombre_etablissements_ouverts") if info else 0,
-                        naf=naf_code
-                    )
-                    statut, _ = interpreter_score(score)
-
-                    rows.append({
-                        "SIREN": siren_val,
-                        "Nom / Dénomination": denomination,
-                        "Code NAF": naf_code,
-                        "Catégorie juridique": catjur,
-                        "Tranche effectif salarié": info.get("tranche_effectif_salarie") if info else None,
-                        "Établissements ouverts": info.get("nombre_etablissements_ouverts") if info else None,
-                        "Score Santé IA": score,
-                        "Statut": statut,
-                    })
-
-                    total_valides += 1
-
-                    with st.expander(f"🏢 {denomination} – `{siren_val}` | Score: **{score}/100** {statut.split()[0]}"):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown(f"**Code NAF:** `{naf_code}`")
-                            st.markdown(f"**Catégorie juridique:** {catjur}")
-                            st.markdown(f"**Score de Santé IA:** {score}/100 - {statut}")
-                        with col2:
-                            st.markdown(f"**Tranche effectif:** {info.get('tranche_effectif_salarie') if info else 'N/A'}")
-                            st.markdown(f"**Établissements:** {info.get('nombre_etablissements_ouverts') if info else 'N/A'}")
-                        
-                        st.markdown("---")
-                        st.markdown("**🤖 Analyse IA :**")
-                        with st.spinner("Génération..."):
-                            resume = generer_resume_ia(
-                                nom=denomination,
-                                naf=naf_code,
-                                effectif=info.get("tranche_effectif_salarie") if info else "N/A",
-                                nb_etab=info.get("nombre_etablissements_ouverts") if info else "N/A"
-                            )
-                            st.info(resume)
-                        
-                        st.markdown("**📄 Données brutes INSEE :**")
-                        st.json(ul)
-
-                if total_valides == 0:
-                    st.warning("⚠️ Aucun résultat trouvé pour ce code NAF.")
-                else:
-                    st.success(f"✅ **{total_valides} entreprises** trouvées dans le secteur NAF: {naf_input}")
-
-                if rows:
-                    st.markdown("---")
-                    df = pd.DataFrame(rows)
-                    excel_bytes = df_to_excel_bytes(df)
-                    st.download_button(
-                        label="📥 Télécharger tous les résultats en Excel",
-                        data=excel_bytes,
-                        file_name=f"smart_report_naf_{naf_input}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True
-                    )
+                rechercher(
+                    cle_requete("naf", naf=normaliser_code(naf_input), nombre=nombre),
+                    lambda: charger_resultats_naf(naf_input, nombre),
+                )
+                st.session_state["naf_page"] = 1
 
+            except CodeNafInvalide as e:
+                resultats_session().oublier("naf")
+                st.warning(f"⚠️ {e}")
             except Exception as e:
+                resultats_session().oublier("naf")
                 st.error(f"❌ Erreur lors de la recherche : {e}")
 
+    resultats = resultats_session().courant("naf")
+    if resultats is not None:
+        rs = resultats["rs"]
+
+        if len(rs) == 0:
+            st.warning("⚠️ Aucun résultat trouvé pour ce code NAF.")
+        else:
+            intitule = libelle(resultats["requete"])
+            st.success(
+                f"✅ **{len(rs)} entreprises** trouvées dans le secteur NAF: {resultats['requete']}"
+                + (f" – {intitule}" if intitule else "")
+            )
+            st.caption(f"Source : {resultats['source']} – {resultats['requetes']} requête(s) API")
+
+            afficher_resultats_pagines("naf", resultats, col_nom="Nom / Dénomination", source_brut=resultats["source"])
+
+            st.markdown("---")
+            bouton_export(
+                rs.to_dataframe(),
+                titre=f"Secteur NAF {resultats['requete']}",
+                nom_fichier=f"smart_report_naf_{resultats['requete']}.xlsx",
+            )
+
+    # Analyse sectorielle : agrégats calculés en flux sur tout le secteur
+    st.markdown("---")
+    st.markdown("### 📊 Analyse sectorielle")
+
+    sources_analyse = [SOURCE_ANALYSE_DATAGOUV, SOURCE_ANALYSE_LOCALE]
+    if SBD_STOCK_SCORE:
+        sources_analyse.append(SOURCE_ANALYSE_PARQUET)
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        source_analyse = st.selectbox("Source", sources_analyse, key="analyse_source")
+    with col2:
+        max_analyse = st.number_input(
+            "Entreprises max (data.gouv)", 25, 10_000, 2_500, step=25,
+            disabled=source_analyse != SOURCE_ANALYSE_DATAGOUV,
+        )
+    with col3:
+        st.markdown("<br>", unsafe_allow_html=True)
+        analyse_btn = st.button("📊 Analyser", key="btn_analyse", use_container_width=True)
+
+    if analyse_btn and naf_input:
+        progression = st.empty()
+        nombre_analyse = int(max_analyse) if source_analyse == SOURCE_ANALYSE_DATAGOUV else None
+
+        try:
+            rechercher(
+                cle_requete("analyse_naf", naf=normaliser_code(naf_input), source=source_analyse, nombre=nombre_analyse),
+                lambda: charger_analyse_naf(
+                    naf_input,
+                    source_analyse,
+                    nombre_analyse,
+                    lambda n: progression.caption(f"⏳ {n} entreprises agrégées..."),
+                ),
+            )
+        except CodeNafInvalide as e:
+            resultats_session().oublier("analyse_naf")
+            st.warning(f"⚠️ {e}")
+        except Exception as e:
+            resultats_session().oublier("analyse_naf")
+            st.error(f"❌ Erreur lors de l'analyse : {e}")
+        finally:
+            progression.empty()
+
+    analyse = resultats_session().courant("analyse_naf")
+    if analyse is not None:
+        agregats = analyse["agregats"]
+        synthese = agregats.resume()
+
+        if synthese["entreprises"] == 0:
+            st.warning(f"⚠️ Aucune entreprise active pour {analyse['requete']} ({analyse['source']}).")
+        else:
+            st.caption(f"Secteur {analyse['requete']} {libelle(analyse['requete']) or ''} – source : {analyse['source']}")
+
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Entreprises", f"{synthese['entreprises']:,}".replace(",", " "))
+            col2.metric("Score moyen", f"{synthese['score_moyen']:.1f}")
+            col3.metric("Score médian", synthese["quantiles_score"][0.5])
+            col4.metric("Établissements ouverts", f"{synthese['total_etablissements']:,}".replace(",", " "))
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**Distribution du Score Santé IA**")
+                st.bar_chart(agregats.histogramme_par_tranche())
+                st.markdown("**Statuts**")
+                st.dataframe(agregats.comptes_statut(), use_container_width=True)
+            with col2:
+                st.markdown("**Tranches d'effectif**")
+                st.bar_chart(agregats.comptes_tranche())
+                st.markdown("**Quantiles**")
+                st.dataframe(
+                    pd.DataFrame({
+                        "Score Santé IA": synthese["quantiles_score"],
+                        "Établissements ouverts (±1 %)": {
+                            q: round(v, 1) if v is not None else None
+                            for q, v in synthese["quantiles_etablissements"].items()
+                        },
+                    }).rename(index=lambda q: f"p{int(q * 100)}"),
+                    use_container_width=True,
+                )
+
+            if synthese["sans_etablissements"]:
+                st.caption(f"{synthese['sans_etablissements']} entreprise(s) sans nombre d'établissements renseigné")
+
 
 # MODE NOM
 elif mode == "Recherche par nom (data.gouv)":
@@ -926,94 +1283,209 @@ elif mode == "Recherche par nom (data.gouv)":
         st.markdown("<br>", unsafe_allow_html=True)
         search_btn = st.button("🚀 Rechercher", key="btn_nom", use_container_width=True)
 
+    if texte:
+        suggestions = index_suggestions().suggerer(texte)
+        if suggestions:
+            st.caption("💡 Suggestions (base locale) – ouvrir directement la fiche SIREN")
+            cols = st.columns(min(4, len(suggestions)))
+            for i, s in enumerate(suggestions):
+                cols[i % len(cols)].button(
+                    f"{s['nom']} · {s['siren']}",
+                    key=f"suggestion_{s['siren']}",
+                    on_click=choisir_suggestion,
+                    args=(s["siren"],),
+                    use_container_width=True,
+                )
+
     if search_btn and texte:
+        filtres = {
+            "tranche_effectif": filtre_tranche if filtre_tranche else None,
+            "etab_min": filtre_etab_min,
+            "etab_max": filtre_etab_max,
+            "code_naf": code_naf_filtre if code_naf_filtre else None,
+        }
         with st.spinner("🔄 Recherche en cours..."):
             try:
-                results = search_entreprises_by_name(
-                    texte,
-                    max_results=max_results,
-                    tranche_effectif=filtre_tranche if filtre_tranche else None,
-                    etab_min=filtre_etab_min,
-                    etab_max=filtre_etab_max,
-                    code_naf=code_naf_filtre if code_naf_filtre else None
+                rechercher(
+                    cle_requete("nom", texte=texte, max_results=max_results, **filtres),
+                    lambda: charger_resultats_nom(texte, max_results, filtres),
                 )
+                st.session_state["nom_page"] = 1
 
-                nb_trouves = len(results)
-
-                if nb_trouves == 0:
-                    st.warning("⚠️ Aucun résultat trouvé pour cette recherche.")
-                else:
-                    st.success(f"✅ **{nb_trouves} entreprises** trouvées pour '{texte}'")
-
-                rows = []
-                for r in results:
-                    nom_complet = r.get("nom_complet") or "Sans nom"
-                    siren = r.get("siren")
-                    siege = r.get("siege") or {}
-                    adresse = siege.get("adresse")
-                    siret_siege = siege.get("siret")
-                    naf = r.get("activite_principale")
-                    tranche_effectif_api = r.get("tranche_effectif_salarie")
-                    nb_etab_ouverts = r.get("nombre_etablissements_ouverts")
-                    
-                    score = calculer_score_sante_ia(
-                        effectif=tranche_effectif_api or "00",
-                        nb_etab=nb_etab_ouverts or 0,
-                        naf=naf
-                    )
-                    statut, _ = interpreter_score(score)
-
-                    rows.append({
-                        "Nom complet": nom_complet,
-                        "SIREN": siren,
-                        "SIRET siège": siret_siege,
-                        "Adresse siège": adresse,
-                        "Code NAF": naf,
-                        "Tranche effectif salarié": tranche_effectif_api,
-                        "Établissements ouverts": nb_etab_ouverts,
-                        "Score Santé IA": score,
-                        "Statut": statut,
-                    })
-
-                    with st.expander(f"🏢 {nom_complet} – `{siren}` | Score: **{score}/100** {statut.split()[0]}"):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown(f"**Adresse siège:** {adresse}")
-                            st.markdown(f"**Code NAF:** `{naf}`")
-                            st.markdown(f"**Score de Santé IA:** {score}/100 - {statut}")
-                        with col2:
-                            st.markdown(f"**Tranche effectif:** {tranche_effectif_api or 'N/A'}")
-                            st.markdown(f"**Établissements:** {nb_etab_ouverts or 'N/A'}")
-                        
-                        st.markdown("---")
-                        st.markdown("**🤖 Analyse IA :**")
-                        with st.spinner("Génération..."):
-                            resume = generer_resume_ia(
-                                nom=nom_complet,
-                                naf=naf or "N/A",
-                                effectif=tranche_effectif_api or "N/A",
-                                nb_etab=nb_etab_ouverts or "N/A"
-                            )
-                            st.info(resume)
-                        
-                        st.markdown("**📄 Données brutes data.gouv :**")
-                        st.json(r)
-
-                if rows:
-                    st.markdown("---")
-                    df = pd.DataFrame(rows)
-                    excel_bytes = df_to_excel_bytes(df)
-                    st.download_button(
-                        label="📥 Télécharger tous les résultats en Excel",
-                        data=excel_bytes,
-                        file_name=f"smart_report_{texte.replace(' ', '_')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True
-                    )
-
+            except CodeNafInvalide as e:
+                resultats_session().oublier("nom")
+                st.warning(f"⚠️ {e}")
             except Exception as e:
+                resultats_session().oublier("nom")
                 st.error(f"❌ Erreur lors de la recherche : {e}")
 
+    resultats = resultats_session().courant("nom")
+    if resultats is not None:
+        rs = resultats["rs"]
+
+        if len(rs) == 0:
+            st.warning("⚠️ Aucun résultat trouvé pour cette recherche.")
+        else:
+            st.success(f"✅ **{len(rs)} entreprises** trouvées pour '{resultats['requete']}'")
+
+            afficher_resultats_pagines("nom", resultats, col_nom="Nom complet", source_brut="data.gouv")
+
+            st.markdown("---")
+            bouton_export(
+                rs.to_dataframe(),
+                titre=f"Recherche '{resultats['requete']}'",
+                nom_fichier=f"smart_report_{resultats['requete'].replace(' ', '_')}.xlsx",
+            )
+
+
+# MODE PROXIMITÉ
+elif mode == "Recherche par proximité (index local)":
+    st.markdown("## 📍 Recherche par Proximité")
+    st.markdown("*Entreprises autour d'un point, depuis l'index géographique local (aucun appel API)*")
+
+    if not SBD_INDEX_GEO or not os.path.isdir(SBD_INDEX_GEO):
+        st.info(
+            "ℹ️ Index géographique absent : construisez-le avec "
+            "`python geo_index.py construire StockEtablissement_utf8_geo.csv index_geo/` "
+            "puis définissez `SBD_INDEX_GEO=index_geo`."
+        )
+    else:
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            ville = st.selectbox("Centre", list(VILLES) + ["Coordonnées personnalisées"])
+        with col2:
+            rayon = st.slider("Rayon (km)", 1, 100, 20)
+        with col3:
+            limite = st.number_input("Résultats max", 10, 5000, 200, step=10)
+
+        if ville in VILLES:
+            lat, lon = VILLES[ville]
+        else:
+            col1, col2 = st.columns(2)
+            lat = col1.number_input("Latitude", -90.0, 90.0, 48.8566, format="%.4f")
+            lon = col2.number_input("Longitude", -180.0, 180.0, 2.3522, format="%.4f")
+
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            naf_proximite = st.text_input("Code NAF (optionnel)", placeholder="ex: 62, 62.01Z, 62*", key="naf_proximite")
+        with col2:
+            tranches_proximite = st.multiselect(
+                "Tranches d'effectif",
+                ["00", "01", "02", "03", "11", "12", "21", "22", "31", "32", "41", "42", "51", "52", "53", "NN"],
+            )
+        with col3:
+            tri = st.radio("Trier par", ["distance", "score"], format_func=str.capitalize)
+
+        try:
+            index = index_geo()
+            df = index.autour(
+                lat, lon, rayon,
+                naf=naf_proximite or None,
+                tranches=tranches_proximite or None,
+                tri=tri,
+                limite=int(limite),
+            )
+        except CodeNafInvalide as e:
+            st.warning(f"⚠️ {e}")
+        except Exception as e:
+            st.error(f"❌ Erreur lors de la recherche : {e}")
+        else:
+            nb_total = df.attrs["nb_total"]
+            if nb_total == 0:
+                st.warning("⚠️ Aucun établissement dans ce rayon avec ces filtres.")
+            else:
+                st.success(
+                    f"✅ **{nb_total} établissements** à moins de {rayon} km"
+                    + (f" ({len(df)} affichés)" if len(df) < nb_total else "")
+                )
+                st.map(df.rename(columns={"Latitude": "lat", "Longitude": "lon"})[["lat", "lon"]])
+                st.dataframe(df, use_container_width=True, hide_index=True)
+
+                bouton_export(
+                    df,
+                    titre=f"Proximité {rayon} km",
+                    nom_fichier=f"smart_report_proximite_{rayon}km.xlsx",
+                    label="📥 Télécharger les résultats en Excel",
+                )
+
+
+# MODE SURVEILLANCE
+elif mode == "Surveillance (watchlist)":
+    st.markdown("## 👁️ Surveillance de Portefeuille")
+    st.markdown("*Scores précalculés en tâche de fond et historique des changements*")
+
+    conn = base_locale.connecter()
+    try:
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            saisie = st.text_input("SIREN à surveiller", placeholder="ex: 552032534, 443061841")
+        with col2:
+            st.markdown("<br>", unsafe_allow_html=True)
+            ajout_btn = st.button("➕ Ajouter", key="btn_watch_ajout", use_container_width=True)
+        with col3:
+            st.markdown("<br>", unsafe_allow_html=True)
+            retrait_btn = st.button("➖ Retirer", key="btn_watch_retrait", use_container_width=True)
+
+        saisie_watchlist = analyser_saisie(saisie)
+        sirens_saisis = sirens_de(saisie_watchlist)
+        if saisie_watchlist.invalides:
+            st.warning(f"⚠️ Identifiant(s) invalide(s) ignoré(s) : {', '.join(saisie_watchlist.invalides)}")
+        if ajout_btn and sirens_saisis:
+            base_locale.ajouter_watchlist(conn, sirens_saisis)
+            st.success(f"✅ {len(sirens_saisis)} SIREN ajouté(s) – ils seront scorés au prochain passage")
+        if retrait_btn and sirens_saisis:
+            base_locale.retirer_watchlist(conn, sirens_saisis)
+            st.success(f"✅ {len(sirens_saisis)} SIREN retiré(s)")
+
+        if SURVEILLANCE_INTERVALLE:
+            planificateur = planificateur_watchlist()
+            etat = "actif" if planificateur.actif else "arrêté"
+            st.caption(
+                f"Planificateur {etat} – toutes les {planificateur.intervalle:.0f}s – "
+                f"dernier passage : {planificateur.dernier_passage or 'en cours'}"
+            )
+        else:
+            st.caption("Rafraîchissement externe : `python surveillance.py executer --boucle`")
+
+        etats = base_locale.lire_watchlist(conn)
+        st.markdown(f"### 📋 Portefeuille surveillé ({len(etats)} SIREN)")
+        if etats:
+            st.dataframe(
+                pd.DataFrame(etats).rename(columns={
+                    "siren": "SIREN",
+                    "denomination": "Nom / Dénomination",
+                    "naf": "Code NAF",
+                    "tranche_effectif": "Tranche effectif salarié",
+                    "nb_etab": "Établissements ouverts",
+                    "score": "Score Santé IA",
+                    "statut": "Statut",
+                    "rafraichi_le": "Rafraîchi le",
+                }),
+                hide_index=True,
+                use_container_width=True,
+            )
+        else:
+            st.info("Aucun SIREN surveillé pour le moment.")
+
+        diffs = base_locale.lire_diffs(conn)
+        st.markdown("### 🔔 Derniers changements")
+        if diffs:
+            st.dataframe(
+                pd.DataFrame(diffs).rename(columns={
+                    "siren": "SIREN",
+                    "date": "Date",
+                    "champ": "Champ",
+                    "avant": "Avant",
+                    "apres": "Après",
+                }),
+                hide_index=True,
+                use_container_width=True,
+            )
+        else:
+            st.info("Aucun changement détecté depuis l'ajout des SIREN.")
+    finally:
+        conn.close()
+
 
 # ================== FOOTER ==================
 
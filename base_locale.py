@@ -0,0 +1,318 @@
+"""
+Base locale - Smart Business Directory
+Copie SQLite des unités légales et établissements Sirene avec leurs scores
+
+Alimentée par les jobs batch (sync_sirene.py), lue par l'application.
+Les comptes d'établissements ne sont complets qu'après import des stocks
+(sync_sirene.py --stock-ul / --stock-etab) : une base alimentée par la seule
+synchronisation incrémentale ne connaît que les établissements modifiés.
+"""
+
+import os
+import sqlite3
+from typing import Optional, Dict, Any, Iterator, List, Iterable, Sequence
+
+from ia_model import calculer_score_sante_ia, interpreter_score
+
+
+SBD_DB_PATH = os.getenv("SBD_DB_PATH", "sbd_local.sqlite3")
+
+# Clé meta posée par l'import des stocks
+ETABLISSEMENTS_COMPLETS = "etablissements_complets"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS unites_legales (
+    siren TEXT PRIMARY KEY,
+    denomination TEXT,
+    naf TEXT,
+    catjur TEXT,
+    etat_administratif TEXT,
+    tranche_effectif TEXT,
+    date_dernier_traitement TEXT,
+    score INTEGER,
+    statut TEXT
+);
+
+CREATE TABLE IF NOT EXISTS etablissements (
+    siret TEXT PRIMARY KEY,
+    siren TEXT NOT NULL,
+    naf TEXT,
+    etat_administratif TEXT,
+    date_dernier_traitement TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_etablissements_siren ON etablissements (siren);
+
+CREATE TABLE IF NOT EXISTS watchlist (
+    siren TEXT PRIMARY KEY,
+    ajoute_le TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS watchlist_etat (
+    siren TEXT PRIMARY KEY,
+    denomination TEXT,
+    naf TEXT,
+    tranche_effectif TEXT,
+    nb_etab INTEGER,
+    score INTEGER,
+    statut TEXT,
+    rafraichi_le TEXT
+);
+
+CREATE TABLE IF NOT EXISTS watchlist_diffs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    siren TEXT NOT NULL,
+    date TEXT NOT NULL,
+    champ TEXT NOT NULL,
+    avant TEXT,
+    apres TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_watchlist_diffs_date ON watchlist_diffs (date);
+
+CREATE TABLE IF NOT EXISTS noms_vus (
+    siren TEXT PRIMARY KEY,
+    nom TEXT NOT NULL,
+    nb_vus INTEGER NOT NULL DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    cle TEXT PRIMARY KEY,
+    valeur TEXT
+);
+"""
+
+
+def connecter(chemin: Optional[str] = None) -> sqlite3.Connection:
+    """Ouvre (et initialise si besoin) la base locale"""
+    conn = sqlite3.connect(chemin or SBD_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def lire_meta(conn: sqlite3.Connection, cle: str) -> Optional[str]:
+    row = conn.execute("SELECT valeur FROM meta WHERE cle = ?", (cle,)).fetchone()
+    return row["valeur"] if row else None
+
+
+def ecrire_meta(conn: sqlite3.Connection, cle: str, valeur: str):
+    conn.execute(
+        "INSERT INTO meta (cle, valeur) VALUES (?, ?) "
+        "ON CONFLICT(cle) DO UPDATE SET valeur = excluded.valeur",
+        (cle, valeur),
+    )
+
+
+def etablissements_complets(conn: sqlite3.Connection) -> bool:
+    """Stocks importés : nb_etab et les scores de la base sont fiables"""
+    return lire_meta(conn, ETABLISSEMENTS_COMPLETS) == "1"
+
+
+def upsert_unites_legales(conn: sqlite3.Connection, unites: Iterable[Dict[str, Any]]):
+    conn.executemany(
+        """
+        INSERT INTO unites_legales
+            (siren, denomination, naf, catjur, etat_administratif, tranche_effectif, date_dernier_traitement)
+        VALUES
+            (:siren, :denomination, :naf, :catjur, :etat_administratif, :tranche_effectif, :date_dernier_traitement)
+        ON CONFLICT(siren) DO UPDATE SET
+            denomination = excluded.denomination,
+            naf = excluded.naf,
+            catjur = excluded.catjur,
+            etat_administratif = excluded.etat_administratif,
+            tranche_effectif = excluded.tranche_effectif,
+            date_dernier_traitement = excluded.date_dernier_traitement
+        """,
+        list(unites),
+    )
+
+
+def upsert_etablissements(conn: sqlite3.Connection, etablissements: Iterable[Dict[str, Any]]):
+    conn.executemany(
+        """
+        INSERT INTO etablissements
+            (siret, siren, naf, etat_administratif, date_dernier_traitement)
+        VALUES
+            (:siret, :siren, :naf, :etat_administratif, :date_dernier_traitement)
+        ON CONFLICT(siret) DO UPDATE SET
+            naf = excluded.naf,
+            etat_administratif = excluded.etat_administratif,
+            date_dernier_traitement = excluded.date_dernier_traitement
+        """,
+        list(etablissements),
+    )
+
+
+def rescorer(conn: sqlite3.Connection, sirens: Iterable[str]) -> int:
+    """Recalcule score et statut des seules unités légales indiquées"""
+    sirens = list(set(sirens))
+    nb = 0
+
+    # Par lots pour rester sous la limite de paramètres SQLite
+    for i in range(0, len(sirens), 500):
+        lot = sirens[i:i + 500]
+        marqueurs = ",".join("?" * len(lot))
+        rows = conn.execute(
+            f"""
+            SELECT ul.siren, ul.naf, ul.tranche_effectif,
+                   (SELECT COUNT(*) FROM etablissements e
+                    WHERE e.siren = ul.siren AND e.etat_administratif = 'A') AS nb_etab
+            FROM unites_legales ul
+            WHERE ul.siren IN ({marqueurs})
+            """,
+            lot,
+        ).fetchall()
+
+        maj = []
+        for r in rows:
+            score = calculer_score_sante_ia(r["tranche_effectif"] or "00", r["nb_etab"], r["naf"])
+            statut, _ = interpreter_score(score)
+            maj.append((score, statut, r["siren"]))
+
+        conn.executemany("UPDATE unites_legales SET score = ?, statut = ? WHERE siren = ?", maj)
+        nb += len(maj)
+
+    return nb
+
+
+def lire_unite_legale(conn: sqlite3.Connection, siren: str) -> Optional[Dict[str, Any]]:
+    row = conn.execute("SELECT * FROM unites_legales WHERE siren = ?", (siren,)).fetchone()
+    return dict(row) if row else None
+
+
+def compter_etablissements_ouverts(conn: sqlite3.Connection, siren: str) -> int:
+    row = conn.execute(
+        "SELECT COUNT(*) AS nb FROM etablissements WHERE siren = ? AND etat_administratif = 'A'",
+        (siren,),
+    ).fetchone()
+    return row["nb"]
+
+
+# ================== WATCHLIST ==================
+
+def ajouter_watchlist(conn: sqlite3.Connection, sirens: Iterable[str]):
+    conn.executemany(
+        "INSERT OR IGNORE INTO watchlist (siren, ajoute_le) VALUES (?, datetime('now'))",
+        [(s,) for s in sirens],
+    )
+    conn.commit()
+
+
+def retirer_watchlist(conn: sqlite3.Connection, sirens: Iterable[str]):
+    sirens = [(s,) for s in sirens]
+    conn.executemany("DELETE FROM watchlist WHERE siren = ?", sirens)
+    conn.executemany("DELETE FROM watchlist_etat WHERE siren = ?", sirens)
+    conn.commit()
+
+
+def sirens_a_rafraichir(conn: sqlite3.Connection, limite: Optional[int] = None) -> List[str]:
+    """SIREN de la watchlist, jamais rafraîchis d'abord puis du plus ancien au plus récent"""
+    rows = conn.execute(
+        """
+        SELECT w.siren FROM watchlist w
+        LEFT JOIN watchlist_etat e ON e.siren = w.siren
+        ORDER BY e.rafraichi_le IS NOT NULL, e.rafraichi_le
+        LIMIT ?
+        """,
+        (limite if limite is not None else -1,),
+    ).fetchall()
+    return [r["siren"] for r in rows]
+
+
+def lire_watchlist(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    rows = conn.execute(
+        """
+        SELECT w.siren, e.denomination, e.naf, e.tranche_effectif, e.nb_etab,
+               e.score, e.statut, e.rafraichi_le
+        FROM watchlist w
+        LEFT JOIN watchlist_etat e ON e.siren = w.siren
+        ORDER BY e.score IS NULL, e.score DESC
+        """
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def lire_diffs(conn: sqlite3.Connection, limite: int = 200) -> List[Dict[str, Any]]:
+    rows = conn.execute(
+        "SELECT siren, date, champ, avant, apres FROM watchlist_diffs ORDER BY id DESC LIMIT ?",
+        (limite,),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+# ================== SUGGESTIONS ==================
+
+def lire_noms_index(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    """Dénominations des unités légales actives, avec de quoi calculer leur popularité"""
+    rows = conn.execute(
+        """
+        SELECT ul.siren, ul.denomination, ul.score,
+               (SELECT COUNT(*) FROM etablissements e
+                WHERE e.siren = ul.siren AND e.etat_administratif = 'A') AS nb_etab
+        FROM unites_legales ul
+        WHERE ul.denomination IS NOT NULL AND COALESCE(ul.etat_administratif, 'A') = 'A'
+        """
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def enregistrer_noms_vus(conn: sqlite3.Connection, noms: Iterable[tuple]):
+    """Mémorise les (nom, siren) apparus dans des résultats de recherche"""
+    conn.executemany(
+        """
+        INSERT INTO noms_vus (siren, nom, nb_vus) VALUES (?, ?, 1)
+        ON CONFLICT(siren) DO UPDATE SET nom = excluded.nom, nb_vus = nb_vus + 1
+        """,
+        [(siren, nom) for nom, siren in noms if nom and siren],
+    )
+    conn.commit()
+
+
+def lire_noms_vus(conn: sqlite3.Connection, limite: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Noms vus, les plus fréquents d'abord"""
+    rows = conn.execute(
+        "SELECT siren, nom, nb_vus FROM noms_vus ORDER BY nb_vus DESC LIMIT ?",
+        (limite if limite is not None else -1,),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def elaguer_noms_vus(conn: sqlite3.Connection, nombre_max: int) -> int:
+    """Ne garde que les `nombre_max` noms les plus vus ; renvoie le nombre de lignes supprimées"""
+    cur = conn.execute(
+        """
+        DELETE FROM noms_vus WHERE siren NOT IN (
+            SELECT siren FROM noms_vus ORDER BY nb_vus DESC LIMIT ?
+        )
+        """,
+        (nombre_max,),
+    )
+    conn.commit()
+    return cur.rowcount
+
+
+# ================== ANALYSE SECTORIELLE ==================
+
+def iterer_secteur(
+    conn: sqlite3.Connection,
+    codes: Optional[Sequence[str]] = None,
+    taille_lot: int = 10_000,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Unités légales actives des codes NAF indiqués (toutes si None), par lots (curseur SQLite, mémoire bornée)"""
+    filtre = f"ul.naf IN ({', '.join('?' * len(codes))})" if codes is not None else "ul.naf IS NOT NULL"
+    curseur = conn.execute(
+        f"""
+        SELECT ul.siren, ul.denomination, ul.naf, ul.tranche_effectif, ul.score,
+               (SELECT COUNT(*) FROM etablissements e
+                WHERE e.siren = ul.siren AND e.etat_administratif = 'A') AS nb_etab
+        FROM unites_legales ul
+        WHERE {filtre} AND COALESCE(ul.etat_administratif, 'A') = 'A'
+        """,
+        tuple(codes or ()),
+    )
+    while True:
+        lot = curseur.fetchmany(taille_lot)
+        if not lot:
+            return
+        yield [dict(r) for r in lot]
@@ -0,0 +1,43 @@
+"""
+Codage - Smart Business Directory
+Normalisation de texte et codes de modalités partagés par les index
+
+- normaliser_texte : clé de comparaison (suggestions de noms, libellés NAF) ;
+- Codeur : codes int16 de catégories, stables d'un bloc à l'autre, pour les
+  index construits en une passe par blocs (geo_index, historique).
+"""
+
+import re
+import unicodedata
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+def normaliser_texte(texte: str) -> str:
+    """Minuscules, sans accents ni ponctuation, espaces simples"""
+    texte = unicodedata.normalize("NFKD", texte or "")
+    texte = "".join(c for c in texte if not unicodedata.combining(c)).lower()
+    return re.sub(r"[^a-z0-9]+", " ", texte).strip()
+
+
+class Codeur:
+    """Codes de catégories stables d'un bloc à l'autre (-1 = valeur manquante)"""
+
+    def __init__(self):
+        self.modalites: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def coder(self, valeurs: pd.Series) -> np.ndarray:
+        uniques, inverse = np.unique(valeurs.fillna("").astype(str).to_numpy(), return_inverse=True)
+        codes = np.empty(len(uniques), dtype=np.int16)
+        for i, valeur in enumerate(uniques):
+            if valeur == "":
+                codes[i] = -1
+                continue
+            if valeur not in self.index:
+                self.index[valeur] = len(self.modalites)
+                self.modalites.append(valeur)
+            codes[i] = self.index[valeur]
+        return codes[inverse]
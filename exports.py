@@ -0,0 +1,238 @@
+"""
+Exports - Smart Business Directory
+Classeurs Excel construits en tâche de fond, mis en cache par empreinte
+
+Un export est identifié par l'empreinte de son contenu (hash des colonnes du
+DataFrame) : un même jeu de résultats n'est encodé qu'une fois, les
+téléchargements suivants servent directement les octets en cache. Le travail
+tourne dans un pool de threads dédié et publie sa progression.
+
+Classeur produit :
+- Données : toutes les lignes ;
+- Synthèse secteur : entreprises, score moyen, établissements par code NAF ;
+- Distribution scores : histogramme, statuts, tranches d'effectif, quantiles.
+"""
+
+import hashlib
+import io
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable
+
+import pandas as pd
+
+from analytique import AgregatsSecteur, QUANTILES
+
+
+# Cache borné en octets (LRU)
+TAILLE_CACHE_EXPORTS = 256 * 1024 * 1024
+
+LIGNES_PAR_BLOC = 10_000
+
+# Colonnes reconnues pour les feuilles de synthèse (en-têtes d'export des modes)
+COLONNES_NAF = ("Code NAF", "Activité principale")
+COLONNE_SCORE = "Score Santé IA"
+COLONNE_TRANCHE = "Tranche effectif salarié"
+COLONNE_ETAB = "Établissements ouverts"
+
+
+def empreinte(df: pd.DataFrame, titre: str = "") -> str:
+    """Hash du contenu (valeurs, en-têtes, titre) : clé du cache d'exports"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(titre.encode())
+    h.update("\x1f".join(map(str, df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _colonne(df: pd.DataFrame, candidats) -> Optional[str]:
+    return next((c for c in candidats if c in df.columns), None)
+
+
+def construire_classeur(
+    df: pd.DataFrame,
+    titre: str = "Smart Business Directory",
+    progression: Optional[Callable[[float, str], None]] = None,
+) -> bytes:
+    """Classeur multi-feuilles ; `progression(fraction, message)` est appelé à chaque étape"""
+    progression = progression or (lambda fraction, message: None)
+    sortie = io.BytesIO()
+    col_naf = _colonne(df, COLONNES_NAF)
+
+    with pd.ExcelWriter(sortie, engine="xlsxwriter") as writer:
+        writer.book.set_properties({"title": titre, "subject": "Smart Business Directory"})
+
+        # Feuille des données par blocs de lignes pour suivre l'avancement
+        for debut in range(0, max(len(df), 1), LIGNES_PAR_BLOC):
+            progression(0.6 * debut / max(len(df), 1), f"Données : {debut}/{len(df)} lignes")
+            df.iloc[debut:debut + LIGNES_PAR_BLOC].to_excel(
+                writer, index=False, sheet_name="Données", startrow=debut + 1 if debut else 0, header=debut == 0
+            )
+        writer.sheets["Données"].autofilter(0, 0, len(df), len(df.columns) - 1)
+        writer.sheets["Données"].freeze_panes(1, 0)
+
+        if col_naf and COLONNE_SCORE in df.columns:
+            progression(0.6, "Synthèse par secteur")
+            agregation = {"Entreprises": (COLONNE_SCORE, "size"), "Score moyen": (COLONNE_SCORE, "mean")}
+            if COLONNE_ETAB in df.columns:
+                agregation["Établissements ouverts"] = (COLONNE_ETAB, "sum")
+            synthese = (
+                df.groupby(col_naf, observed=True, dropna=False)
+                .agg(**agregation)
+                .round({"Score moyen": 1})
+                .sort_values("Entreprises", ascending=False)
+            )
+            synthese.to_excel(writer, sheet_name="Synthèse secteur")
+
+        if COLONNE_SCORE in df.columns:
+            progression(0.8, "Distribution des scores")
+            agregats = AgregatsSecteur()
+            agregats.ajouter_lot(
+                df[COLONNE_SCORE].to_numpy(),
+                df[COLONNE_TRANCHE] if COLONNE_TRANCHE in df.columns else [None] * len(df),
+                df[COLONNE_ETAB] if COLONNE_ETAB in df.columns else [None] * len(df),
+            )
+            quantiles = pd.Series(
+                {f"p{int(q * 100)}": agregats.quantile_score(q) for q in QUANTILES}, name="Score Santé IA"
+            )
+
+            feuille = "Distribution scores"
+            ligne = 0
+            for tableau in (agregats.histogramme_par_tranche(), agregats.comptes_statut(), agregats.comptes_tranche(), quantiles):
+                tableau.to_frame().to_excel(writer, sheet_name=feuille, startrow=ligne)
+                ligne += len(tableau) + 2
+
+            progression(0.9, "Graphique")
+            graphique = writer.book.add_chart({"type": "column"})
+            graphique.add_series({
+                "name": "Entreprises",
+                "categories": [feuille, 1, 0, 11, 0],
+                "values": [feuille, 1, 1, 11, 1],
+            })
+            graphique.set_title({"name": "Distribution du Score Santé IA"})
+            graphique.set_legend({"none": True})
+            writer.sheets[feuille].insert_chart("E2", graphique)
+
+        progression(0.95, "Finalisation")
+
+    return sortie.getvalue()
+
+
+class TravailExport:
+    """État d'un export : en_attente -> en_cours -> termine | erreur"""
+
+    def __init__(self, cle: str):
+        self.cle = cle
+        self.etat = "en_attente"
+        self.progression = 0.0
+        self.message = "En attente"
+        self.erreur: Optional[str] = None
+        self.duree: Optional[float] = None
+
+    def avancer(self, fraction: float, message: str):
+        self.progression = fraction
+        self.message = message
+
+
+class FileExports:
+    """
+    File d'exports en tâche de fond partagée par les sessions.
+
+    Usage :
+        cle = file.soumettre(df, titre)      # idempotent (un export en erreur le reste)
+        travail = file.travail(cle)          # progression
+        octets = file.resultat(cle)          # None tant que non terminé
+
+    Les sessions qui affichent un classeur le retiennent (retenir) : liberer ne
+    le retire du cache que si plus aucune session vivante ne le retient.
+    """
+
+    def __init__(self, workers: int = 2, taille_cache: int = TAILLE_CACHE_EXPORTS):
+        self.executeur = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sbd-export")
+        self.taille_cache = taille_cache
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._travaux: Dict[str, TravailExport] = {}
+        self._detenteurs: Dict[str, "weakref.WeakSet"] = {}
+        self._verrou = threading.Lock()
+
+    def soumettre(self, df: pd.DataFrame, titre: str = "Smart Business Directory", relancer: bool = False) -> str:
+        """Clé de l'export ; un export en erreur n'est refait qu'avec `relancer`"""
+        cle = empreinte(df, titre)
+        with self._verrou:
+            travail = self._travaux.get(cle)
+            if cle in self._cache or (travail is not None and (travail.etat != "erreur" or not relancer)):
+                return cle
+            travail = self._travaux[cle] = TravailExport(cle)
+
+        # Copie : le DataFrame de la session peut être libéré pendant l'export
+        self.executeur.submit(self._executer, travail, df.copy(), titre)
+        return cle
+
+    def _executer(self, travail: TravailExport, df: pd.DataFrame, titre: str):
+        debut = time.perf_counter()
+        travail.etat = "en_cours"
+        try:
+            octets = construire_classeur(df, titre, travail.avancer)
+        except Exception as e:
+            travail.etat = "erreur"
+            travail.erreur = str(e)
+            return
+
+        with self._verrou:
+            self._cache[travail.cle] = octets
+            self._cache.move_to_end(travail.cle)
+            while sum(len(o) for o in self._cache.values()) > self.taille_cache and len(self._cache) > 1:
+                ancienne, _ = self._cache.popitem(last=False)
+                self._travaux.pop(ancienne, None)
+                self._detenteurs.pop(ancienne, None)
+
+        travail.duree = time.perf_counter() - debut
+        travail.avancer(1.0, "Terminé")
+        travail.etat = "termine"
+
+    def travail(self, cle: str) -> Optional[TravailExport]:
+        with self._verrou:
+            return self._travaux.get(cle)
+
+    def resultat(self, cle: str) -> Optional[bytes]:
+        with self._verrou:
+            octets = self._cache.get(cle)
+            if octets is not None:
+                self._cache.move_to_end(cle)
+            return octets
+
+    def taille(self, cle: str) -> Optional[int]:
+        """Octets du classeur en cache (None s'il n'y est pas)"""
+        with self._verrou:
+            octets = self._cache.get(cle)
+            return len(octets) if octets is not None else None
+
+    def retenir(self, cle: str, detenteur):
+        with self._verrou:
+            self._detenteurs.setdefault(cle, weakref.WeakSet()).add(detenteur)
+
+    def liberer(self, cle: str, detenteur) -> int:
+        """Le détenteur lâche le classeur ; renvoie les octets retirés du cache (0 s'il reste retenu)"""
+        with self._verrou:
+            detenteurs = self._detenteurs.get(cle)
+            if detenteurs is not None:
+                detenteurs.discard(detenteur)
+                if len(detenteurs):
+                    return 0
+            octets = self._cache.pop(cle, None)
+            self._detenteurs.pop(cle, None)
+            if octets is None:
+                return 0
+            self._travaux.pop(cle, None)
+            return len(octets)
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self._verrou:
+            return {
+                "exports_en_cache": len(self._cache),
+                "octets_en_cache": sum(len(o) for o in self._cache.values()),
+                "en_cours": sum(t.etat in ("en_attente", "en_cours") for t in self._travaux.values()),
+            }
@@ -0,0 +1,287 @@
+"""
+Index géographique - Smart Business Directory
+Recherche de proximité hors ligne sur le stock Sirene géolocalisé
+
+Construit depuis le stock établissements géolocalisé d'Etalab
+(StockEtablissement_utf8_geo.csv, colonnes latitude / longitude) :
+- grille régulière de PAS_GRILLE degrés ; les établissements sont triés par
+  cellule (clé = ligne * NB_COLONNES + colonne), si bien qu'une ligne de
+  cellules d'un rectangle est une seule tranche contiguë (searchsorted) ;
+- colonnes NumPy compactes enregistrées en .npy et relues en mmap : SIRET,
+  coordonnées float32, NAF et tranche en codes de catégories, score uint8.
+
+Une requête rayon / rectangle ne lit que les cellules concernées, puis filtre
+NAF / effectif et calcule les distances exactes (haversine) en vectoriel.
+
+Usage :
+    python geo_index.py construire StockEtablissement_utf8_geo.csv index_geo/ [--tous-etablissements]
+    python geo_index.py chercher index_geo/ --lat 45.764 --lon 4.836 --rayon 20 [--naf 62*] [--effectif 11 12]
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Optional, Dict, Any, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from codage import Codeur
+from ia_model import calculer_scores_vectorises
+from resultats import LIBELLES_STATUT, Statut
+from nomenclature_naf import developper
+from pipeline_sirene import lire_par_blocs
+
+
+PAS_GRILLE = 0.05  # degrés (~5,5 km en latitude)
+NB_COLONNES = int(360 / PAS_GRILLE)
+
+RAYON_TERRE_KM = 6371.0
+KM_PAR_DEGRE = 111.32
+
+COLONNES_GEO = [
+    "siret",
+    "etatAdministratifEtablissement",
+    "etablissementSiege",
+    "activitePrincipaleEtablissement",
+    "trancheEffectifsEtablissement",
+    "latitude",
+    "longitude",
+]
+
+# Colonnes NumPy de l'index -> dtype
+TABLEAUX = {
+    "cles": np.int64,
+    "siret": np.uint64,
+    "lat": np.float32,
+    "lon": np.float32,
+    "naf": np.int16,
+    "tranche": np.int8,
+    "nb_etab": np.uint32,
+    "score": np.uint8,
+}
+
+# Grandes villes proposées dans l'interface (latitude, longitude)
+VILLES = {
+    "Paris": (48.8566, 2.3522),
+    "Marseille": (43.2965, 5.3698),
+    "Lyon": (45.7640, 4.8357),
+    "Toulouse": (43.6047, 1.4442),
+    "Nice": (43.7102, 7.2620),
+    "Nantes": (47.2184, -1.5536),
+    "Strasbourg": (48.5734, 7.7521),
+    "Montpellier": (43.6108, 3.8767),
+    "Bordeaux": (44.8378, -0.5792),
+    "Lille": (50.6292, 3.0573),
+    "Rennes": (48.1173, -1.6778),
+}
+
+
+def cle_cellule(lat, lon):
+    ligne = np.floor((np.asarray(lat, dtype=np.float64) + 90) / PAS_GRILLE).astype(np.int64)
+    colonne = np.floor((np.asarray(lon, dtype=np.float64) + 180) / PAS_GRILLE).astype(np.int64)
+    return ligne * NB_COLONNES + colonne
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Distance haversine (vectorisée)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAYON_TERRE_KM * np.arcsin(np.sqrt(a))
+
+
+# ================== CONSTRUCTION ==================
+
+def construire(chemin_stock: str, sortie: str, sieges_seulement: bool = True, taille_bloc: int = 500_000) -> Dict[str, Any]:
+    """Construit l'index en une passe sur le stock, mémoire proportionnelle aux seuls établissements retenus"""
+    debut = time.perf_counter()
+    naf_codeur, tranche_codeur = Codeur(), Codeur()
+    blocs: Dict[str, List[np.ndarray]] = {cle: [] for cle in ("siret", "lat", "lon", "naf", "tranche")}
+    sirens_ouverts = []
+
+    for bloc in lire_par_blocs(chemin_stock, COLONNES_GEO, taille_bloc):
+        bloc = bloc[bloc["etatAdministratifEtablissement"] == "A"]
+        siret = bloc["siret"].to_numpy(np.uint64)
+        sirens_ouverts.append(siret // 100_000)
+
+        lat = pd.to_numeric(bloc["latitude"], errors="coerce").to_numpy(np.float64)
+        lon = pd.to_numeric(bloc["longitude"], errors="coerce").to_numpy(np.float64)
+        garder = ~(np.isnan(lat) | np.isnan(lon))
+        if sieges_seulement:
+            garder &= bloc["etablissementSiege"].astype(str).str.lower().to_numpy() == "true"
+
+        blocs["siret"].append(siret[garder])
+        blocs["lat"].append(lat[garder].astype(np.float32))
+        blocs["lon"].append(lon[garder].astype(np.float32))
+        blocs["naf"].append(naf_codeur.coder(bloc["activitePrincipaleEtablissement"][garder]))
+        blocs["tranche"].append(tranche_codeur.coder(bloc["trancheEffectifsEtablissement"][garder]).astype(np.int8))
+
+    colonnes = {cle: np.concatenate(v) if v else np.empty(0, TABLEAUX.get(cle, np.int8)) for cle, v in blocs.items()}
+
+    # Établissements ouverts par SIREN, sur tout le stock (sièges ou non)
+    sirens, comptes = np.unique(np.concatenate(sirens_ouverts) if sirens_ouverts else np.empty(0, np.uint64), return_counts=True)
+    siren_retenus = colonnes["siret"] // 100_000
+    pos = np.minimum(np.searchsorted(sirens, siren_retenus), max(len(sirens) - 1, 0))
+    colonnes["nb_etab"] = np.where(sirens[pos] == siren_retenus, comptes[pos], 0).astype(np.uint32) if len(sirens) else np.zeros(0, np.uint32)
+
+    # Score : mêmes règles que l'application, tranche et NAF de l'établissement
+    # (le code -1 d'une valeur manquante pointe sur la valeur par défaut ajoutée en fin)
+    tranches = np.array(tranche_codeur.modalites + ["00"], dtype=object)[colonnes["tranche"]]
+    nafs = np.array(naf_codeur.modalites + [""], dtype=object)[colonnes["naf"]]
+    colonnes["score"] = calculer_scores_vectorises(tranches, colonnes["nb_etab"], nafs)
+
+    colonnes["cles"] = cle_cellule(colonnes["lat"], colonnes["lon"])
+    ordre = np.argsort(colonnes["cles"], kind="stable")
+
+    os.makedirs(sortie, exist_ok=True)
+    for cle, dtype in TABLEAUX.items():
+        np.save(os.path.join(sortie, f"{cle}.npy"), colonnes[cle][ordre].astype(dtype, copy=False))
+    with open(os.path.join(sortie, "modalites.json"), "w", encoding="utf-8") as f:
+        json.dump({"naf": naf_codeur.modalites, "tranche": tranche_codeur.modalites, "pas": PAS_GRILLE}, f)
+
+    return {"etablissements": len(ordre), "duree": time.perf_counter() - debut}
+
+
+# ================== REQUÊTES ==================
+
+class IndexGeo:
+    """Index chargé en mmap : `autour(lat, lon, rayon_km, ...)`, `dans_rectangle(...)`"""
+
+    def __init__(self, chemin: str):
+        with open(os.path.join(chemin, "modalites.json"), encoding="utf-8") as f:
+            modalites = json.load(f)
+        if modalites["pas"] != PAS_GRILLE:
+            raise ValueError(f"Index construit avec un pas de {modalites['pas']}°, attendu {PAS_GRILLE}°")
+
+        self.naf_modalites: List[str] = modalites["naf"]
+        self.tranche_modalites: List[str] = modalites["tranche"]
+        self.tableaux = {cle: np.load(os.path.join(chemin, f"{cle}.npy"), mmap_mode="r") for cle in TABLEAUX}
+
+    def __len__(self) -> int:
+        return len(self.tableaux["cles"])
+
+    def _candidats(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> np.ndarray:
+        """Positions des établissements des cellules couvrant le rectangle"""
+        cles = self.tableaux["cles"]
+        ligne_min, col_min = divmod(int(cle_cellule(lat_min, lon_min)), NB_COLONNES)
+        ligne_max, col_max = divmod(int(cle_cellule(lat_max, lon_max)), NB_COLONNES)
+
+        lignes = np.arange(ligne_min, ligne_max + 1, dtype=np.int64)
+        debuts = np.searchsorted(cles, lignes * NB_COLONNES + col_min, side="left")
+        fins = np.searchsorted(cles, lignes * NB_COLONNES + col_max, side="right")
+        tranches = [np.arange(d, f) for d, f in zip(debuts, fins) if f > d]
+        return np.concatenate(tranches) if tranches else np.empty(0, np.int64)
+
+    def _filtrer(self, positions: np.ndarray, naf: Optional[str], tranches: Optional[Sequence[str]]) -> np.ndarray:
+        if naf:
+            sous_classes = set(developper(naf))
+            codes = [i for i, m in enumerate(self.naf_modalites) if m in sous_classes]
+            positions = positions[np.isin(self.tableaux["naf"][positions], codes)]
+        if tranches:
+            codes = [i for i, m in enumerate(self.tranche_modalites) if m in set(tranches)]
+            positions = positions[np.isin(self.tableaux["tranche"][positions], codes)]
+        return positions
+
+    def dans_rectangle(
+        self,
+        lat_min: float,
+        lat_max: float,
+        lon_min: float,
+        lon_max: float,
+        naf: Optional[str] = None,
+        tranches: Optional[Sequence[str]] = None,
+        limite: Optional[int] = 100,
+    ) -> pd.DataFrame:
+        positions = self._filtrer(self._candidats(lat_min, lat_max, lon_min, lon_max), naf, tranches)
+        lat = self.tableaux["lat"][positions]
+        lon = self.tableaux["lon"][positions]
+        positions = positions[(lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)]
+        return self._resultats(positions, None, tri="score", limite=limite)
+
+    def autour(
+        self,
+        lat: float,
+        lon: float,
+        rayon_km: float,
+        naf: Optional[str] = None,
+        tranches: Optional[Sequence[str]] = None,
+        tri: str = "distance",
+        limite: Optional[int] = 100,
+    ) -> pd.DataFrame:
+        """Établissements à moins de `rayon_km` du point, triés par distance ou par score"""
+        d_lat = rayon_km / KM_PAR_DEGRE
+        d_lon = rayon_km / (KM_PAR_DEGRE * max(np.cos(np.radians(lat)), 1e-6))
+        positions = self._filtrer(self._candidats(lat - d_lat, lat + d_lat, lon - d_lon, lon + d_lon), naf, tranches)
+
+        distances = distance_km(lat, lon, self.tableaux["lat"][positions], self.tableaux["lon"][positions])
+        dans_rayon = distances <= rayon_km
+        return self._resultats(positions[dans_rayon], distances[dans_rayon], tri=tri, limite=limite)
+
+    def _resultats(self, positions: np.ndarray, distances: Optional[np.ndarray], tri: str, limite: Optional[int]) -> pd.DataFrame:
+        scores = self.tableaux["score"][positions]
+        if tri == "distance" and distances is not None:
+            ordre = np.argsort(distances, kind="stable")
+        else:
+            ordre = np.argsort(-scores.astype(np.int16), kind="stable")
+        nb_total = len(positions)
+        ordre = ordre[:limite]
+
+        positions = positions[ordre]
+        siret = self.tableaux["siret"][positions]
+        scores = scores[ordre]
+        statuts = np.array([Statut.depuis_score(int(s)) for s in range(101)], dtype=np.int8)[scores]
+
+        df = pd.DataFrame({
+            "SIRET": [f"{s:014d}" for s in siret],
+            "SIREN": [f"{s // 100_000:09d}" for s in siret],
+            "Code NAF": pd.Categorical.from_codes(self.tableaux["naf"][positions], categories=self.naf_modalites),
+            "Tranche effectif salarié": pd.Categorical.from_codes(
+                self.tableaux["tranche"][positions].astype(np.int16), categories=self.tranche_modalites
+            ),
+            "Établissements ouverts": self.tableaux["nb_etab"][positions],
+            "Score Santé IA": scores,
+            "Statut": pd.Categorical.from_codes(statuts, categories=LIBELLES_STATUT),
+            "Latitude": self.tableaux["lat"][positions].astype(np.float64),
+            "Longitude": self.tableaux["lon"][positions].astype(np.float64),
+        })
+        if distances is not None:
+            df.insert(0, "Distance (km)", np.round(distances[ordre], 2))
+        df.attrs["nb_total"] = nb_total
+        return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index géographique du stock Sirene géolocalisé")
+    sous = parser.add_subparsers(dest="commande", required=True)
+
+    p_construire = sous.add_parser("construire", help="Construire l'index")
+    p_construire.add_argument("stock", help="StockEtablissement géolocalisé (CSV ou Parquet)")
+    p_construire.add_argument("sortie", help="Répertoire de l'index")
+    p_construire.add_argument("--tous-etablissements", action="store_true", help="Indexer aussi les établissements secondaires")
+    p_construire.add_argument("--taille-bloc", type=int, default=500_000)
+
+    p_chercher = sous.add_parser("chercher", help="Recherche de proximité")
+    p_chercher.add_argument("index", help="Répertoire de l'index")
+    p_chercher.add_argument("--lat", type=float, required=True)
+    p_chercher.add_argument("--lon", type=float, required=True)
+    p_chercher.add_argument("--rayon", type=float, default=10, help="Rayon en km")
+    p_chercher.add_argument("--naf", default=None, help="Code ou préfixe NAF (62, 62.01Z, 62*)")
+    p_chercher.add_argument("--effectif", nargs="*", default=None, help="Tranches d'effectif retenues")
+    p_chercher.add_argument("--limite", type=int, default=20)
+
+    args = parser.parse_args()
+
+    if args.commande == "construire":
+        bilan = construire(args.stock, args.sortie, not args.tous_etablissements, args.taille_bloc)
+        print(f"Index OK - {bilan['etablissements']} établissements en {bilan['duree']:.1f}s")
+    else:
+        index = IndexGeo(args.index)
+        debut = time.perf_counter()
+        df = index.autour(args.lat, args.lon, args.rayon, naf=args.naf, tranches=args.effectif, limite=args.limite)
+        print(f"{df.attrs['nb_total']} établissement(s) en {(time.perf_counter() - debut) * 1000:.1f} ms")
+        print(df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
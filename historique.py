@@ -0,0 +1,339 @@
+"""
+Historique des unités légales - Smart Business Directory
+Périodes INSEE (NAF, catégorie juridique, état administratif) en tableaux partagés
+
+extract_infos_unite_legale ne lit que la période en cours ; l'historique
+complet (StockUniteLegaleHistorique, ou periodesUniteLegale d'une réponse
+INSEE sans `date`) est conservé ici en colonnes NumPy compactes :
+- une ligne par période, toutes entreprises confondues, triées par SIREN puis
+  par date ; les périodes de sirens[i] sont [debuts[i], debuts[i + 1]) ;
+- dates de début en deltas de jours uint16 : depuis ORIGINE pour la première
+  période d'un SIREN, depuis la période précédente ensuite ;
+- NAF, nomenclature, catégorie juridique et état en codes de modalités ;
+- les périodes qui ne changent aucune de ces colonnes (changement de nom,
+  d'ESS...) sont fusionnées avec la précédente.
+Soit 8 octets par période et 8 par SIREN : le stock complet tient en
+quelques centaines de Mo, relus en mmap.
+
+Les indicateurs de tendance (cessations, changements de secteur, ancienneté
+du dernier changement) sont calculés par lots de SIREN en vectoriel, puis
+convertis en points par calculer_tendances_vectorisees (ia_model).
+
+Usage :
+    python historique.py construire StockUniteLegaleHistorique_utf8.csv index_historique/
+    python historique.py tendance index_historique/ 552032534 443061841
+"""
+
+import argparse
+import datetime
+import json
+import os
+import time
+from typing import Optional, Dict, Any, List, Iterable
+
+import numpy as np
+import pandas as pd
+
+from codage import Codeur
+from ia_model import calculer_tendances_vectorisees
+from pipeline_sirene import lire_par_blocs
+
+
+ORIGINE = np.datetime64("1900-01-01", "D")
+JOURS_MAX = np.iinfo(np.uint16).max  # dates jusqu'en 2079
+
+COLONNES_HISTORIQUE = [
+    "siren",
+    "dateDebut",
+    "etatAdministratifUniteLegale",
+    "categorieJuridiqueUniteLegale",
+    "activitePrincipaleUniteLegale",
+    "nomenclatureActivitePrincipaleUniteLegale",
+]
+
+# Colonne du stock -> nom de la modalité
+CODES = {
+    "activitePrincipaleUniteLegale": "naf",
+    "nomenclatureActivitePrincipaleUniteLegale": "nomenclature",
+    "categorieJuridiqueUniteLegale": "catjur",
+    "etatAdministratifUniteLegale": "etat",
+}
+
+# Colonnes NumPy de l'index -> dtype
+TABLEAUX = {
+    "sirens": np.uint32,
+    "debuts": np.uint32,
+    "jours": np.uint16,
+    "naf": np.int16,
+    "nomenclature": np.int8,
+    "catjur": np.int16,
+    "etat": np.int8,
+}
+
+TAILLE_LOT = 1_000_000
+
+
+def jours_depuis_origine(dates) -> np.ndarray:
+    """'2019-03-01' -> jours depuis ORIGINE (0 si date absente ou invalide)"""
+    dates = pd.to_datetime(pd.Series(dates, copy=False), format="%Y-%m-%d", errors="coerce")
+    jours = (dates.to_numpy("datetime64[D]") - ORIGINE).astype(np.int64)
+    return np.clip(np.where(dates.isna().to_numpy(), 0, jours), 0, JOURS_MAX)
+
+
+# ================== CONSTRUCTION ==================
+
+class _Assembleur:
+    """Accumule des blocs de périodes (colonnes du stock) puis produit les tableaux de l'index"""
+
+    def __init__(self):
+        self.codeurs = {nom: Codeur() for nom in CODES.values()}
+        self.blocs: Dict[str, List[np.ndarray]] = {cle: [] for cle in ("sirens", "dates", *CODES.values())}
+
+    def ajouter(self, bloc: pd.DataFrame):
+        self.blocs["sirens"].append(bloc["siren"].to_numpy(np.uint32))
+        self.blocs["dates"].append(jours_depuis_origine(bloc["dateDebut"]).astype(np.uint16))
+        for colonne, nom in CODES.items():
+            self.blocs[nom].append(self.codeurs[nom].coder(bloc[colonne]))
+
+    def tableaux(self) -> Dict[str, np.ndarray]:
+        colonnes = {
+            cle: np.concatenate(v) if v else np.empty(0, TABLEAUX.get(cle, np.uint16))
+            for cle, v in self.blocs.items()
+        }
+        # Le stock liste les périodes de la plus récente à la plus ancienne
+        ordre = np.lexsort((colonnes["dates"], colonnes["sirens"]))
+        colonnes = {cle: v[ordre] for cle, v in colonnes.items()}
+
+        sirens = colonnes["sirens"]
+        meme_siren = np.zeros(len(sirens), dtype=bool)
+        meme_siren[1:] = sirens[1:] == sirens[:-1]
+
+        # Période sans changement des colonnes conservées : fusionnée avec la précédente
+        inchangee = meme_siren.copy()
+        for nom in CODES.values():
+            inchangee[1:] &= colonnes[nom][1:] == colonnes[nom][:-1]
+        garder = ~inchangee
+        colonnes = {cle: v[garder] for cle, v in colonnes.items()}
+        meme_siren = meme_siren[garder]
+
+        dates = colonnes.pop("dates").astype(np.int64)
+        jours = dates.copy()
+        jours[1:] -= np.where(meme_siren[1:], dates[:-1], 0)
+
+        uniques, debuts = np.unique(colonnes.pop("sirens"), return_index=True)
+        tableaux = {
+            "sirens": uniques,
+            "debuts": np.append(debuts, len(jours)),
+            "jours": jours,
+            **colonnes,
+        }
+        return {cle: tableaux[cle].astype(dtype, copy=False) for cle, dtype in TABLEAUX.items()}
+
+    def modalites(self) -> Dict[str, List[str]]:
+        return {nom: codeur.modalites for nom, codeur in self.codeurs.items()}
+
+
+def construire(chemin_stock: str, sortie: str, taille_bloc: int = 500_000) -> Dict[str, Any]:
+    """Construit l'index en une passe sur StockUniteLegaleHistorique (CSV ou Parquet)"""
+    debut = time.perf_counter()
+    assembleur = _Assembleur()
+    for bloc in lire_par_blocs(chemin_stock, COLONNES_HISTORIQUE, taille_bloc):
+        assembleur.ajouter(bloc)
+
+    tableaux = assembleur.tableaux()
+    os.makedirs(sortie, exist_ok=True)
+    for cle, tableau in tableaux.items():
+        np.save(os.path.join(sortie, f"{cle}.npy"), tableau)
+    with open(os.path.join(sortie, "modalites.json"), "w", encoding="utf-8") as f:
+        json.dump(assembleur.modalites(), f)
+
+    return {
+        "sirens": len(tableaux["sirens"]),
+        "periodes": len(tableaux["jours"]),
+        "octets": sum(t.nbytes for t in tableaux.values()),
+        "duree": time.perf_counter() - debut,
+    }
+
+
+def depuis_unites_legales(unites_legales: Iterable[Dict[str, Any]]) -> "IndexHistorique":
+    """Index en mémoire depuis des réponses INSEE (periodesUniteLegale complètes, requête sans `date`)"""
+    lignes = [
+        {"siren": ul.get("siren"), **{c: p.get(c) for c in COLONNES_HISTORIQUE if c != "siren"}}
+        for ul in unites_legales
+        for p in ul.get("periodesUniteLegale") or []
+    ]
+    assembleur = _Assembleur()
+    assembleur.ajouter(pd.DataFrame(lignes, columns=COLONNES_HISTORIQUE))
+    return IndexHistorique(assembleur.tableaux(), assembleur.modalites())
+
+
+# ================== LECTURE ==================
+
+class IndexHistorique:
+    """
+    Usage :
+        index = IndexHistorique.ouvrir("index_historique/")   # mmap
+        index.periodes("552032534")                            # périodes décodées
+        index.tendances(sirens)                                # indicateurs + points, alignés sur `sirens`
+    """
+
+    def __init__(self, tableaux: Dict[str, np.ndarray], modalites: Dict[str, List[str]]):
+        self.tableaux = tableaux
+        self.modalites = modalites
+
+        # Division NAF de chaque modalité (le code -1 d'une valeur manquante pointe sur -1, ajouté en fin)
+        divisions = pd.Series(modalites["naf"], dtype=object).str[:2]
+        self._divisions = np.append(pd.factorize(divisions)[0], -1).astype(np.int16)
+        etats = modalites["etat"]
+        self._code_cessee = etats.index("C") if "C" in etats else -2
+
+    @classmethod
+    def ouvrir(cls, chemin: str) -> "IndexHistorique":
+        with open(os.path.join(chemin, "modalites.json"), encoding="utf-8") as f:
+            modalites = json.load(f)
+        tableaux = {cle: np.load(os.path.join(chemin, f"{cle}.npy"), mmap_mode="r") for cle in TABLEAUX}
+        return cls(tableaux, modalites)
+
+    def __len__(self) -> int:
+        return len(self.tableaux["sirens"])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(t.nbytes for t in self.tableaux.values())
+
+    def positions(self, sirens) -> np.ndarray:
+        """Position de chaque SIREN dans l'index, -1 s'il n'y figure pas"""
+        sirens = np.asarray(sirens).astype(np.uint32)
+        ref = self.tableaux["sirens"]
+        if len(ref) == 0:
+            return np.full(len(sirens), -1, np.int64)
+        pos = np.minimum(np.searchsorted(ref, sirens), len(ref) - 1)
+        return np.where(ref[pos] == sirens, pos, -1)
+
+    def _segments(self, positions: np.ndarray):
+        """Indices des périodes des SIREN `positions` (concaténées) et longueur de chaque segment"""
+        debuts = self.tableaux["debuts"][positions].astype(np.int64)
+        longueurs = self.tableaux["debuts"][positions + 1].astype(np.int64) - debuts
+        premiers = np.cumsum(longueurs) - longueurs
+        indices = np.arange(longueurs.sum()) + np.repeat(debuts - premiers, longueurs)
+        return indices, longueurs, premiers
+
+    def periodes(self, siren: str) -> Optional[pd.DataFrame]:
+        """Périodes décodées d'un SIREN, de la plus ancienne à la plus récente (None s'il est absent)"""
+        pos = self.positions([siren])
+        if pos[0] < 0:
+            return None
+        indices, _, _ = self._segments(pos)
+        dates = ORIGINE + np.cumsum(self.tableaux["jours"][indices].astype(np.int64)).astype("timedelta64[D]")
+        df = pd.DataFrame({"Début": np.where(dates == ORIGINE, np.datetime64("NaT"), dates)})
+        for nom, entete in (("naf", "Code NAF"), ("nomenclature", "Nomenclature"), ("catjur", "Catégorie juridique"), ("etat", "État")):
+            df[entete] = pd.Categorical.from_codes(self.tableaux[nom][indices].astype(np.int16), categories=self.modalites[nom])
+        return df
+
+    def _indicateurs(self, positions: np.ndarray, reference: int) -> Dict[str, np.ndarray]:
+        indices, longueurs, premiers = self._segments(positions)
+        if len(indices) == 0:
+            vide = np.empty(0, np.int64)
+            return {"nb_periodes": vide, "cessee": vide.astype(bool), "nb_cessations": vide,
+                    "nb_changements_secteur": vide, "jours_depuis_changement": vide}
+
+        jours = self.tableaux["jours"][indices].astype(np.int64)
+        cumul = np.cumsum(jours)
+        dates = cumul - np.repeat(cumul[premiers] - jours[premiers], longueurs)
+        derniers = premiers + longueurs - 1
+
+        # Transition k-1 -> k à l'intérieur d'un même SIREN
+        interne = np.ones(len(indices), dtype=bool)
+        interne[premiers] = False
+
+        etat = self.tableaux["etat"][indices]
+        fermee = etat == self._code_cessee
+        fermeture = interne & fermee & ~np.roll(fermee, 1)
+        # La fermeture définitive d'une unité cessée relève de `cessee` : seules
+        # les fermetures suivies d'une reprise sont des cessations passées
+        cessee = fermee[derniers]
+        derniere_fermeture = np.maximum.reduceat(np.where(fermeture, np.arange(len(indices)), -1), premiers)
+        fermeture[derniere_fermeture[cessee & (derniere_fermeture >= 0)]] = False
+
+        division = self._divisions[self.tableaux["naf"][indices]]
+        nomenclature = self.tableaux["nomenclature"][indices]
+        # Un passage NAFRev1 -> NAFRev2 est un reclassement, pas un changement d'activité
+        changement_secteur = (
+            interne
+            & (nomenclature == np.roll(nomenclature, 1))
+            & (division != np.roll(division, 1))
+            & (division >= 0)
+            & (np.roll(division, 1) >= 0)
+        )
+
+        return {
+            "nb_periodes": longueurs,
+            "cessee": cessee,
+            "nb_cessations": np.add.reduceat(fermeture.astype(np.int32), premiers),
+            "nb_changements_secteur": np.add.reduceat(changement_secteur.astype(np.int32), premiers),
+            # Première période de date inconnue : comptée depuis ORIGINE, donc stable
+            "jours_depuis_changement": reference - dates[derniers],
+        }
+
+    def tendances(self, sirens, date_reference: Optional[datetime.date] = None, taille_lot: int = TAILLE_LOT) -> pd.DataFrame:
+        """
+        Indicateurs de tendance et points (calculer_tendances_vectorisees) de
+        chaque SIREN, dans l'ordre de `sirens`. Un SIREN absent de l'index a
+        des indicateurs neutres (nb_periodes 0, ancienneté -1) et 0 point.
+        """
+        reference = int((np.datetime64(date_reference or datetime.date.today(), "D") - ORIGINE).astype(np.int64))
+        positions = self.positions(sirens)
+        trouves = np.flatnonzero(positions >= 0)
+
+        colonnes = {
+            "nb_periodes": np.zeros(len(positions), np.int32),
+            "cessee": np.zeros(len(positions), bool),
+            "nb_cessations": np.zeros(len(positions), np.int32),
+            "nb_changements_secteur": np.zeros(len(positions), np.int32),
+            "jours_depuis_changement": np.full(len(positions), -1, np.int32),
+        }
+        for a in range(0, len(trouves), taille_lot):
+            lot = trouves[a:a + taille_lot]
+            for cle, valeurs in self._indicateurs(positions[lot], reference).items():
+                colonnes[cle][lot] = valeurs
+
+        df = pd.DataFrame(colonnes)
+        df.insert(0, "siren", np.asarray(sirens))
+        df["tendance"] = calculer_tendances_vectorisees(
+            df["cessee"], df["nb_cessations"], df["nb_changements_secteur"], df["jours_depuis_changement"]
+        )
+        return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Historique compact des unités légales Sirene")
+    sous = parser.add_subparsers(dest="commande", required=True)
+
+    p_construire = sous.add_parser("construire", help="Construire l'index")
+    p_construire.add_argument("stock", help="StockUniteLegaleHistorique (CSV ou Parquet)")
+    p_construire.add_argument("sortie", help="Répertoire de l'index")
+    p_construire.add_argument("--taille-bloc", type=int, default=500_000)
+
+    p_tendance = sous.add_parser("tendance", help="Historique et tendance de SIREN")
+    p_tendance.add_argument("index", help="Répertoire de l'index")
+    p_tendance.add_argument("sirens", nargs="+")
+
+    args = parser.parse_args()
+
+    if args.commande == "construire":
+        bilan = construire(args.stock, args.sortie, args.taille_bloc)
+        print(
+            f"Index OK - {bilan['sirens']} SIREN, {bilan['periodes']} périodes, "
+            f"{bilan['octets'] / 1e6:.0f} Mo en {bilan['duree']:.1f}s"
+        )
+    else:
+        index = IndexHistorique.ouvrir(args.index)
+        for siren in args.sirens:
+            periodes = index.periodes(siren)
+            print(f"--- {siren}")
+            print(periodes.to_string(index=False) if periodes is not None else "absent de l'index")
+        print(index.tendances(args.sirens).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
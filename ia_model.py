@@ -1,121 +1,319 @@
-"""
-Modèle IA - Smart Business Directory
-Système de scoring rule-based pour l'évaluation d'entreprises
-
-Déployable sur AWS Lambda comme API serverless
-"""
-
-def calculer_score_sante_ia(effectif, nb_etab, naf):
-    """
-    Calcule un score de santé d'entreprise (0-100)
-    
-    Algorithme : Scoring pondéré sur 3 critères
-    - Effectif (30% du score) : Indicateur de maturité
-    - Établissements (20% du score) : Expansion géographique
-    - Secteur NAF (bonus/malus) : Risque sectoriel
-    
-    Args:
-        effectif (str): Code tranche effectif INSEE
-        nb_etab (int): Nombre d'établissements ouverts
-        naf (str): Code NAF de l'activité
-    
-    Returns:
-        int: Score entre 0 et 100
-    """
-    score = 50
-    
-    effectif_scores = {
-        "51": 30, "52": 30, "53": 30,
-        "42": 25, "41": 20,
-        "32": 15, "31": 10,
-        "22": 5, "21": 5,
-        "12": 2, "11": 2,
-        "00": 0, "01": 0, "02": 0, "03": 0
-    }
-    score += effectif_scores.get(str(effectif), 5)
-    
-    if nb_etab:
-        try:
-            score += min(20, int(nb_etab) * 2)
-        except:
-            pass
-    
-    if naf:
-        naf_prefix = str(naf)[:2]
-        secteur_risques = {
-            "47": -5, "56": -5,
-            "62": +10, "63": +10, "72": +10,
-        }
-        score += secteur_risques.get(naf_prefix, 0)
-    
-    return min(100, max(0, score))
-
-
-def interpreter_score(score):
-    """Interprétation du score"""
-    if score >= 80:
-        return "Excellente santé", "Entreprise solide avec fort potentiel"
-    elif score >= 60:
-        return "Bonne santé", "Entreprise stable"
-    elif score >= 40:
-        return "Santé moyenne", "Entreprise à surveiller"
-    else:
-        return "Santé fragile", "Entreprise à risque"
-
-
-# ===== AWS LAMBDA HANDLER =====
-
-def lambda_handler(event, context):
-    """
-    Point d'entrée pour AWS Lambda
-    
-    Event structure (JSON):
-    {
-        "effectif": "51",
-        "nb_etab": 10,
-        "naf": "6201Z"
-    }
-    
-    Returns (JSON):
-    {
-        "statusCode": 200,
-        "body": {
-            "score": 85,
-            "statut": "Excellente santé",
-            "description": "Entreprise solide"
-        }
-    }
-    """
-    try:
-        score = calculer_score_sante_ia(
-            effectif=event.get('effectif'),
-            nb_etab=event.get('nb_etab'),
-            naf=event.get('naf')
-        )
-        statut, description = interpreter_score(score)
-        
-        return {
-            'statusCode': 200,
-            'body': {
-                'score': score,
-                'statut': statut,
-                'description': description
-            }
-        }
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'body': {'error': str(e)}
-        }
-
-
-# Test local (si exécuté directement)
-if __name__ == "__main__":
-    # Test 1
-    score = calculer_score_sante_ia("51", 15, "6201Z")
-    print(f"Test 1 - Score : {score}/100")
-    
-    # Test 2 - Simulation Lambda
-    event = {"effectif": "51", "nb_etab": 15, "naf": "6201Z"}
-    result = lambda_handler(event, None)
-    print(f"Test 2 - Lambda : {result}")
+"""
+Modèle IA - Smart Business Directory
+Système de scoring rule-based pour l'évaluation d'entreprises
+
+Déployable sur AWS Lambda comme API serverless
+"""
+
+# Barèmes du scoring (partagés par le calcul unitaire et le calcul vectorisé)
+EFFECTIF_SCORES = {
+    "51": 30, "52": 30, "53": 30,
+    "42": 25, "41": 20,
+    "32": 15, "31": 10,
+    "22": 5, "21": 5,
+    "12": 2, "11": 2,
+    "00": 0, "01": 0, "02": 0, "03": 0
+}
+EFFECTIF_SCORE_DEFAUT = 5
+
+SECTEUR_RISQUES = {
+    "47": -5, "56": -5,
+    "62": +10, "63": +10, "72": +10,
+}
+
+
+def calculer_score_sante_ia(effectif, nb_etab, naf):
+    """
+    Calcule un score de santé d'entreprise (0-100)
+    
+    Algorithme : Scoring pondéré sur 3 critères
+    - Effectif (30% du score) : Indicateur de maturité
+    - Établissements (20% du score) : Expansion géographique
+    - Secteur NAF (bonus/malus) : Risque sectoriel
+    
+    Args:
+        effectif (str): Code tranche effectif INSEE
+        nb_etab (int): Nombre d'établissements ouverts
+        naf (str): Code NAF de l'activité
+    
+    Returns:
+        int: Score entre 0 et 100
+    """
+    score = 50
+    
+    score += EFFECTIF_SCORES.get(str(effectif), EFFECTIF_SCORE_DEFAUT)
+    
+    if nb_etab:
+        try:
+            score += min(20, int(nb_etab) * 2)
+        except:
+            pass
+    
+    if naf:
+        naf_prefix = str(naf)[:2]
+        score += SECTEUR_RISQUES.get(naf_prefix, 0)
+    
+    return min(100, max(0, score))
+
+
+def calculer_scores_vectorises(effectif, nb_etab, naf):
+    """
+    Version vectorisée de calculer_score_sante_ia pour les traitements de masse
+    
+    Args:
+        effectif (array-like): Codes tranche effectif INSEE
+        nb_etab (array-like): Nombres d'établissements ouverts
+        naf (array-like): Codes NAF
+    
+    Returns:
+        numpy.ndarray (uint8): Scores entre 0 et 100, mêmes règles que le calcul unitaire
+    """
+    # Import local : le handler Lambda n'utilise que le calcul unitaire
+    import numpy as np
+    import pandas as pd
+
+    effectif = pd.Series(effectif, copy=False)
+    nb_etab = pd.to_numeric(pd.Series(nb_etab, copy=False), errors="coerce").fillna(0)
+    naf = pd.Series(naf, copy=False)
+
+    score = np.full(len(effectif), 50, dtype=np.int16)
+    score += effectif.astype(str).map(EFFECTIF_SCORES).fillna(EFFECTIF_SCORE_DEFAUT).to_numpy(np.int16)
+    score += np.minimum(20, np.trunc(nb_etab.to_numpy(np.float64)) * 2).astype(np.int16)
+    score += naf.astype(str).str[:2].map(SECTEUR_RISQUES).fillna(0).to_numpy(np.int16)
+
+    return np.clip(score, 0, 100).astype(np.uint8)
+
+
+# Barème de tendance (historique des périodes INSEE, voir historique.py)
+TENDANCE_CESSEE = -30
+TENDANCE_PAR_CESSATION = -10          # fermetures passées suivies d'une reprise
+TENDANCE_CESSATIONS_MAX = -20
+TENDANCE_PAR_CHANGEMENT_SECTEUR = -5  # changement de division NAF
+TENDANCE_CHANGEMENTS_SECTEUR_MAX = -15
+TENDANCE_CHANGEMENT_RECENT = -5       # dernier changement il y a moins d'un an
+TENDANCE_STABILITE = +5               # aucun changement depuis dix ans
+JOURS_CHANGEMENT_RECENT = 365
+JOURS_STABILITE = 3650
+
+
+def calculer_tendance(cessee, nb_cessations, nb_changements_secteur, jours_depuis_changement):
+    """
+    Composante de tendance, à ajouter au Score Santé IA
+    
+    Args:
+        cessee (bool): Unité légale cessée dans sa dernière période
+        nb_cessations (int): Fermetures passées suivies d'une reprise
+        nb_changements_secteur (int): Changements de division NAF (même nomenclature)
+        jours_depuis_changement (int): Ancienneté de la dernière période, négative si inconnue
+    
+    Returns:
+        int: Points entre -70 et +5
+    """
+    points = TENDANCE_CESSEE if cessee else 0
+    points += max(TENDANCE_CESSATIONS_MAX, TENDANCE_PAR_CESSATION * int(nb_cessations or 0))
+    points += max(TENDANCE_CHANGEMENTS_SECTEUR_MAX, TENDANCE_PAR_CHANGEMENT_SECTEUR * int(nb_changements_secteur or 0))
+    
+    if jours_depuis_changement is not None and jours_depuis_changement >= 0:
+        if jours_depuis_changement < JOURS_CHANGEMENT_RECENT:
+            points += TENDANCE_CHANGEMENT_RECENT
+        elif jours_depuis_changement >= JOURS_STABILITE:
+            points += TENDANCE_STABILITE
+    
+    return points
+
+
+def calculer_tendances_vectorisees(cessee, nb_cessations, nb_changements_secteur, jours_depuis_changement):
+    """
+    Version vectorisée de calculer_tendance
+    
+    Returns:
+        numpy.ndarray (int8): Points de tendance, mêmes règles que le calcul unitaire
+    """
+    import numpy as np
+
+    cessee = np.asarray(cessee, dtype=bool)
+    nb_cessations = np.asarray(nb_cessations, dtype=np.int32)
+    nb_changements_secteur = np.asarray(nb_changements_secteur, dtype=np.int32)
+    jours = np.asarray(jours_depuis_changement, dtype=np.int64)
+
+    points = np.where(cessee, TENDANCE_CESSEE, 0).astype(np.int16)
+    points += np.maximum(TENDANCE_CESSATIONS_MAX, TENDANCE_PAR_CESSATION * nb_cessations).astype(np.int16)
+    points += np.maximum(TENDANCE_CHANGEMENTS_SECTEUR_MAX, TENDANCE_PAR_CHANGEMENT_SECTEUR * nb_changements_secteur).astype(np.int16)
+    points += np.where((jours >= 0) & (jours < JOURS_CHANGEMENT_RECENT), TENDANCE_CHANGEMENT_RECENT, 0).astype(np.int16)
+    points += np.where(jours >= JOURS_STABILITE, TENDANCE_STABILITE, 0).astype(np.int16)
+
+    return points.astype(np.int8)
+
+
+def interpreter_score(score):
+    """Interprétation du score"""
+    if score >= 80:
+        return "Excellente santé", "Entreprise solide avec fort potentiel"
+    elif score >= 60:
+        return "Bonne santé", "Entreprise stable"
+    elif score >= 40:
+        return "Santé moyenne", "Entreprise à surveiller"
+    else:
+        return "Santé fragile", "Entreprise à risque"
+
+
+def libelle_division(naf):
+    """Libellé officiel de la division NAF, si la nomenclature est livrée avec le module"""
+    try:
+        from nomenclature_naf import libelle
+    except ImportError:
+        return None
+    division = libelle(str(naf)[:2]) if naf else None
+    return division[:1].lower() + division[1:] if division else None
+
+
+def generer_resume_ia(nom, naf, effectif, nb_etab):
+    """Génère un résumé intelligent automatique"""
+    
+    # Mapping secteurs NAF
+    secteurs = {
+        "01": "agriculture et élevage", "02": "sylviculture", "03": "pêche",
+        "05": "extraction minière", "10": "industries agroalimentaires",
+        "13": "fabrication de textiles", "14": "industrie de l'habillement",
+        "20": "industrie chimique", "21": "industrie pharmaceutique",
+        "26": "fabrication de produits électroniques", "27": "fabrication d'équipements électriques",
+        "28": "fabrication de machines et équipements", "29": "industrie automobile",
+        "30": "fabrication de matériels de transport", "41": "construction de bâtiments",
+        "43": "travaux de construction spécialisés", "45": "commerce et réparation automobiles",
+        "46": "commerce de gros", "47": "commerce de détail",
+        "49": "transports terrestres", "50": "transports par eau", "51": "transports aériens",
+        "55": "hébergement", "56": "restauration",
+        "58": "édition", "59": "production audiovisuelle", "60": "programmation et diffusion",
+        "61": "télécommunications", "62": "programmation et conseil informatique",
+        "63": "services d'information", "64": "activités financières",
+        "65": "assurance", "66": "activités auxiliaires financières et assurance",
+        "68": "activités immobilières", "69": "activités juridiques et comptables",
+        "70": "activités de conseil et de gestion", "71": "activités d'architecture et d'ingénierie",
+        "72": "recherche-développement scientifique", "73": "publicité et études de marché",
+        "74": "autres activités spécialisées", "77": "activités de location",
+        "78": "activités liées à l'emploi", "80": "enquêtes et sécurité",
+        "85": "enseignement", "86": "activités pour la santé humaine",
+        "87": "hébergement médico-social", "88": "action sociale",
+        "90": "activités créatives, artistiques et de spectacle",
+        "91": "bibliothèques, archives, musées", "93": "activités sportives",
+        "95": "réparation d'ordinateurs", "96": "autres services personnels",
+    }
+    
+    secteur_desc = secteurs.get(str(naf)[:2]) or libelle_division(naf) or "activités économiques diversifiées"
+    
+    # Mapping effectif détaillé
+    tailles = {
+        "51": ("grande entreprise", "plus de 250 salariés", "d'envergure majeure"),
+        "52": ("grande entreprise", "plus de 500 salariés", "d'envergure nationale"),
+        "53": ("très grande entreprise", "plus de 2000 salariés", "de dimension internationale"),
+        "42": ("entreprise de taille intermédiaire (ETI)", "entre 100 et 199 salariés", "bien structurée"),
+        "41": ("entreprise moyenne", "entre 50 et 99 salariés", "en développement soutenu"),
+        "32": ("PME", "entre 20 et 49 salariés", "solidement établie"),
+        "31": ("PME", "entre 10 et 19 salariés", "en phase de consolidation"),
+        "22": ("TPE", "entre 6 et 9 salariés", "à taille humaine"),
+        "21": ("TPE", "entre 3 et 5 salariés", "agile et réactive"),
+        "12": ("micro-entreprise", "1 à 2 salariés", "de type entrepreneurial"),
+        "11": ("micro-entreprise", "1 salarié", "en mode startup"),
+        "00": ("structure", "sans salarié déclaré", "en phase de lancement"),
+        "01": ("entreprise individuelle", "sans salarié", "indépendante"),
+        "02": ("entreprise individuelle", "1 ou 2 salariés", "en croissance"),
+        "03": ("petite structure", "3 à 5 salariés", "en développement"),
+    }
+    
+    taille_info = tailles.get(str(effectif), ("entreprise", "effectif variable", "active"))
+    taille, detail_effectif, qualificatif = taille_info
+    
+    # Construction du résumé élaboré
+    resume = f"{nom} est une {taille} ({detail_effectif}) {qualificatif} spécialisée dans {secteur_desc}. "
+    
+    # Expansion géographique
+    try:
+        nb = int(nb_etab) if nb_etab else 1
+        if nb > 50:
+            resume += f"Son réseau de {nb} établissements témoigne d'une implantation territoriale exceptionnelle et d'une stratégie d'expansion ambitieuse. "
+        elif nb > 20:
+            resume += f"Avec {nb} établissements répartis sur le territoire, elle bénéficie d'une présence géographique significative. "
+        elif nb > 10:
+            resume += f"Sa présence à travers {nb} établissements illustre une stratégie de développement multi-sites réussie. "
+        elif nb > 5:
+            resume += f"Disposant de {nb} établissements, elle affiche une expansion géographique progressive. "
+        elif nb > 1:
+            resume += f"Elle opère depuis {nb} établissements, permettant une proximité régionale. "
+        else:
+            resume += "Structure centralisée sur un établissement unique, favorisant une gestion directe et réactive. "
+    except:
+        resume += "Organisation établie avec une structure opérationnelle cohérente. "
+    
+    # Analyse prédictive avancée basée sur score
+    score = calculer_score_sante_ia(effectif, nb_etab, naf)
+    
+    if score >= 85:
+        resume += "Les indicateurs structurels révèlent une entreprise au profil exceptionnel, combinant taille critique, expansion territoriale et positionnement sectoriel favorable, suggérant un potentiel de croissance élevé et une résilience remarquable."
+    elif score >= 70:
+        resume += "L'analyse des données met en évidence des fondamentaux solides, avec une structure robuste et un positionnement stratégique pertinent, laissant présager une trajectoire de développement positive et une stabilité financière durable."
+    elif score >= 55:
+        resume += "Les critères évalués indiquent une situation stable, avec des bases saines permettant d'envisager des opportunités de développement à moyen terme, sous réserve d'une gestion proactive et adaptée aux évolutions du marché."
+    elif score >= 40:
+        resume += "Le profil actuel suggère une phase de vigilance, nécessitant une attention particulière aux équilibres opérationnels et financiers, avec des marges d'optimisation identifiées dans l'organisation ou le positionnement sectoriel."
+    else:
+        resume += "Les indicateurs appellent à une surveillance accrue, dans un contexte où les facteurs structurels (taille, secteur, maillage territorial) présentent des fragilités potentielles requérant un pilotage stratégique renforcé."
+    
+    return resume
+
+
+# ===== AWS LAMBDA HANDLER =====
+
+def lambda_handler(event, context):
+    """
+    Point d'entrée pour AWS Lambda
+    
+    Event structure (JSON):
+    {
+        "effectif": "51",
+        "nb_etab": 10,
+        "naf": "6201Z"
+    }
+    
+    Returns (JSON):
+    {
+        "statusCode": 200,
+        "body": {
+            "score": 85,
+            "statut": "Excellente santé",
+            "description": "Entreprise solide"
+        }
+    }
+    """
+    try:
+        score = calculer_score_sante_ia(
+            effectif=event.get('effectif'),
+            nb_etab=event.get('nb_etab'),
+            naf=event.get('naf')
+        )
+        statut, description = interpreter_score(score)
+        
+        return {
+            'statusCode': 200,
+            'body': {
+                'score': score,
+                'statut': statut,
+                'description': description
+            }
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': {'error': str(e)}
+        }
+
+
+# Test local (si exécuté directement)
+if __name__ == "__main__":
+    # Test 1
+    score = calculer_score_sante_ia("51", 15, "6201Z")
+    print(f"Test 1 - Score : {score}/100")
+    
+    # Test 2 - Simulation Lambda
+    event = {"effectif": "51", "nb_etab": 15, "naf": "6201Z"}
+    result = lambda_handler(event, None)
+    print(f"Test 2 - Lambda : {result}")
@@ -0,0 +1,91 @@
+"""
+Identifiants - Smart Business Directory
+Contrôle local des SIREN et SIRET (clé de Luhn), avant tout appel réseau
+
+SIREN (9 chiffres) et SIRET (14 chiffres) portent une clé de Luhn : une faute
+de frappe ou une inversion de chiffres est détectée sans interroger INSEE.
+Exception connue : les établissements de La Poste (SIREN 356000000), dont la
+somme des chiffres du SIRET est un multiple de 5.
+"""
+
+import re
+from typing import List, NamedTuple
+
+
+SIREN_LA_POSTE = "356000000"
+
+
+class IdentifiantInvalide(ValueError):
+    """SIREN / SIRET mal formé : rejeté sans requête"""
+
+
+def nettoyer(saisie: str) -> str:
+    """'552 032 534' -> '552032534' (espaces, points et tirets ignorés)"""
+    return re.sub(r"[\s.\-]", "", saisie or "")
+
+
+def luhn_valide(chiffres: str) -> bool:
+    total = 0
+    for i, c in enumerate(reversed(chiffres)):
+        n = int(c)
+        if i % 2:
+            n = n * 2 - 9 if n > 4 else n * 2
+        total += n
+    return total % 10 == 0
+
+
+def siren_valide(siren: str) -> bool:
+    return len(siren) == 9 and siren.isdigit() and luhn_valide(siren)
+
+
+def siret_valide(siret: str) -> bool:
+    if len(siret) != 14 or not siret.isdigit():
+        return False
+    if siret.startswith(SIREN_LA_POSTE):
+        return sum(map(int, siret)) % 5 == 0
+    return siren_valide(siret[:9]) and luhn_valide(siret)
+
+
+def valider_siren(saisie: str) -> str:
+    siren = nettoyer(saisie)
+    if not siren_valide(siren):
+        raise IdentifiantInvalide(f"SIREN invalide : {saisie} (9 chiffres, clé de contrôle incorrecte ?)")
+    return siren
+
+
+def valider_siret(saisie: str) -> str:
+    siret = nettoyer(saisie)
+    if not siret_valide(siret):
+        raise IdentifiantInvalide(f"SIRET invalide : {saisie} (14 chiffres, clé de contrôle incorrecte ?)")
+    return siret
+
+
+class Saisie(NamedTuple):
+    sirens: List[str]
+    sirets: List[str]
+    invalides: List[str]
+
+
+def analyser_saisie(texte: str) -> Saisie:
+    """
+    Liste libre (virgules, points-virgules, espaces, retours à la ligne)
+    triée en SIREN et SIRET valides, sans doublon, et entrées rejetées.
+    """
+    sirens, sirets, invalides = {}, {}, []
+    for morceau in re.split(r"[,;\n\t]+", texte or ""):
+        # '552 032 534' est un SIREN groupé, '552032534 443061841' deux SIREN
+        candidats = [morceau] if siren_valide(nettoyer(morceau)) or siret_valide(nettoyer(morceau)) else morceau.split()
+        for candidat in candidats:
+            identifiant = nettoyer(candidat)
+            if siren_valide(identifiant):
+                sirens[identifiant] = None
+            elif siret_valide(identifiant):
+                sirets[identifiant] = None
+            elif identifiant:
+                invalides.append(candidat.strip())
+    return Saisie(list(sirens), list(sirets), invalides)
+
+
+def sirens_de(saisie: Saisie) -> List[str]:
+    """SIREN saisis et SIREN des SIRET saisis, dans l'ordre, sans doublon"""
+    return list(dict.fromkeys(saisie.sirens + [s[:9] for s in saisie.sirets]))
@@ -0,0 +1,173 @@
+"""
+Mémoire - Smart Business Directory
+Comptabilité mémoire par recherche et par session, budget par session
+
+Chaque recherche mémorisée par ResultatsSession est comptée pour la taille de
+la valeur conservée (taille_estimee) : une mesure tracemalloc de l'appel
+imputerait à la recherche les allocations des autres threads et des caches
+construits au passage.
+
+Au-delà du budget de la session, BudgetSession libère dans l'ordre :
+1. les données brutes (JSON compressé pour st.json) des recherches, des plus
+   anciennes aux plus récentes ;
+2. les classeurs Excel de la session : la session cesse de les retenir, le
+   cache d'exports partagé ne les retire que si aucune autre session ne les
+   retient (sinon ils restent en mémoire et ne comptent pas comme libérés) ;
+3. les recherches qui ne sont plus affichées, des plus anciennes aux plus récentes.
+Les recherches affichées par un mode ne sont jamais évincées.
+
+tracemalloc ne sert qu'aux principaux postes du processus : démarré à la
+demande depuis le panneau mémoire, ou dès le lancement avec SBD_SUIVI_MEMOIRE=1.
+"""
+
+import os
+import sys
+import tracemalloc
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Suivi tracemalloc dès le lancement (sinon à la demande : ralentit toutes les allocations)
+SUIVI_MEMOIRE = os.getenv("SBD_SUIVI_MEMOIRE", "0") == "1"
+
+BUDGET_MEMOIRE_SESSION = int(float(os.getenv("SBD_BUDGET_MEMOIRE_SESSION", "64")) * 1024 * 1024)  # Mo
+
+NB_POSTES = 10
+
+
+def demarrer_suivi(nb_frames: int = 1) -> bool:
+    """Démarre tracemalloc (1 frame par allocation : surcoût limité) ; True s'il ne tournait pas"""
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(nb_frames)
+    return True
+
+
+def arreter_suivi():
+    """Arrête un suivi démarré à la demande (pas celui de SBD_SUIVI_MEMOIRE=1)"""
+    if tracemalloc.is_tracing() and not SUIVI_MEMOIRE:
+        tracemalloc.stop()
+
+
+def taille_estimee(valeur: Any, _vus: Optional[set] = None) -> int:
+    """Taille récursive approximative (ResultSet, DataFrame, tableaux, conteneurs)"""
+    vus = _vus if _vus is not None else set()
+    if id(valeur) in vus:
+        return 0
+    vus.add(id(valeur))
+
+    if hasattr(valeur, "liberer_bruts") and hasattr(valeur, "nbytes"):
+        return valeur.nbytes
+    if isinstance(valeur, (pd.DataFrame, pd.Series)):
+        return int(np.sum(valeur.memory_usage(deep=True)))
+    if isinstance(valeur, np.ndarray):
+        return valeur.nbytes
+    taille = sys.getsizeof(valeur)
+    if isinstance(valeur, dict):
+        taille += sum(taille_estimee(k, vus) + taille_estimee(v, vus) for k, v in valeur.items())
+    elif isinstance(valeur, (list, tuple, set, frozenset)):
+        taille += sum(taille_estimee(v, vus) for v in valeur)
+    return taille
+
+
+def principaux_postes(n: int = NB_POSTES) -> List[Dict[str, Any]]:
+    """Lignes de code retenant le plus de mémoire dans le processus (instantané tracemalloc)"""
+    if not tracemalloc.is_tracing():
+        return []
+    instantane = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+    return [
+        {"ligne": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "octets": stat.size, "blocs": stat.count}
+        for stat in instantane.statistics("lineno")[:n]
+    ]
+
+
+class BudgetSession:
+    """
+    Budget mémoire d'une session : recherches de `magasin` (ResultatsSession)
+    et exports soumis par la session à `exports` (FileExports partagée).
+
+    Usage :
+        budget.noter_export(cle)
+        budget.appliquer()        # après chaque recherche
+    """
+
+    def __init__(self, magasin, exports=None, budget: int = BUDGET_MEMOIRE_SESSION):
+        self.magasin = magasin
+        self.exports = exports
+        self.budget = budget
+        self._cles_exports: "OrderedDict[str, None]" = OrderedDict()
+        self.evictions = {"bruts": 0, "exports": 0, "recherches": 0}
+        self.octets_liberes = 0
+
+    def noter_export(self, cle: str):
+        self._cles_exports[cle] = None
+        self._cles_exports.move_to_end(cle)
+        if self.exports is not None:
+            self.exports.retenir(cle, self)
+
+    def _octets_exports(self) -> List[Tuple[str, int]]:
+        if self.exports is None:
+            return []
+        tailles = [(cle, self.exports.taille(cle)) for cle in self._cles_exports]
+        # Export évincé du cache partagé par ailleurs : plus à la charge de la session
+        for cle, taille in tailles:
+            if taille is None:
+                self._cles_exports.pop(cle, None)
+        return [(cle, taille) for cle, taille in tailles if taille is not None]
+
+    def utilisation(self) -> Dict[str, Any]:
+        recherches = self.magasin.empreintes()
+        exports = self._octets_exports()
+        total = sum(r["octets"] for r in recherches) + sum(t for _, t in exports)
+        return {
+            "octets": total,
+            "budget": self.budget,
+            "taux": total / self.budget if self.budget else 0.0,
+            "recherches": recherches,
+            "exports": len(exports),
+            "octets_exports": sum(t for _, t in exports),
+            "evictions": dict(self.evictions),
+            "octets_liberes": self.octets_liberes,
+        }
+
+    def appliquer(self) -> int:
+        """Libère jusqu'à repasser sous le budget ; renvoie le nombre d'octets libérés"""
+        depassement = self.utilisation()["octets"] - self.budget
+        liberes = 0
+
+        # 1. Données brutes, des recherches les plus anciennes aux plus récentes
+        for empreinte in self.magasin.empreintes():
+            if liberes >= depassement:
+                break
+            if empreinte["bruts"]:
+                liberes += self.magasin.liberer_bruts(empreinte["cle"])
+                self.evictions["bruts"] += 1
+
+        # 2. Exports de la session : retirés du cache partagé s'ils ne servent
+        #    plus à aucune autre session
+        for cle, _ in self._octets_exports():
+            if liberes >= depassement:
+                break
+            retires = self.exports.liberer(cle, self)
+            self._cles_exports.pop(cle, None)
+            if retires:
+                liberes += retires
+                self.evictions["exports"] += 1
+
+        # 3. Recherches qui ne sont plus affichées
+        for empreinte in self.magasin.empreintes():
+            if liberes >= depassement:
+                break
+            if not empreinte["affichee"]:
+                liberes += self.magasin.evincer(empreinte["cle"])
+                self.evictions["recherches"] += 1
+
+        self.octets_liberes += liberes
+        return liberes
@@ -0,0 +1,177 @@
+"""
+Nomenclature NAF - Smart Business Directory
+Table locale de la NAF rév. 2 (INSEE) : validation, suggestions, jokers, libellés
+
+naf_rev2.csv contient les 1 728 postes des cinq niveaux (21 sections,
+88 divisions, 272 groupes, 615 classes, 732 sous-classes) avec leur parent et
+leur libellé officiel. Chargée une fois en dictionnaires :
+- libellé, niveau et parent de n'importe quel code en O(1) ;
+- sous-classes de chaque poste précalculées, pour développer un code partiel
+  ou un motif à jokers en liste exacte sans appel réseau.
+"""
+
+import csv
+import difflib
+import fnmatch
+import os
+import re
+from functools import lru_cache
+from typing import Optional, Dict, List, Tuple
+
+from codage import normaliser_texte
+
+
+CHEMIN_NOMENCLATURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "naf_rev2.csv")
+
+NIVEAUX = ("section", "division", "groupe", "classe", "sous_classe")
+
+
+class CodeNafInvalide(ValueError):
+    """Code absent de la nomenclature ; `suggestions` liste les codes proches"""
+
+    def __init__(self, saisie: str, suggestions: List[str], message: Optional[str] = None):
+        self.saisie = saisie
+        self.suggestions = suggestions
+        message = message or f"Code NAF inconnu : {saisie}"
+        if suggestions:
+            message += " – vouliez-vous dire " + ", ".join(suggestions) + " ?"
+        super().__init__(message)
+
+
+class Nomenclature:
+    def __init__(self, chemin: str = CHEMIN_NOMENCLATURE):
+        self.libelles: Dict[str, str] = {}
+        self.niveaux: Dict[str, str] = {}
+        self.parents: Dict[str, str] = {}
+        self.sous_classes_de: Dict[str, List[str]] = {}
+
+        with open(chemin, encoding="utf-8", newline="") as f:
+            for ligne in csv.DictReader(f, delimiter=";"):
+                code = ligne["code"]
+                self.libelles[code] = ligne["libelle"]
+                self.niveaux[code] = ligne["niveau"]
+                if ligne["parent"]:
+                    self.parents[code] = ligne["parent"]
+
+        self.sous_classes: List[str] = sorted(c for c, n in self.niveaux.items() if n == "sous_classe")
+        for code in self.sous_classes:
+            poste = code
+            while poste:
+                self.sous_classes_de.setdefault(poste, []).append(code)
+                poste = self.parents.get(poste)
+
+        # Formes compactes (6201Z, 6201, 620) -> code officiel, pour les suggestions
+        self.formes_compactes: Dict[str, str] = {c.replace(".", ""): c for c in self.libelles}
+
+
+@lru_cache(maxsize=1)
+def nomenclature() -> Nomenclature:
+    return Nomenclature()
+
+
+def normaliser_code(saisie: str) -> str:
+    """Forme officielle d'une saisie : 6201Z -> 62.01Z, 620 -> 62.0, section j -> J"""
+    code = re.sub(r"\s+", "", (saisie or "").upper())
+    if code.startswith("SECTION"):
+        code = code[len("SECTION"):]
+    if "." not in code and len(code) >= 3 and code[:2].isdigit() and code[2].isalnum():
+        code = code[:2] + "." + code[2:]
+    return code
+
+
+def est_motif(code: str) -> bool:
+    return "*" in code or "?" in code
+
+
+def libelle(code: Optional[str]) -> Optional[str]:
+    """Libellé officiel d'un code de n'importe quel niveau (None si inconnu)"""
+    if not code:
+        return None
+    return nomenclature().libelles.get(normaliser_code(code))
+
+
+def niveau(code: str) -> Optional[str]:
+    return nomenclature().niveaux.get(normaliser_code(code))
+
+
+def hierarchie(code: str) -> List[Tuple[str, str]]:
+    """[(code, libellé)] de la section jusqu'au code lui-même"""
+    nom = nomenclature()
+    code = normaliser_code(code)
+    chaine = []
+    while code in nom.libelles:
+        chaine.append((code, nom.libelles[code]))
+        code = nom.parents.get(code)
+    return chaine[::-1]
+
+
+def suggerer(saisie: str, n: int = 5) -> List[str]:
+    """Codes proches d'une saisie invalide (forme du code) ou dont le libellé contient les mots saisis"""
+    nom = nomenclature()
+    code = normaliser_code(saisie)
+
+    if re.search(r"[A-Z]{2,}", code):
+        mots = normaliser_texte(saisie).split()
+        return [c for c in nom.sous_classes if all(m in normaliser_texte(nom.libelles[c]) for m in mots)][:n]
+
+    # Ressemblance des formes compactes, bonus à la même division (inversions de chiffres)
+    compact = code.replace(".", "")
+    proximite = difflib.SequenceMatcher(b=compact, autojunk=False)
+    notes = []
+    for forme, officiel in nom.formes_compactes.items():
+        proximite.set_seq1(forme)
+        note = proximite.ratio() + 0.2 * (forme[:2] == compact[:2]) + 0.1 * (len(forme) == len(compact))
+        notes.append((note, officiel))
+    notes.sort(key=lambda x: -x[0])
+    return [officiel for note, officiel in notes[:n] if note >= 0.6]
+
+
+def valider(saisie: str) -> str:
+    """Code officiel d'une saisie exacte ; lève CodeNafInvalide (avec suggestions) sinon"""
+    code = normaliser_code(saisie)
+    if code not in nomenclature().libelles:
+        raise CodeNafInvalide(saisie, suggerer(saisie))
+    return code
+
+
+def developper(saisie: str) -> List[str]:
+    """
+    Sous-classes couvertes par une saisie : code exact, poste de niveau
+    supérieur (62, 62.0, J) ou motif à jokers (62*, 62.0?, 47.1*).
+
+    Un motif s'applique aux préfixes des codes : 62.0? couvre les sous-classes
+    des classes 62.01 à 62.09. Lève CodeNafInvalide si rien ne correspond, ou
+    pour un joker seul (*, ?) qui couvrirait toute la nomenclature.
+    """
+    nom = nomenclature()
+    code = normaliser_code(saisie)
+
+    if est_motif(code) and not code.replace("*", "").replace("?", "").replace(".", ""):
+        raise CodeNafInvalide(saisie, [], f"Motif trop large : {saisie} (précisez au moins une section ou un chiffre)")
+
+    if not est_motif(code):
+        return list(nom.sous_classes_de[valider(saisie)])
+
+    resultat = [
+        sc for sc in nom.sous_classes
+        if any(fnmatch.fnmatchcase(sc[:n], code) for n in range(1, len(sc) + 1))
+    ]
+    if not resultat:
+        raise CodeNafInvalide(saisie, suggerer(code.replace("*", "").replace("?", "")))
+    return resultat
+
+
+def motifs_couvrants(codes: List[str]) -> List[str]:
+    """
+    Écriture compacte d'une liste de sous-classes : un poste entièrement
+    couvert devient un motif (62*, 47.1*), le reste reste en codes exacts.
+    """
+    nom = nomenclature()
+    restants = set(codes)
+    motifs = []
+    for niveau_poste in ("division", "groupe", "classe"):
+        for poste, sous_classes in nom.sous_classes_de.items():
+            if nom.niveaux[poste] == niveau_poste and len(sous_classes) > 1 and restants.issuperset(sous_classes):
+                motifs.append(poste + "*")
+                restants.difference_update(sous_classes)
+    return sorted(motifs) + sorted(restants)
@@ -0,0 +1,338 @@
+"""
+Pipeline de scoring hors ligne - Smart Business Directory
+Score et résumé IA de toutes les entreprises actives du stock Sirene
+
+1. Comptage des établissements ouverts par SIREN (StockEtablissement), en un
+   passage par blocs ; résultat mis en cache dans sortie/_comptes/ (ignoré par
+   les lecteurs Parquet).
+2. Lecture par blocs du stock des unités légales (StockUniteLegale), jointure
+   sur les comptes, scoring vectorisé + résumés répartis sur un pool de
+   processus, un fichier Parquet par bloc.
+3. Optionnel (--historique) : composante de tendance lue dans l'index
+   d'historique (historique.py), ajoutée au score de chaque bloc.
+
+La mémoire reste bornée : taille de bloc fixe, au plus 2 blocs en vol par
+worker. Les blocs déjà écrits sont sautés : un run interrompu reprend là où il
+s'est arrêté. La reprise n'a lieu que si sortie/_manifeste.json (fichiers
+d'entrée avec taille et date, taille de bloc, options) correspond au run
+demandé ; sinon le run est refusé, ou refait de zéro avec --recommencer.
+
+Usage :
+    python pipeline_sirene.py StockUniteLegale_utf8.csv StockEtablissement_utf8.csv sortie/
+        [--workers 8] [--taille-bloc 500000] [--sans-resume] [--historique index_historique/] [--recommencer]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional, Dict, Any, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from ia_model import calculer_scores_vectorises, generer_resume_ia, interpreter_score
+
+
+COLONNES_UL = [
+    "siren",
+    "denominationUniteLegale",
+    "nomUniteLegale",
+    "prenom1UniteLegale",
+    "etatAdministratifUniteLegale",
+    "categorieJuridiqueUniteLegale",
+    "activitePrincipaleUniteLegale",
+    "trancheEffectifsUniteLegale",
+]
+
+COLONNES_ETAB = ["siren", "etatAdministratifEtablissement"]
+
+FICHIERS_COMPTES = {"sirens": "_comptes/sirens.npy", "comptes": "_comptes/etablissements_ouverts.npy"}
+FICHIER_MANIFESTE = "_manifeste.json"
+
+
+class ManifesteIncompatible(RuntimeError):
+    """Le répertoire de sortie contient un run lancé avec d'autres entrées ou options"""
+
+
+# ================== LECTURE DU STOCK ==================
+
+def lire_par_blocs(chemin: str, colonnes: List[str], taille_bloc: int) -> Iterator[pd.DataFrame]:
+    """Lit un fichier du stock Sirene (CSV ou Parquet) par blocs de colonnes utiles"""
+    if chemin.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(chemin).iter_batches(batch_size=taille_bloc, columns=colonnes):
+            yield batch.to_pandas().astype(object)
+    else:
+        yield from pd.read_csv(chemin, usecols=colonnes, dtype=str, chunksize=taille_bloc)
+
+
+def compter_etablissements(chemin_etab: str, taille_bloc: int) -> Dict[str, np.ndarray]:
+    """SIREN (uint32, triés) et nombre d'établissements ouverts de chacun"""
+    sirens_blocs = []
+    comptes_blocs = []
+
+    for bloc in lire_par_blocs(chemin_etab, COLONNES_ETAB, taille_bloc):
+        ouverts = bloc.loc[bloc["etatAdministratifEtablissement"] == "A", "siren"]
+        sirens, comptes = np.unique(ouverts.to_numpy(np.uint32), return_counts=True)
+        sirens_blocs.append(sirens)
+        comptes_blocs.append(comptes.astype(np.uint32))
+
+    if not sirens_blocs:
+        return {"sirens": np.empty(0, np.uint32), "comptes": np.empty(0, np.uint32)}
+
+    # Un même SIREN peut chevaucher deux blocs : agrégation finale
+    sirens, inverse = np.unique(np.concatenate(sirens_blocs), return_inverse=True)
+    comptes = np.bincount(inverse, weights=np.concatenate(comptes_blocs)).astype(np.uint32)
+    return {"sirens": sirens, "comptes": comptes}
+
+
+# ================== WORKER ==================
+
+_COMPTES: Optional[Dict[str, np.ndarray]] = None
+_HISTORIQUE = None
+
+
+def _initialiser_worker(sortie: str, chemin_historique: Optional[str] = None):
+    # Chargement en mmap : les pages sont partagées entre workers via le cache OS
+    global _COMPTES, _HISTORIQUE
+    _COMPTES = {
+        cle: np.load(os.path.join(sortie, fichier), mmap_mode="r")
+        for cle, fichier in FICHIERS_COMPTES.items()
+    }
+    if chemin_historique:
+        from historique import IndexHistorique
+
+        _HISTORIQUE = IndexHistorique.ouvrir(chemin_historique)
+
+
+def joindre_comptes(sirens: np.ndarray, comptes: Dict[str, np.ndarray]) -> np.ndarray:
+    """Nombre d'établissements ouverts de chaque SIREN (0 si absent)"""
+    ref = comptes["sirens"]
+    if len(ref) == 0:
+        return np.zeros(len(sirens), np.uint32)
+    pos = np.minimum(np.searchsorted(ref, sirens), len(ref) - 1)
+    return np.where(ref[pos] == sirens, comptes["comptes"][pos], 0).astype(np.uint32)
+
+
+def denominations(bloc: pd.DataFrame) -> pd.Series:
+    """Dénomination, ou « prénom nom » d'une personne physique"""
+    return bloc["denominationUniteLegale"].fillna(
+        (bloc["prenom1UniteLegale"].fillna("") + " " + bloc["nomUniteLegale"].fillna("")).str.strip()
+    )
+
+
+def scorer_bloc(bloc: pd.DataFrame, comptes: Dict[str, np.ndarray], avec_resume: bool = True, historique=None) -> pd.DataFrame:
+    """Jointure, score (+ tendance si `historique`) et résumé d'un bloc d'unités légales actives"""
+    bloc = bloc[bloc["etatAdministratifUniteLegale"] == "A"]
+
+    sirens = bloc["siren"].to_numpy(np.uint32)
+    nb_etab = joindre_comptes(sirens, comptes)
+
+    nom = denominations(bloc)
+    effectif = bloc["trancheEffectifsUniteLegale"].fillna("00")
+    naf = bloc["activitePrincipaleUniteLegale"]
+
+    scores = calculer_scores_vectorises(effectif.to_numpy(), nb_etab, naf.to_numpy())
+    if historique is not None:
+        tendance = historique.tendances(sirens)["tendance"].to_numpy()
+        scores = np.clip(scores.astype(np.int16) + tendance, 0, 100).astype(np.uint8)
+
+    # Une seule interprétation par valeur de score possible
+    statuts = np.array([interpreter_score(s)[0] for s in range(101)], dtype=object)
+
+    resultat = pd.DataFrame({
+        "siren": bloc["siren"].to_numpy(),
+        "denomination": nom.to_numpy(),
+        "naf": pd.Categorical(naf),
+        "categorie_juridique": pd.Categorical(bloc["categorieJuridiqueUniteLegale"]),
+        "tranche_effectif": pd.Categorical(effectif),
+        "nb_etablissements_ouverts": nb_etab,
+        "score": scores,
+        "statut": pd.Categorical(statuts[scores]),
+    })
+
+    if historique is not None:
+        resultat.insert(resultat.columns.get_loc("score"), "tendance", tendance)
+
+    if avec_resume:
+        resultat["resume"] = [
+            generer_resume_ia(n, f or "N/A", e, nb)
+            for n, f, e, nb in zip(resultat["denomination"], naf.to_numpy(), effectif.to_numpy(), nb_etab)
+        ]
+
+    return resultat
+
+
+def chemin_partition(sortie: str, numero: int) -> str:
+    return os.path.join(sortie, f"bloc={numero:05d}", "part.parquet")
+
+
+def traiter_bloc(numero: int, bloc: pd.DataFrame, sortie: str, avec_resume: bool) -> Dict[str, Any]:
+    """Tâche exécutée dans un worker ; écriture atomique de la partition"""
+    debut = time.perf_counter()
+    resultat = scorer_bloc(bloc, _COMPTES, avec_resume, _HISTORIQUE)
+
+    chemin = chemin_partition(sortie, numero)
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    tmp = chemin + ".tmp"
+    resultat.to_parquet(tmp, index=False)
+    os.replace(tmp, chemin)
+
+    return {
+        "bloc": numero,
+        "pid": os.getpid(),
+        "lues": len(bloc),
+        "lignes": len(resultat),
+        "duree": time.perf_counter() - debut,
+    }
+
+
+# ================== ORCHESTRATION ==================
+
+def signature(chemin: str) -> Dict[str, Any]:
+    """Chemin absolu, taille et date de modification (un index : ses fichiers)"""
+    chemin = os.path.abspath(chemin)
+    if os.path.isdir(chemin):
+        return {
+            "chemin": chemin,
+            "fichiers": {nom: signature(os.path.join(chemin, nom)) for nom in sorted(os.listdir(chemin))},
+        }
+    etat = os.stat(chemin)
+    return {"chemin": chemin, "taille": etat.st_size, "mtime": etat.st_mtime_ns}
+
+
+def preparer_sortie(sortie: str, manifeste: Dict[str, Any], recommencer: bool = False):
+    """
+    Compare le run demandé au manifeste du répertoire de sortie : reprise si
+    identique, ManifesteIncompatible sinon (ou remise à zéro avec `recommencer`).
+    """
+    os.makedirs(sortie, exist_ok=True)
+    chemin = os.path.join(sortie, FICHIER_MANIFESTE)
+    existant = None
+    if os.path.exists(chemin):
+        with open(chemin, encoding="utf-8") as f:
+            existant = json.load(f)
+    partitions = [nom for nom in os.listdir(sortie) if nom.startswith("bloc=")]
+
+    if existant == manifeste:
+        return
+    if (existant is not None or partitions) and not recommencer:
+        raise ManifesteIncompatible(
+            f"{sortie} contient un run lancé avec d'autres entrées ou options "
+            "(stocks modifiés, taille de bloc, historique, résumés) : --recommencer pour le refaire"
+        )
+
+    # Partitions et comptes d'un autre run : supprimés avant d'écrire le nouveau manifeste
+    for nom in partitions + ["_comptes"]:
+        shutil.rmtree(os.path.join(sortie, nom), ignore_errors=True)
+    with open(chemin + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifeste, f, indent=2)
+    os.replace(chemin + ".tmp", chemin)
+
+
+def executer(
+    chemin_ul: str,
+    chemin_etab: str,
+    sortie: str,
+    workers: int = os.cpu_count() or 1,
+    taille_bloc: int = 500_000,
+    avec_resume: bool = True,
+    chemin_historique: Optional[str] = None,
+    recommencer: bool = False,
+) -> Dict[str, Any]:
+    preparer_sortie(sortie, {
+        "unites_legales": signature(chemin_ul),
+        "etablissements": signature(chemin_etab),
+        "taille_bloc": taille_bloc,
+        "avec_resume": avec_resume,
+        "historique": signature(chemin_historique) if chemin_historique else None,
+    }, recommencer)
+    debut = time.perf_counter()
+
+    chemins_comptes = {cle: os.path.join(sortie, fichier) for cle, fichier in FICHIERS_COMPTES.items()}
+    if not all(os.path.exists(c) for c in chemins_comptes.values()):
+        comptes = compter_etablissements(chemin_etab, taille_bloc)
+        os.makedirs(os.path.join(sortie, "_comptes"), exist_ok=True)
+        for cle, chemin in chemins_comptes.items():
+            np.save(chemin + ".tmp.npy", comptes[cle])
+            os.replace(chemin + ".tmp.npy", chemin)
+        print(f"Comptes établissements : {len(comptes['sirens'])} SIREN en {time.perf_counter() - debut:.1f}s")
+
+    par_worker = defaultdict(lambda: {"lues": 0, "lignes": 0, "duree": 0.0})
+    nb_sautes = 0
+    en_vol = set()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initialiser_worker, initargs=(sortie, chemin_historique)) as pool:
+        for numero, bloc in enumerate(lire_par_blocs(chemin_ul, COLONNES_UL, taille_bloc)):
+            if os.path.exists(chemin_partition(sortie, numero)):
+                nb_sautes += 1
+                continue
+
+            # Contre-pression : au plus 2 blocs par worker en mémoire
+            while len(en_vol) >= 2 * workers:
+                termines, en_vol = wait(en_vol, return_when=FIRST_COMPLETED)
+                _collecter(termines, par_worker)
+
+            en_vol.add(pool.submit(traiter_bloc, numero, bloc, sortie, avec_resume))
+
+        _collecter(wait(en_vol).done, par_worker)
+
+    duree = time.perf_counter() - debut
+    total = sum(w["lignes"] for w in par_worker.values())
+    lues = sum(w["lues"] for w in par_worker.values())
+    print(
+        f"Terminé : {total} entreprises actives écrites ({lues} lignes lues) en {duree:.1f}s "
+        f"({lues / max(duree, 1e-9):,.0f} lignes lues/s), {nb_sautes} bloc(s) déjà traités"
+    )
+    for pid, w in sorted(par_worker.items()):
+        print(f"  worker {pid} : {w['lignes']} écrites / {w['lues']} lues, {w['lues'] / max(w['duree'], 1e-9):,.0f} lignes lues/s")
+
+    return {"lignes": total, "lues": lues, "duree": duree, "blocs_sautes": nb_sautes, "workers": dict(par_worker)}
+
+
+def _collecter(termines, par_worker):
+    for future in termines:
+        r = future.result()
+        par_worker[r["pid"]]["lues"] += r["lues"]
+        par_worker[r["pid"]]["lignes"] += r["lignes"]
+        par_worker[r["pid"]]["duree"] += r["duree"]
+        print(
+            f"Bloc {r['bloc']:05d} : {r['lignes']} écrites / {r['lues']} lues, "
+            f"{r['lues'] / max(r['duree'], 1e-9):,.0f} lignes lues/s (worker {r['pid']})"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring hors ligne du stock Sirene")
+    parser.add_argument("stock_unites_legales", help="StockUniteLegale (CSV ou Parquet)")
+    parser.add_argument("stock_etablissements", help="StockEtablissement (CSV ou Parquet)")
+    parser.add_argument("sortie", help="Répertoire de sortie Parquet partitionné")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--taille-bloc", type=int, default=500_000)
+    parser.add_argument("--sans-resume", action="store_true", help="Ne pas générer les résumés IA")
+    parser.add_argument("--historique", default=None, help="Index d'historique (historique.py) : score avec tendance")
+    parser.add_argument("--recommencer", action="store_true", help="Refaire le run si la sortie provient d'autres entrées ou options")
+    args = parser.parse_args()
+
+    try:
+        executer(
+            args.stock_unites_legales,
+            args.stock_etablissements,
+            args.sortie,
+            workers=args.workers,
+            taille_bloc=args.taille_bloc,
+            avec_resume=not args.sans_resume,
+            chemin_historique=args.historique,
+            recommencer=args.recommencer,
+        )
+    except ManifesteIncompatible as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Jeu de résultats - Smart Business Directory
+Conteneur colonnaire compact partagé par les quatre modes de recherche
+
+Chaque colonne est un tableau NumPy typé à capacité croissante :
+- NAF, catégorie juridique, tranche d'effectif : catégories (codes int8/int16)
+- Score : uint8, Statut : énumération (int8)
+- Établissements : int32 avec masque de valeurs manquantes
+Les données brutes des API sont conservées compressées (zlib) et ne sont
+décompressées qu'à l'ouverture d'une ligne.
+
+La conversion en DataFrame / table Arrow réutilise directement ces tableaux.
+"""
+
+import json
+import sys
+import zlib
+from enum import IntEnum
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+
+class Statut(IntEnum):
+    """Bandes de interpreter_score"""
+    EXCELLENTE = 0
+    BONNE = 1
+    MOYENNE = 2
+    FRAGILE = 3
+
+    @classmethod
+    def depuis_score(cls, score: int) -> "Statut":
+        if score >= 80:
+            return cls.EXCELLENTE
+        elif score >= 60:
+            return cls.BONNE
+        elif score >= 40:
+            return cls.MOYENNE
+        return cls.FRAGILE
+
+
+LIBELLES_STATUT = ["🟢 Excellente santé", "🟡 Bonne santé", "🟠 Santé moyenne", "🔴 Santé fragile"]
+
+
+# Type de stockage de chaque champ connu
+TYPES_CHAMPS = {
+    "siren": "texte",
+    "siret": "texte",
+    "siret_siege": "texte",
+    "nom": "texte",
+    "adresse": "texte",
+    "naf": "categorie",
+    "catjur": "categorie",
+    "tranche_effectif": "categorie",
+    "etat": "categorie",
+    "siege": "categorie",
+    "nb_etab": "entier",
+    "score": "score",
+    "statut": "statut",
+}
+
+# Colonnes (champ -> en-tête d'export) de chaque mode
+COLONNES_SIREN = {
+    "siren": "SIREN",
+    "nom": "Nom / Dénomination",
+    "naf": "Code NAF",
+    "catjur": "Catégorie juridique",
+    "tranche_effectif": "Tranche effectif salarié",
+    "nb_etab": "Établissements ouverts",
+    "score": "Score Santé IA",
+    "statut": "Statut",
+}
+
+COLONNES_SIRET = {
+    "siret": "SIRET",
+    "siren": "SIREN",
+    "naf": "Activité principale",
+    "tranche_effectif": "Tranche effectif salarié",
+    "nb_etab": "Établissements ouverts",
+    "score": "Score Santé IA",
+    "statut": "Statut",
+}
+
+COLONNES_NAF = COLONNES_SIREN
+
+# Mode établissements : tranche de l'établissement, score de l'unité légale
+COLONNES_ETABLISSEMENTS = {
+    "siret": "SIRET",
+    "siren": "SIREN",
+    "nom": "Enseigne / Dénomination",
+    "adresse": "Commune",
+    "siege": "Siège",
+    "etat": "État administratif",
+    "naf": "Code NAF",
+    "tranche_effectif": "Tranche effectif salarié",
+    "nb_etab": "Établissements ouverts",
+    "score": "Score Santé IA",
+    "statut": "Statut",
+}
+
+COLONNES_NOM = {
+    "nom": "Nom complet",
+    "siren": "SIREN",
+    "siret_siege": "SIRET siège",
+    "adresse": "Adresse siège",
+    "naf": "Code NAF",
+    "tranche_effectif": "Tranche effectif salarié",
+    "nb_etab": "Établissements ouverts",
+    "score": "Score Santé IA",
+    "statut": "Statut",
+}
+
+
+class _Colonne:
+    """Tableau NumPy à capacité doublée ; les vues [:n] restent valides après croissance"""
+
+    def __init__(self, dtype, remplissage, capacite: int = 16):
+        self.data = np.full(capacite, remplissage, dtype=dtype)
+        self.remplissage = remplissage
+        self.n = 0
+
+    def ajouter(self, valeur):
+        if self.n == len(self.data):
+            data = np.full(len(self.data) * 2, self.remplissage, dtype=self.data.dtype)
+            data[:self.n] = self.data[:self.n]
+            self.data = data
+        self.data[self.n] = valeur
+        self.n += 1
+
+    def convertir(self, dtype):
+        self.data = self.data.astype(dtype)
+
+    def vue(self) -> np.ndarray:
+        return self.data[:self.n]
+
+
+class _ColonneCategorielle:
+    """Dictionnaire de modalités + codes (-1 = manquant), en int8 puis int16 au besoin"""
+
+    def __init__(self):
+        self.codes = _Colonne(np.int8, -1)
+        self.modalites: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def ajouter(self, valeur):
+        if valeur is None or valeur == "":
+            self.codes.ajouter(-1)
+            return
+        valeur = str(valeur)
+        code = self.index.get(valeur)
+        if code is None:
+            code = len(self.modalites)
+            # Même seuil que pandas pour choisir la largeur des codes
+            if code == np.iinfo(np.int8).max:
+                self.codes.convertir(np.int16)
+            self.index[valeur] = code
+            self.modalites.append(valeur)
+        self.codes.ajouter(code)
+
+    def valeur(self, i: int) -> Optional[str]:
+        code = self.codes.data[i]
+        return self.modalites[code] if code >= 0 else None
+
+    def categorical(self) -> pd.Categorical:
+        return pd.Categorical.from_codes(self.codes.vue(), dtype=pd.CategoricalDtype(self.modalites))
+
+
+class ResultSet:
+    """
+    Résultats d'une recherche, construits ligne à ligne par les modes.
+
+    Usage :
+        rs = ResultSet(COLONNES_NOM)
+        rs.ajouter(brut=r, siren=..., nom=..., score=..., ...)
+        df = rs.to_dataframe()
+    """
+
+    def __init__(self, colonnes: Dict[str, str]):
+        self.colonnes = dict(colonnes)
+        self._data: Dict[str, Any] = {}
+        self._bruts: List[Optional[bytes]] = []
+
+        for champ in self.colonnes:
+            type_champ = TYPES_CHAMPS[champ]
+            if type_champ == "texte":
+                self._data[champ] = _Colonne(object, None)
+            elif type_champ == "categorie":
+                self._data[champ] = _ColonneCategorielle()
+            elif type_champ == "entier":
+                self._data[champ] = (_Colonne(np.int32, 0), _Colonne(np.bool_, True))
+            elif type_champ == "score":
+                self._data[champ] = _Colonne(np.uint8, 0)
+            elif type_champ == "statut":
+                self._data[champ] = _Colonne(np.int8, -1)
+
+    def __len__(self) -> int:
+        return len(self._bruts)
+
+    def ajouter(self, brut: Optional[Dict[str, Any]] = None, **valeurs):
+        """Ajoute une ligne ; le statut est déduit du score s'il n'est pas fourni"""
+        for champ, colonne in self._data.items():
+            type_champ = TYPES_CHAMPS[champ]
+            valeur = valeurs.get(champ)
+
+            if type_champ == "entier":
+                valeurs_col, masque = colonne
+                try:
+                    valeurs_col.ajouter(int(valeur))
+                    masque.ajouter(False)
+                except (TypeError, ValueError):
+                    valeurs_col.ajouter(0)
+                    masque.ajouter(True)
+            elif type_champ == "score":
+                colonne.ajouter(min(100, max(0, int(valeur or 0))))
+            elif type_champ == "statut":
+                if valeur is None:
+                    valeur = Statut.depuis_score(int(valeurs.get("score") or 0))
+                elif isinstance(valeur, str):
+                    valeur = LIBELLES_STATUT.index(valeur)
+                colonne.ajouter(int(valeur))
+            else:
+                colonne.ajouter(valeur)
+
+        self._bruts.append(zlib.compress(json.dumps(brut).encode()) if brut is not None else None)
+
+    def valeur(self, i: int, champ: str):
+        colonne = self._data[champ]
+        type_champ = TYPES_CHAMPS[champ]
+
+        if type_champ == "categorie":
+            return colonne.valeur(i)
+        if type_champ == "entier":
+            valeurs_col, masque = colonne
+            return None if masque.data[i] else int(valeurs_col.data[i])
+        if type_champ == "score":
+            return int(colonne.data[i])
+        if type_champ == "statut":
+            return LIBELLES_STATUT[colonne.data[i]]
+        return colonne.data[i]
+
+    def ligne(self, i: int) -> Dict[str, Any]:
+        """Ligne i avec les en-têtes d'export, valeurs manquantes à None"""
+        return {libelle: self.valeur(i, champ) for champ, libelle in self.colonnes.items()}
+
+    def brut(self, i: int) -> Optional[Dict[str, Any]]:
+        donnees = self._bruts[i]
+        return json.loads(zlib.decompress(donnees)) if donnees is not None else None
+
+    def liberer_bruts(self) -> int:
+        """Supprime les données brutes conservées ; renvoie le nombre d'octets libérés"""
+        liberes = self.nbytes_bruts
+        self._bruts = [None] * len(self._bruts)
+        return liberes
+
+    @property
+    def nbytes_bruts(self) -> int:
+        return sum(len(b) for b in self._bruts if b is not None)
+
+    @property
+    def nbytes(self) -> int:
+        """Taille approximative du stockage, chaînes des colonnes texte et modalités comprises"""
+        total = self.nbytes_bruts
+        for colonne in self._data.values():
+            if isinstance(colonne, tuple):
+                total += sum(c.data.nbytes for c in colonne)
+            elif isinstance(colonne, _ColonneCategorielle):
+                total += colonne.codes.data.nbytes + sum(sys.getsizeof(m) for m in colonne.modalites)
+            else:
+                total += colonne.data.nbytes
+                if colonne.data.dtype == object:
+                    total += sum(sys.getsizeof(v) for v in colonne.vue() if v is not None)
+        return total
+
+    def _serie(self, champ: str):
+        colonne = self._data[champ]
+        type_champ = TYPES_CHAMPS[champ]
+
+        if type_champ == "categorie":
+            return colonne.categorical()
+        if type_champ == "entier":
+            valeurs_col, masque = colonne
+            return pd.arrays.IntegerArray(valeurs_col.vue(), masque.vue())
+        if type_champ == "statut":
+            return pd.Categorical.from_codes(colonne.vue(), dtype=pd.CategoricalDtype(LIBELLES_STATUT))
+        return colonne.vue()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """DataFrame adossé aux tableaux du jeu de résultats (sans recopie des colonnes)"""
+        return pd.DataFrame(
+            {libelle: self._serie(champ) for champ, libelle in self.colonnes.items()},
+            copy=False,
+        )
+
+    def to_arrow(self):
+        """Table Arrow : colonnes numériques et codes de catégories partagés sans recopie"""
+        import pyarrow as pa
+
+        colonnes = {}
+        for champ, libelle in self.colonnes.items():
+            serie = self._serie(champ)
+            type_champ = TYPES_CHAMPS[champ]
+
+            if isinstance(serie, pd.Categorical):
+                codes = serie.codes
+                colonnes[libelle] = pa.DictionaryArray.from_arrays(
+                    pa.array(codes, mask=codes < 0),
+                    pa.array(list(serie.categories), type=pa.string()),
+                )
+            elif type_champ == "entier":
+                colonnes[libelle] = pa.array(serie._data, mask=serie._mask)
+            else:
+                colonnes[libelle] = pa.array(serie)
+
+        return pa.table(colonnes)
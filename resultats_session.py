@@ -0,0 +1,150 @@
+"""
+Résultats de session - Smart Business Directory
+Résultats de recherche conservés par session, ré-affichés sans appel amont
+
+Chaque recherche est mémorisée sous une clé (mode, requête, filtres) avec ses
+scores et résumés :
+- les reruns Streamlit (tri, pagination, sélection, téléchargement) ré-affichent
+  l'entrée courante du mode au lieu de la perdre ;
+- relancer une recherche identique pendant la durée de vie de l'entrée la sert
+  depuis la session, sans requête INSEE ni data.gouv.
+Magasin LRU borné en nombre d'entrées, un par session (st.session_state).
+Chaque entrée est comptée pour sa taille (memoire.taille_estimee) : le budget
+mémoire de la session (memoire.BudgetSession) libère ses données brutes ou l'évince.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, List, Tuple
+
+from memoire import taille_estimee
+
+
+NB_RESULTATS_SESSION = int(os.getenv("SBD_RESULTATS_SESSION", "16"))
+
+# Au-delà, une recherche identique interroge à nouveau les API
+DUREE_VIE_RESULTATS = float(os.getenv("SBD_DUREE_VIE_RESULTATS", "900"))
+
+
+def _normaliser(valeur: Any) -> Any:
+    if isinstance(valeur, str):
+        valeur = " ".join(valeur.split()).upper()
+    if valeur in ("", None):
+        return None
+    if isinstance(valeur, (list, tuple, set)):
+        return tuple(sorted(_normaliser(v) for v in valeur))
+    return valeur
+
+
+def _jeux_resultats(valeur: Any) -> List[Any]:
+    """ResultSet contenus dans une valeur mémorisée (elle-même ou les valeurs de son dictionnaire)"""
+    candidats = valeur.values() if isinstance(valeur, dict) else [valeur]
+    return [v for v in candidats if hasattr(v, "liberer_bruts")]
+
+
+def cle_requete(mode: str, **criteres) -> Tuple:
+    """Clé d'une recherche : mode + critères (casse, espaces et vides neutralisés)"""
+    return (mode,) + tuple(sorted((nom, _normaliser(v)) for nom, v in criteres.items()))
+
+
+class ResultatsSession:
+    """
+    Usage :
+        valeur = magasin.rechercher(cle, lambda: appel_amont(...))
+        valeur = magasin.courant("naf")   # dernière recherche du mode, à chaque rerun
+    """
+
+    def __init__(self, capacite: int = NB_RESULTATS_SESSION, duree_vie: float = DUREE_VIE_RESULTATS):
+        self.capacite = capacite
+        self.duree_vie = duree_vie
+        self._entrees: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._courantes: Dict[str, Tuple] = {}
+        self._octets: Dict[Tuple, int] = {}
+        self.servies = 0
+        self.calculees = 0
+
+    def __len__(self) -> int:
+        return len(self._entrees)
+
+    def obtenir(self, cle: Tuple) -> Optional[Any]:
+        entree = self._entrees.get(cle)
+        if entree is None:
+            return None
+        horodatage, valeur = entree
+        if time.monotonic() - horodatage > self.duree_vie:
+            return None
+        self._entrees.move_to_end(cle)
+        return valeur
+
+    def enregistrer(self, cle: Tuple, valeur: Any, octets: Optional[int] = None):
+        self._entrees[cle] = (time.monotonic(), valeur)
+        self._entrees.move_to_end(cle)
+        self._octets[cle] = octets if octets and octets > 0 else taille_estimee(valeur)
+        self._courantes[cle[0]] = cle
+        while len(self._entrees) > self.capacite:
+            self.evincer(next(iter(self._entrees)))
+
+    def rechercher(self, cle: Tuple, calculer: Callable[[], Any]) -> Any:
+        """Valeur mémorisée si encore valide, sinon `calculer()` (appels amont) puis mémorisée"""
+        valeur = self.obtenir(cle)
+        if valeur is not None:
+            self.servies += 1
+            self._courantes[cle[0]] = cle
+            return valeur
+
+        valeur = calculer()
+        self.calculees += 1
+        self.enregistrer(cle, valeur)
+        return valeur
+
+    def courant(self, mode: str) -> Optional[Any]:
+        """Dernière recherche affichée du mode (même expirée : elle reste à l'écran)"""
+        cle = self._courantes.get(mode)
+        entree = self._entrees.get(cle) if cle is not None else None
+        return entree[1] if entree is not None else None
+
+    def oublier(self, mode: str):
+        """Le mode n'affiche plus rien (recherche en erreur)"""
+        self._courantes.pop(mode, None)
+
+    def evincer(self, cle: Tuple) -> int:
+        """Retire une entrée ; renvoie sa taille mesurée"""
+        self._entrees.pop(cle, None)
+        self._courantes = {m: c for m, c in self._courantes.items() if c != cle}
+        return self._octets.pop(cle, 0)
+
+    def liberer_bruts(self, cle: Tuple) -> int:
+        """Libère les données brutes (ResultSet.liberer_bruts) d'une entrée ; renvoie les octets libérés"""
+        entree = self._entrees.get(cle)
+        if entree is None:
+            return 0
+        valeur = entree[1]
+        liberes = sum(v.liberer_bruts() for v in _jeux_resultats(valeur))
+        self._octets[cle] = max(0, self._octets.get(cle, 0) - liberes)
+        return liberes
+
+    def empreintes(self) -> List[Dict[str, Any]]:
+        """Taille de chaque entrée, de la moins récemment utilisée à la plus récente"""
+        affichees = set(self._courantes.values())
+        return [
+            {
+                "cle": cle,
+                "mode": cle[0],
+                "requete": ", ".join(f"{nom}={v}" for nom, v in cle[1:] if v is not None),
+                "octets": self._octets.get(cle, 0),
+                "bruts": any(v.nbytes_bruts for v in _jeux_resultats(valeur)),
+                "affichee": cle in affichees,
+            }
+            for cle, (_, valeur) in self._entrees.items()
+        ]
+
+    def statistiques(self) -> Dict[str, Any]:
+        total = self.servies + self.calculees
+        return {
+            "entrees": len(self._entrees),
+            "capacite": self.capacite,
+            "servies": self.servies,
+            "calculees": self.calculees,
+            "taux_servies": self.servies / total if total else 0.0,
+        }
@@ -0,0 +1,191 @@
+"""
+Entreprises similaires - Smart Business Directory
+Recherche des k plus proches pairs d'une entreprise dans la base locale
+
+Chaque entreprise est un vecteur float32 :
+- NAF : plongement hiérarchique (division, groupe, classe, sous-classe), un
+  bloc par niveau tiré d'un générateur initialisé par le code lui-même ;
+  deux codes partageant plus de niveaux sont donc plus proches ;
+- tranche d'effectif (barème EFFECTIF_SCORES), établissements ouverts
+  (échelle log) et Score Santé IA, mêmes entrées que calculer_score_sante_ia.
+
+Index par seaux de division NAF : les vecteurs sont triés par division et une
+requête ne parcourt que son seau, par paquets, en force brute NumPy. Un seau
+trop petit pour fournir k pairs élargit la recherche à toute la base.
+"""
+
+import math
+import zlib
+from typing import Optional, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from ia_model import calculer_scores_vectorises, EFFECTIF_SCORES, EFFECTIF_SCORE_DEFAUT
+from resultats import LIBELLES_STATUT, Statut
+
+
+DIM_NIVEAU = 8
+
+# Poids de chaque niveau NAF et de chaque critère numérique
+POIDS_NAF = {"division": 1.0, "groupe": 0.6, "classe": 0.4, "sous_classe": 0.2}
+POIDS_EFFECTIF = 0.8
+POIDS_ETABLISSEMENTS = 0.6
+POIDS_SCORE = 0.5
+
+# Échelle log des établissements : 1000 établissements ~ 1
+LOG_ETAB_MAX = math.log1p(1000)
+
+TAILLE_PAQUET = 65_536
+
+DIMENSION = DIM_NIVEAU * len(POIDS_NAF) + 3
+
+
+def niveaux_naf(naf: Optional[str]) -> List[str]:
+    """'62.01Z' -> ['62', '62.0', '62.01', '62.01Z']"""
+    naf = (naf or "").strip().upper()
+    return [naf[:2], naf[:4], naf[:5], naf]
+
+
+def _vecteur_code(niveau: str, code: str) -> np.ndarray:
+    # Déterministe d'un processus à l'autre (pas de hash() salé)
+    rng = np.random.default_rng(zlib.crc32(f"{niveau}:{code}".encode()))
+    v = rng.standard_normal(DIM_NIVEAU)
+    return (v / np.linalg.norm(v)).astype(np.float32)
+
+
+def plonger_naf(nafs) -> np.ndarray:
+    """Plongement hiérarchique d'un tableau de codes NAF (un calcul par code distinct)"""
+    nafs = pd.Series(nafs, copy=False).astype(object).fillna("").astype(str)
+    uniques, inverse = np.unique(nafs.to_numpy(), return_inverse=True)
+
+    blocs = np.zeros((len(uniques), DIM_NIVEAU * len(POIDS_NAF)), dtype=np.float32)
+    for i, code in enumerate(uniques):
+        if not code:
+            continue
+        for j, ((niveau, poids), valeur) in enumerate(zip(POIDS_NAF.items(), niveaux_naf(code))):
+            blocs[i, j * DIM_NIVEAU:(j + 1) * DIM_NIVEAU] = poids * _vecteur_code(niveau, valeur)
+    return blocs[inverse]
+
+
+def vecteurs(nafs, tranches, nb_etab, scores) -> np.ndarray:
+    """Matrice (n, DIMENSION) des profils"""
+    tranches = pd.Series(tranches, copy=False).astype(object).fillna("00").astype(str)
+    nb_etab = pd.to_numeric(pd.Series(nb_etab, copy=False), errors="coerce").fillna(0).to_numpy(np.float64)
+
+    effectif = tranches.map(EFFECTIF_SCORES).fillna(EFFECTIF_SCORE_DEFAUT).to_numpy(np.float32) / 30
+    etab = np.minimum(np.log1p(np.maximum(nb_etab, 0)) / LOG_ETAB_MAX, 1.5).astype(np.float32)
+    score = np.asarray(scores, dtype=np.float32) / 100
+
+    return np.hstack([
+        plonger_naf(nafs),
+        (POIDS_EFFECTIF * effectif)[:, None],
+        (POIDS_ETABLISSEMENTS * etab)[:, None],
+        (POIDS_SCORE * score)[:, None],
+    ]).astype(np.float32)
+
+
+class IndexPairs:
+    """
+    Index k-NN : `voisins(siren, k)` ou `voisins_profil(naf, tranche, nb_etab, score, k)`.
+    """
+
+    def __init__(self, profils: pd.DataFrame):
+        profils = profils.assign(division=profils["naf"].fillna("").astype(str).str[:2])
+        profils = profils.sort_values("division", kind="stable").reset_index(drop=True)
+
+        self.sirens = profils["siren"].to_numpy()
+        self.noms = profils["denomination"].to_numpy()
+        self.nafs = pd.Categorical(profils["naf"])
+        self.tranches = pd.Categorical(profils["tranche_effectif"])
+        self.nb_etab = profils["nb_etab"].to_numpy(np.int32)
+        self.scores = profils["score"].to_numpy(np.uint8)
+        self.matrice = vecteurs(profils["naf"], profils["tranche_effectif"], self.nb_etab, self.scores)
+        self.normes = np.einsum("ij,ij->i", self.matrice, self.matrice)
+
+        self.position_siren: Dict[str, int] = {s: i for i, s in enumerate(self.sirens)}
+        self.divisions = profils["division"].to_numpy()
+        uniques, debuts = np.unique(self.divisions, return_index=True)
+        fins = np.append(debuts[1:], len(self.divisions))
+        self.seaux: Dict[str, tuple] = {d: (int(a), int(b)) for d, a, b in zip(uniques, debuts, fins)}
+
+    def __len__(self) -> int:
+        return len(self.sirens)
+
+    def _plus_proches(self, v: np.ndarray, debut: int, fin: int, k: int, exclure: Optional[int]):
+        """k plus proches de v dans [debut, fin), par paquets (mémoire bornée)"""
+        meilleures_d = np.empty(0, np.float32)
+        meilleures_p = np.empty(0, np.int64)
+        norme_v = float(v @ v)
+
+        for a in range(debut, fin, TAILLE_PAQUET):
+            b = min(a + TAILLE_PAQUET, fin)
+            d = self.normes[a:b] - 2 * (self.matrice[a:b] @ v) + norme_v
+            p = np.arange(a, b)
+            if exclure is not None and a <= exclure < b:
+                d[exclure - a] = np.inf
+
+            d = np.concatenate([meilleures_d, d])
+            p = np.concatenate([meilleures_p, p])
+            if len(d) > k:
+                garder = np.argpartition(d, k)[:k]
+                d, p = d[garder], p[garder]
+            meilleures_d, meilleures_p = d, p
+
+        ordre = np.argsort(meilleures_d, kind="stable")
+        return np.maximum(meilleures_d[ordre], 0), meilleures_p[ordre]
+
+    def _recherche(self, v: np.ndarray, division: str, k: int, exclure: Optional[int]) -> pd.DataFrame:
+        debut, fin = self.seaux.get(division, (0, 0))
+        if fin - debut - (exclure is not None) < k:
+            debut, fin = 0, len(self)
+
+        distances, positions = self._plus_proches(v, debut, fin, k, exclure)
+        distances, positions = distances[np.isfinite(distances)], positions[np.isfinite(distances)]
+
+        scores = self.scores[positions]
+        statuts = np.array([Statut.depuis_score(int(s)) for s in range(101)], dtype=np.int8)[scores]
+        return pd.DataFrame({
+            "SIREN": self.sirens[positions],
+            "Nom / Dénomination": self.noms[positions],
+            "Code NAF": self.nafs[positions],
+            "Tranche effectif salarié": self.tranches[positions],
+            "Établissements ouverts": self.nb_etab[positions],
+            "Score Santé IA": scores,
+            "Statut": pd.Categorical.from_codes(statuts, categories=LIBELLES_STATUT),
+            "Similarité": np.round(1 / (1 + np.sqrt(distances)), 3),
+        })
+
+    def voisins(self, siren: str, k: int = 10) -> Optional[pd.DataFrame]:
+        """Pairs d'un SIREN de l'index (None s'il n'y figure pas)"""
+        i = self.position_siren.get(siren)
+        if i is None:
+            return None
+        return self._recherche(self.matrice[i], self.divisions[i], k, exclure=i)
+
+    def voisins_profil(self, naf, tranche, nb_etab, score, k: int = 10, siren: Optional[str] = None) -> pd.DataFrame:
+        """Pairs d'un profil calculé à la volée (entreprise absente de l'index)"""
+        v = vecteurs([naf], [tranche], [nb_etab], [score])[0]
+        return self._recherche(v, niveaux_naf(naf)[0], k, exclure=self.position_siren.get(siren))
+
+
+def construire_index(conn) -> IndexPairs:
+    """Index depuis les unités légales actives de la base locale"""
+    import base_locale
+
+    lots = []
+    for lignes in base_locale.iterer_secteur(conn):
+        lot = pd.DataFrame(lignes, columns=["siren", "denomination", "naf", "tranche_effectif", "score", "nb_etab"])
+        manquants = lot["score"].isna()
+        if manquants.any():
+            lot.loc[manquants, "score"] = calculer_scores_vectorises(
+                lot.loc[manquants, "tranche_effectif"].fillna("00").to_numpy(),
+                lot.loc[manquants, "nb_etab"].to_numpy(),
+                lot.loc[manquants, "naf"].to_numpy(),
+            )
+        lots.append(lot)
+
+    profils = pd.concat(lots, ignore_index=True) if lots else pd.DataFrame(
+        columns=["siren", "denomination", "naf", "tranche_effectif", "score", "nb_etab"]
+    )
+    return IndexPairs(profils)
@@ -0,0 +1,240 @@
+"""
+Simulation de barèmes - Smart Business Directory
+Analyse what-if : impact d'un barème de scoring alternatif sur tout un portefeuille
+
+Un portefeuille est l'ensemble des entrées du Score Santé IA (tranche
+d'effectif, établissements ouverts, division NAF), encodé une fois :
+- tranches et divisions en codes de modalités, établissements en uint32 ;
+- mis en cache en .npz, depuis la sortie de pipeline_sirene.py ou la base locale.
+
+Un barème (Bareme) reprend les règles de calculer_score_sante_ia, sans la
+composante de tendance (historique.py) : les scores simulés sont ceux de
+calculer_scores_vectorises, avant ajout de la tendance.
+
+Chaque barème devient des tables de correspondance indexées par ces codes :
+le rescoring d'un portefeuille est une passe vectorisée, quelques
+millisecondes par million d'entreprises. Le bilan compte les entreprises qui changent de
+bande de interpreter_score (matrice de transitions) et compare les
+distributions avant / après.
+
+Usage :
+    python simulation.py portefeuille --parquet sortie_pipeline/ portefeuille.npz
+    python simulation.py portefeuille --base sbd_local.sqlite3 portefeuille.npz
+    python simulation.py comparer portefeuille.npz variante_commerce.json variante_tech.json
+
+Un fichier de barème ne contient que les règles modifiées :
+    {"nom": "commerce neutre", "secteurs": {"47": 0, "56": 0}, "plafond_etablissements": 30}
+"""
+
+import argparse
+import json
+import time
+from typing import Optional, Dict, Any, List, NamedTuple, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ia_model import EFFECTIF_SCORES, EFFECTIF_SCORE_DEFAUT, SECTEUR_RISQUES
+from resultats import LIBELLES_STATUT, Statut
+
+
+# Bande de interpreter_score de chaque score possible
+BANDES = np.array([Statut.depuis_score(s) for s in range(101)], dtype=np.int8)
+NB_BANDES = len(LIBELLES_STATUT)
+
+
+class Bareme(NamedTuple):
+    """Règles de calculer_score_sante_ia ; les valeurs par défaut sont celles d'ia_model"""
+    nom: str = "actuel"
+    base: int = 50
+    effectif: Dict[str, int] = EFFECTIF_SCORES
+    effectif_defaut: int = EFFECTIF_SCORE_DEFAUT
+    points_par_etablissement: int = 2
+    plafond_etablissements: int = 20
+    secteurs: Dict[str, int] = SECTEUR_RISQUES
+
+    @classmethod
+    def depuis_dict(cls, modifications: Dict[str, Any], reference: Optional["Bareme"] = None) -> "Bareme":
+        """Barème de référence modifié : les tables effectif / secteurs sont complétées, pas remplacées"""
+        reference = reference or cls()
+        inconnues = set(modifications) - set(cls._fields)
+        if inconnues:
+            raise ValueError(f"Règles inconnues : {', '.join(sorted(inconnues))}")
+
+        valeurs = dict(modifications)
+        for table in ("effectif", "secteurs"):
+            if table in valeurs:
+                valeurs[table] = {**getattr(reference, table), **{str(k): int(v) for k, v in valeurs[table].items()}}
+        return reference._replace(**valeurs)
+
+
+class Portefeuille:
+    """Entrées du scoring encodées ; `scorer(bareme)` rescore tout le portefeuille"""
+
+    def __init__(self, tranches: np.ndarray, tranche_modalites: List[str], nb_etab: np.ndarray,
+                 divisions: np.ndarray, division_modalites: List[str]):
+        self.tranches = tranches
+        self.tranche_modalites = tranche_modalites
+        self.nb_etab = nb_etab
+        self.divisions = divisions
+        self.division_modalites = division_modalites
+
+    @classmethod
+    def depuis_colonnes(cls, tranches, nb_etab, nafs) -> "Portefeuille":
+        """Mêmes entrées que calculer_scores_vectorises ; une tranche manquante reste manquante (effectif_defaut)"""
+        tranches = pd.Series(tranches, copy=False).astype(object)
+        tranches = pd.Categorical(tranches.where(tranches.isna(), tranches.astype(str)))
+        divisions = pd.Categorical(pd.Series(nafs, copy=False).astype(object).fillna("").astype(str).str[:2])
+        nb_etab = pd.to_numeric(pd.Series(nb_etab, copy=False), errors="coerce").fillna(0).to_numpy(np.float64)
+        return cls(
+            tranches.codes.astype(np.int16), list(tranches.categories),
+            np.clip(np.trunc(nb_etab), 0, np.iinfo(np.uint32).max).astype(np.uint32),
+            divisions.codes.astype(np.int16), list(divisions.categories),
+        )
+
+    @classmethod
+    def depuis_parquet(cls, chemin: str) -> "Portefeuille":
+        """Sortie de pipeline_sirene.py (pip install pyarrow)"""
+        import pyarrow.dataset as ds
+
+        table = ds.dataset(chemin, format="parquet").to_table(columns=["tranche_effectif", "nb_etablissements_ouverts", "naf"])
+        return cls.depuis_colonnes(
+            table.column("tranche_effectif").to_pandas(),
+            table.column("nb_etablissements_ouverts").to_numpy(),
+            table.column("naf").to_pandas(),
+        )
+
+    @classmethod
+    def depuis_base_locale(cls, conn) -> "Portefeuille":
+        """Unités légales actives de la base locale"""
+        import base_locale
+
+        lots = [pd.DataFrame(lignes) for lignes in base_locale.iterer_secteur(conn)]
+        lot = pd.concat(lots, ignore_index=True) if lots else pd.DataFrame(columns=["tranche_effectif", "nb_etab", "naf"])
+        return cls.depuis_colonnes(lot["tranche_effectif"], lot["nb_etab"], lot["naf"])
+
+    def enregistrer(self, chemin: str):
+        np.savez(
+            chemin,
+            tranches=self.tranches,
+            tranche_modalites=np.array(self.tranche_modalites, dtype=str),
+            nb_etab=self.nb_etab,
+            divisions=self.divisions,
+            division_modalites=np.array(self.division_modalites, dtype=str),
+        )
+
+    @classmethod
+    def charger(cls, chemin: str) -> "Portefeuille":
+        with np.load(chemin) as f:
+            return cls(
+                f["tranches"], f["tranche_modalites"].tolist(),
+                f["nb_etab"],
+                f["divisions"], f["division_modalites"].tolist(),
+            )
+
+    def __len__(self) -> int:
+        return len(self.tranches)
+
+    def scorer(self, bareme: Bareme) -> np.ndarray:
+        """Scores uint8 du portefeuille ; Bareme() redonne calculer_scores_vectorises (sans tendance)"""
+        # Le code -1 d'une valeur manquante pointe sur la valeur ajoutée en fin de table
+        effectif = np.array(
+            [bareme.effectif.get(t, bareme.effectif_defaut) for t in self.tranche_modalites] + [bareme.effectif_defaut],
+            dtype=np.int16,
+        )
+        secteurs = np.array([bareme.secteurs.get(d, 0) for d in self.division_modalites] + [0], dtype=np.int16)
+
+        score = np.full(len(self), bareme.base, dtype=np.int32)
+        score += effectif[self.tranches]
+        score += np.minimum(bareme.plafond_etablissements, self.nb_etab.astype(np.int64) * bareme.points_par_etablissement).astype(np.int32)
+        score += secteurs[self.divisions]
+        return np.clip(score, 0, 100).astype(np.uint8)
+
+
+class Comparaison(NamedTuple):
+    nom: str
+    transitions: pd.DataFrame   # bande avant (lignes) -> bande après (colonnes)
+    distribution: pd.DataFrame  # effectif par bande, avant / après
+    deplacees: int              # entreprises qui changent de bande
+    ecart_moyen: float          # variation moyenne du score
+    duree: float
+
+
+def _comparer(nom: str, avant: np.ndarray, apres: np.ndarray, duree: float) -> Comparaison:
+    bandes_avant = BANDES[avant].astype(np.int64)
+    bandes_apres = BANDES[apres].astype(np.int64)
+    matrice = np.bincount(bandes_avant * NB_BANDES + bandes_apres, minlength=NB_BANDES ** 2).reshape(NB_BANDES, NB_BANDES)
+
+    transitions = pd.DataFrame(matrice, index=LIBELLES_STATUT, columns=LIBELLES_STATUT)
+    transitions.index.name, transitions.columns.name = "Avant", "Après"
+    distribution = pd.DataFrame(
+        {"Avant": matrice.sum(axis=1), "Après": matrice.sum(axis=0)},
+        index=LIBELLES_STATUT,
+    )
+    distribution["Écart"] = distribution["Après"] - distribution["Avant"]
+
+    return Comparaison(
+        nom=nom,
+        transitions=transitions,
+        distribution=distribution,
+        deplacees=int(matrice.sum() - np.trace(matrice)),
+        ecart_moyen=float(apres.mean() - avant.mean()) if len(avant) else 0.0,
+        duree=duree,
+    )
+
+
+def comparer(portefeuille: Portefeuille, baremes: Sequence[Bareme], reference: Optional[Bareme] = None) -> List[Comparaison]:
+    """Une passe vectorisée par barème, comparée au barème de référence (actuel par défaut)"""
+    avant = portefeuille.scorer(reference or Bareme())
+    comparaisons = []
+    for bareme in baremes:
+        debut = time.perf_counter()
+        apres = portefeuille.scorer(bareme)
+        comparaisons.append(_comparer(bareme.nom, avant, apres, time.perf_counter() - debut))
+    return comparaisons
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Impact de barèmes de scoring alternatifs")
+    sous = parser.add_subparsers(dest="commande", required=True)
+
+    p_portefeuille = sous.add_parser("portefeuille", help="Encoder et mettre en cache un portefeuille")
+    source = p_portefeuille.add_mutually_exclusive_group(required=True)
+    source.add_argument("--parquet", help="Sortie de pipeline_sirene.py")
+    source.add_argument("--base", help="Base SQLite locale")
+    p_portefeuille.add_argument("sortie", help="Fichier .npz")
+
+    p_comparer = sous.add_parser("comparer", help="Comparer des barèmes au barème actuel")
+    p_comparer.add_argument("portefeuille", help="Fichier .npz")
+    p_comparer.add_argument("baremes", nargs="+", help="Barèmes JSON (règles modifiées seulement)")
+
+    args = parser.parse_args()
+
+    if args.commande == "portefeuille":
+        if args.parquet:
+            portefeuille = Portefeuille.depuis_parquet(args.parquet)
+        else:
+            import base_locale
+
+            portefeuille = Portefeuille.depuis_base_locale(base_locale.connecter(args.base))
+        portefeuille.enregistrer(args.sortie)
+        print(f"Portefeuille OK - {len(portefeuille)} entreprises")
+        return
+
+    portefeuille = Portefeuille.charger(args.portefeuille)
+    baremes = []
+    for chemin in args.baremes:
+        with open(chemin, encoding="utf-8") as f:
+            modifications = json.load(f)
+        modifications.setdefault("nom", chemin)
+        baremes.append(Bareme.depuis_dict(modifications))
+
+    for c in comparer(portefeuille, baremes):
+        print(f"=== {c.nom} : {c.deplacees} entreprise(s) changent de bande sur {len(portefeuille)}, "
+              f"score moyen {c.ecart_moyen:+.2f} ({c.duree * 1000:.0f} ms)")
+        print(c.distribution.to_string())
+        print(c.transitions.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Suggestions de noms - Smart Business Directory
+Autocomplétion locale des raisons sociales, sans appel réseau
+
+Index à deux niveaux :
+- tableau trié de noms normalisés (bisect sur le préfixe) construit depuis la
+  base locale, avec des poids de popularité en NumPy ; les meilleurs résultats
+  des préfixes de 1 et 2 caractères sont précalculés ;
+- noms vus dans les résultats de recherche, alimentés au fil de l'eau et
+  persistés dans la base locale : poids par SIREN et liste triée de leurs
+  clés (bisect également), bornée à NB_NOMS_VUS_MAX en gardant les plus vus.
+"""
+
+import bisect
+import math
+import os
+import threading
+from typing import Dict, Any, List, Iterable, Tuple
+
+import numpy as np
+
+from codage import normaliser_texte
+
+
+NB_SUGGESTIONS = 8
+
+# Borne haute d'un préfixe dans un tableau trié : [préfixe, préfixe + FIN_PREFIXE)
+FIN_PREFIXE = "\uffff"
+
+# Poids ajouté par apparition dans un résultat de recherche
+POIDS_VU = 10.0
+
+# Noms vus conservés (index et table noms_vus) ; au-delà, les moins vus sont oubliés
+NB_NOMS_VUS_MAX = int(os.getenv("SBD_NOMS_VUS_MAX", "50000"))
+
+
+class IndexSuggestions:
+    """
+    Index de préfixes : `suggerer("capg")` -> [{"nom", "siren", "poids"}, ...]
+
+    Les entrées de base sont figées (tableaux triés) ; les noms vus ensuite
+    vont dans un niveau incrémental, fusionné à la requête.
+    """
+
+    def __init__(self, entrees: Iterable[Tuple[str, str, float]], k: int = NB_SUGGESTIONS, nb_vus_max: int = NB_NOMS_VUS_MAX):
+        self.k = k
+        self.nb_vus_max = nb_vus_max
+        lignes = sorted(
+            (cle, nom, siren, poids)
+            for nom, siren, poids in entrees
+            if (cle := normaliser_texte(nom))
+        )
+        self.cles: List[str] = [l[0] for l in lignes]
+        self.noms: List[str] = [l[1] for l in lignes]
+        self.sirens: List[str] = [l[2] for l in lignes]
+        self.poids = np.array([l[3] for l in lignes], dtype=np.float32)
+
+        self.vus: Dict[str, Dict[str, Any]] = {}
+        self.cles_vus: List[Tuple[str, str]] = []  # (clé, siren) triés
+        self.verrou = threading.Lock()
+
+        # Préfixes courts : plages trop larges pour un tri à chaque frappe
+        self.meilleurs_courts: Dict[str, np.ndarray] = {}
+        prefixes = {cle[:n] for cle in self.cles for n in (1, 2) if len(cle) >= n}
+        for prefixe in prefixes:
+            debut, fin = self._plage(prefixe)
+            self.meilleurs_courts[prefixe] = self._meilleurs(debut, fin)
+
+    def __len__(self) -> int:
+        return len(self.cles) + len(self.vus)
+
+    def _plage(self, prefixe: str) -> Tuple[int, int]:
+        debut = bisect.bisect_left(self.cles, prefixe)
+        fin = bisect.bisect_left(self.cles, prefixe + FIN_PREFIXE, lo=debut)
+        return debut, fin
+
+    def _meilleurs(self, debut: int, fin: int) -> np.ndarray:
+        """Positions des k entrées les plus populaires de [debut, fin), triées"""
+        if fin - debut <= self.k:
+            positions = np.arange(debut, fin)
+        else:
+            positions = debut + np.argpartition(-self.poids[debut:fin], self.k)[:self.k]
+        return positions[np.argsort(-self.poids[positions], kind="stable")]
+
+    def _indexer_vu(self, siren: str, cle: str, nom: str, poids: float):
+        """Ajoute ou renomme une entrée vue (appelant sous verrou)"""
+        entree = self.vus.get(siren)
+        if entree is None:
+            entree = self.vus[siren] = {"cle": cle, "nom": nom, "siren": siren, "poids": 0.0}
+            bisect.insort(self.cles_vus, (cle, siren))
+        elif entree["cle"] != cle:
+            del self.cles_vus[bisect.bisect_left(self.cles_vus, (entree["cle"], siren))]
+            bisect.insort(self.cles_vus, (cle, siren))
+            entree["cle"] = cle
+        entree["nom"] = nom
+        entree["poids"] += poids
+
+    def _elaguer_vus(self):
+        """Au-delà de nb_vus_max, garde les 90 % les plus vus (appelant sous verrou)"""
+        if len(self.vus) <= self.nb_vus_max:
+            return
+        gardes = sorted(self.vus.values(), key=lambda e: -e["poids"])[:int(self.nb_vus_max * 0.9)]
+        self.vus = {e["siren"]: e for e in gardes}
+        self.cles_vus = sorted((e["cle"], e["siren"]) for e in gardes)
+
+    def charger_vus(self, vus: Iterable[Dict[str, Any]]):
+        """Noms vus persistés (lignes de la table noms_vus)"""
+        with self.verrou:
+            for vu in vus:
+                cle = normaliser_texte(vu["nom"])
+                if cle and vu["siren"]:
+                    self._indexer_vu(vu["siren"], cle, vu["nom"], vu["nb_vus"] * POIDS_VU)
+            self._elaguer_vus()
+
+    def ajouter_vus(self, noms: Iterable[Tuple[str, str]]):
+        """Enregistre des noms (nom, siren) vus dans des résultats de recherche"""
+        with self.verrou:
+            for nom, siren in noms:
+                cle = normaliser_texte(nom)
+                if cle and siren:
+                    self._indexer_vu(siren, cle, nom, POIDS_VU)
+            self._elaguer_vus()
+
+    def suggerer(self, texte: str) -> List[Dict[str, Any]]:
+        prefixe = normaliser_texte(texte)
+        if not prefixe:
+            return []
+
+        positions = self.meilleurs_courts.get(prefixe)
+        if positions is None:
+            positions = self._meilleurs(*self._plage(prefixe))
+
+        candidats = {
+            self.sirens[i]: {"nom": self.noms[i], "siren": self.sirens[i], "poids": float(self.poids[i])}
+            for i in positions
+        }
+
+        with self.verrou:
+            debut = bisect.bisect_left(self.cles_vus, (prefixe,))
+            fin = bisect.bisect_left(self.cles_vus, (prefixe + FIN_PREFIXE,), lo=debut)
+            for _, siren in self.cles_vus[debut:fin]:
+                entree = self.vus[siren]
+                base = candidats.get(siren, {"nom": entree["nom"], "siren": siren, "poids": 0.0})
+                candidats[siren] = {**base, "poids": base["poids"] + entree["poids"]}
+
+        return sorted(candidats.values(), key=lambda c: -c["poids"])[:self.k]
+
+
+def poids_popularite(nb_etab, score) -> float:
+    """Popularité a priori : taille du réseau et score de santé"""
+    return math.log1p(nb_etab or 0) + (score or 0) / 100
+
+
+def construire_index(conn) -> IndexSuggestions:
+    """Index depuis la base locale (unités légales + noms déjà vus)"""
+    import base_locale
+
+    entrees = [
+        (r["denomination"], r["siren"], poids_popularite(r["nb_etab"], r["score"]))
+        for r in base_locale.lire_noms_index(conn)
+    ]
+    index = IndexSuggestions(entrees)
+    index.charger_vus(base_locale.lire_noms_vus(conn, NB_NOMS_VUS_MAX))
+    return index
@@ -0,0 +1,213 @@
+"""
+Surveillance - Smart Business Directory
+Watchlist de SIREN rafraîchie en tâche de fond, avec historique des changements
+
+Chaque passage rafraîchit les SIREN les plus anciens par lots (quotas INSEE /
+data.gouv respectés par les limiteurs de api_sirene), rescore avec le modèle
+IA et n'enregistre que les changements : bande de score, code NAF, tranche
+d'effectif. L'interface lit l'état précalculé sans appel réseau.
+
+Usage :
+    python surveillance.py ajouter 552032534 443061841
+    python surveillance.py retirer 552032534
+    python surveillance.py executer [--boucle --intervalle 3600]
+"""
+
+import argparse
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from api_sirene import get_unite_legale_by_siren, enrichir_par_datagouv, extract_infos_unite_legale
+from ia_model import calculer_score_sante_ia, interpreter_score
+from identifiants import IdentifiantInvalide, valider_siren
+import base_locale
+
+
+# Champs dont un changement est enregistré dans watchlist_diffs
+CHAMPS_SUIVIS = ("statut", "naf", "tranche_effectif")
+
+TAILLE_LOT = 25
+
+
+class EnrichissementIndisponible(RuntimeError):
+    """data.gouv sans réponse exploitable : l'état précédent du SIREN est conservé"""
+
+
+def evaluer_siren(siren: str) -> Dict[str, Any]:
+    """Récupère et score un SIREN (INSEE + data.gouv)"""
+    data = get_unite_legale_by_siren(siren)
+    ul = data.get("uniteLegale", data)
+    info = enrichir_par_datagouv(siren)
+    if info is None:
+        # Scorer sans effectif ni établissements enregistrerait de faux changements
+        raise EnrichissementIndisponible(f"Enrichissement data.gouv indisponible pour {siren}")
+    denomination, naf, _ = extract_infos_unite_legale(ul)
+
+    tranche_effectif = info.get("tranche_effectif_salarie")
+    nb_etab = info.get("nombre_etablissements_ouverts")
+
+    score = calculer_score_sante_ia(
+        effectif=tranche_effectif or "00",
+        nb_etab=nb_etab or 0,
+        naf=naf
+    )
+    statut, _ = interpreter_score(score)
+
+    return {
+        "siren": siren,
+        "denomination": denomination,
+        "naf": naf,
+        "tranche_effectif": tranche_effectif,
+        "nb_etab": nb_etab,
+        "score": score,
+        "statut": statut,
+    }
+
+
+def enregistrer_etat(conn, etat: Dict[str, Any], date: str) -> int:
+    """Met à jour l'état d'un SIREN ; renvoie le nombre de changements enregistrés"""
+    precedent = conn.execute("SELECT * FROM watchlist_etat WHERE siren = ?", (etat["siren"],)).fetchone()
+
+    diffs = []
+    if precedent is not None:
+        for champ in CHAMPS_SUIVIS:
+            if precedent[champ] != etat[champ]:
+                diffs.append((etat["siren"], date, champ, precedent[champ], etat[champ]))
+
+    conn.executemany(
+        "INSERT INTO watchlist_diffs (siren, date, champ, avant, apres) VALUES (?, ?, ?, ?, ?)",
+        diffs,
+    )
+    conn.execute(
+        """
+        INSERT INTO watchlist_etat
+            (siren, denomination, naf, tranche_effectif, nb_etab, score, statut, rafraichi_le)
+        VALUES
+            (:siren, :denomination, :naf, :tranche_effectif, :nb_etab, :score, :statut, :rafraichi_le)
+        ON CONFLICT(siren) DO UPDATE SET
+            denomination = excluded.denomination,
+            naf = excluded.naf,
+            tranche_effectif = excluded.tranche_effectif,
+            nb_etab = excluded.nb_etab,
+            score = excluded.score,
+            statut = excluded.statut,
+            rafraichi_le = excluded.rafraichi_le
+        """,
+        {**etat, "rafraichi_le": date},
+    )
+    return len(diffs)
+
+
+def rafraichir_watchlist(conn, limite: Optional[int] = None, taille_lot: int = TAILLE_LOT) -> Dict[str, int]:
+    """Rafraîchit la watchlist par lots, en commençant par les SIREN les plus anciens"""
+    sirens = base_locale.sirens_a_rafraichir(conn, limite)
+    bilan = {"rafraichis": 0, "changements": 0, "erreurs": 0}
+
+    for i in range(0, len(sirens), taille_lot):
+        date = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+
+        for siren in sirens[i:i + taille_lot]:
+            try:
+                etat = evaluer_siren(siren)
+            except Exception:
+                bilan["erreurs"] += 1
+                continue
+
+            bilan["changements"] += enregistrer_etat(conn, etat, date)
+            bilan["rafraichis"] += 1
+
+        # Un commit par lot : l'interface voit les résultats au fil de l'eau
+        conn.commit()
+
+    return bilan
+
+
+class Planificateur:
+    """Rafraîchissement périodique de la watchlist dans un thread de fond"""
+
+    def __init__(self, intervalle: float = 3600, chemin_db: Optional[str] = None, limite: Optional[int] = None):
+        self.intervalle = intervalle
+        self.chemin_db = chemin_db
+        self.limite = limite
+        self.dernier_bilan: Optional[Dict[str, int]] = None
+        self.dernier_passage: Optional[str] = None
+        self._arret = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _boucle(self):
+        # Connexion propre au thread (sqlite3 n'est pas partageable entre threads)
+        conn = base_locale.connecter(self.chemin_db)
+        try:
+            while not self._arret.is_set():
+                try:
+                    self.dernier_bilan = rafraichir_watchlist(conn, limite=self.limite)
+                except Exception:
+                    self.dernier_bilan = None
+                self.dernier_passage = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+                self._arret.wait(self.intervalle)
+        finally:
+            conn.close()
+
+    def demarrer(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._arret.clear()
+            self._thread = threading.Thread(target=self._boucle, name="surveillance-watchlist", daemon=True)
+            self._thread.start()
+
+    def arreter(self):
+        self._arret.set()
+
+    @property
+    def actif(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watchlist de SIREN surveillés")
+    parser.add_argument("--db", default=None, help="Chemin de la base SQLite (défaut : SBD_DB_PATH)")
+    sous = parser.add_subparsers(dest="commande", required=True)
+
+    p_ajouter = sous.add_parser("ajouter", help="Ajouter des SIREN à la watchlist")
+    p_ajouter.add_argument("sirens", nargs="+")
+
+    p_retirer = sous.add_parser("retirer", help="Retirer des SIREN de la watchlist")
+    p_retirer.add_argument("sirens", nargs="+")
+
+    p_executer = sous.add_parser("executer", help="Rafraîchir la watchlist")
+    p_executer.add_argument("--limite", type=int, default=None, help="Nombre max de SIREN par passage")
+    p_executer.add_argument("--boucle", action="store_true", help="Relancer périodiquement")
+    p_executer.add_argument("--intervalle", type=float, default=3600, help="Secondes entre deux passages")
+
+    args = parser.parse_args()
+    conn = base_locale.connecter(args.db)
+
+    try:
+        if args.commande == "ajouter":
+            try:
+                sirens = [valider_siren(s) for s in args.sirens]
+            except IdentifiantInvalide as e:
+                parser.error(str(e))
+            base_locale.ajouter_watchlist(conn, sirens)
+            print(f"{len(sirens)} SIREN ajouté(s)")
+        elif args.commande == "retirer":
+            base_locale.retirer_watchlist(conn, args.sirens)
+            print(f"{len(args.sirens)} SIREN retiré(s)")
+        else:
+            while True:
+                debut = time.monotonic()
+                bilan = rafraichir_watchlist(conn, limite=args.limite)
+                print(
+                    f"Passage OK en {time.monotonic() - debut:.1f}s - {bilan['rafraichis']} rafraîchis, "
+                    f"{bilan['changements']} changements, {bilan['erreurs']} erreurs"
+                )
+                if not args.boucle:
+                    break
+                time.sleep(args.intervalle)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Synchronisation incrémentale - Smart Business Directory
+Rafraîchit la base locale à partir des seules modifications Sirene
+
+Interroge INSEE sur dateDernierTraitementUniteLegale / dateDernierTraitementEtablissement
+postérieures au dernier watermark, applique les changements, rescore les
+entreprises touchées puis enregistre le nouveau watermark.
+
+Une base neuve est d'abord amorcée depuis les stocks Sirene (amorcer) : sans
+eux, les établissements jamais modifiés depuis le premier watermark manquent
+et nb_etab comme les scores sont sous-estimés. Les watermarks initiaux sont
+les dates de dernier traitement les plus récentes des stocks.
+
+Usage :
+    # Première fois
+    python sync_sirene.py --stock-ul StockUniteLegale_utf8.csv --stock-etab StockEtablissement_utf8.csv
+    # Job nocturne
+    python sync_sirene.py [--db sbd_local.sqlite3]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Iterator, Sequence, Tuple
+
+import pandas as pd
+
+from api_sirene import (
+    iterer_pages_curseur,
+    extract_infos_unite_legale,
+    CHAMPS_UNITE_LEGALE,
+    CHAMPS_ETABLISSEMENT,
+    NOMBRE_PAR_PAGE_CURSEUR,
+)
+from pipeline_sirene import COLONNES_UL, denominations, lire_par_blocs
+import base_locale
+
+
+WATERMARK_UL = "watermark_unites_legales"
+WATERMARK_ETAB = "watermark_etablissements"
+
+NOMBRE_PAR_PAGE = NOMBRE_PAR_PAGE_CURSEUR
+
+COLONNES_STOCK_UL = COLONNES_UL + ["dateDernierTraitementUniteLegale"]
+COLONNES_STOCK_ETAB = [
+    "siret",
+    "siren",
+    "activitePrincipaleEtablissement",
+    "etatAdministratifEtablissement",
+    "dateDernierTraitementEtablissement",
+]
+
+
+class BaseNonAmorcee(RuntimeError):
+    """Ni watermark ni stocks importés : la synchronisation seule donnerait des comptes partiels"""
+
+
+def iterer_modifications(
+    path: str,
+    champ_date: str,
+    depuis: str,
+    cle: str,
+    champs: Optional[Sequence[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Parcourt par curseur tous les objets modifiés depuis `depuis`"""
+    for page in iterer_pages_curseur(path, f"{champ_date}:[{depuis} TO *]", cle, champs):
+        yield from page
+
+
+def convertir_unite_legale(ul: Dict[str, Any]) -> Dict[str, Any]:
+    denomination, naf, catjur = extract_infos_unite_legale(ul)
+    periodes = ul.get("periodesUniteLegale") or []
+    periode = periodes[0] if periodes else {}
+
+    return {
+        "siren": ul.get("siren"),
+        "denomination": denomination,
+        "naf": naf,
+        "catjur": catjur,
+        "etat_administratif": periode.get("etatAdministratifUniteLegale"),
+        "tranche_effectif": ul.get("trancheEffectifsUniteLegale"),
+        "date_dernier_traitement": ul.get("dateDernierTraitementUniteLegale"),
+    }
+
+
+def convertir_etablissement(etab: Dict[str, Any]) -> Dict[str, Any]:
+    periodes = etab.get("periodesEtablissement") or []
+    periode = periodes[0] if periodes else {}
+
+    return {
+        "siret": etab.get("siret"),
+        "siren": etab.get("siren"),
+        "naf": periode.get("activitePrincipaleEtablissement"),
+        "etat_administratif": periode.get("etatAdministratifEtablissement"),
+        "date_dernier_traitement": etab.get("dateDernierTraitementEtablissement"),
+    }
+
+
+def _appliquer_par_lots(conn, objets, convertir, upsert, taille_lot: int = NOMBRE_PAR_PAGE) -> Tuple[int, set, Optional[str]]:
+    """Applique un flux de modifications par lots ; renvoie (nb, sirens touchés, date max)"""
+    nb = 0
+    sirens = set()
+    date_max = None
+    lot = []
+
+    for obj in objets:
+        ligne = convertir(obj)
+        lot.append(ligne)
+        sirens.add(ligne["siren"])
+        date = ligne["date_dernier_traitement"]
+        if date and (date_max is None or date > date_max):
+            date_max = date
+
+        if len(lot) >= taille_lot:
+            upsert(conn, lot)
+            nb += len(lot)
+            lot = []
+
+    if lot:
+        upsert(conn, lot)
+        nb += len(lot)
+
+    return nb, sirens, date_max
+
+
+def _lignes(bloc: pd.DataFrame) -> list:
+    return bloc.astype(object).where(bloc.notna(), None).to_dict("records")
+
+
+def _date_max(courante: Optional[str], dates: pd.Series) -> Optional[str]:
+    dates = dates.dropna()
+    if dates.empty:
+        return courante
+    return max(courante, dates.max()) if courante else dates.max()
+
+
+def amorcer(conn, stock_ul: str, stock_etab: str, taille_bloc: int = 100_000) -> Dict[str, Any]:
+    """
+    Importe les stocks Sirene (CSV ou Parquet), établissements d'abord pour
+    scorer chaque bloc d'unités légales sur des comptes complets. Un commit
+    par bloc ; l'amorçage n'est marqué terminé qu'à la fin.
+    """
+    nb_etab, max_etab = 0, None
+    for bloc in lire_par_blocs(stock_etab, COLONNES_STOCK_ETAB, taille_bloc):
+        bloc = pd.DataFrame({
+            "siret": bloc["siret"],
+            "siren": bloc["siren"],
+            "naf": bloc["activitePrincipaleEtablissement"],
+            "etat_administratif": bloc["etatAdministratifEtablissement"],
+            "date_dernier_traitement": bloc["dateDernierTraitementEtablissement"],
+        })
+        base_locale.upsert_etablissements(conn, _lignes(bloc))
+        conn.commit()
+        nb_etab += len(bloc)
+        max_etab = _date_max(max_etab, bloc["date_dernier_traitement"])
+
+    nb_ul, max_ul = 0, None
+    for bloc in lire_par_blocs(stock_ul, COLONNES_STOCK_UL, taille_bloc):
+        bloc = pd.DataFrame({
+            "siren": bloc["siren"],
+            "denomination": denominations(bloc),
+            "naf": bloc["activitePrincipaleUniteLegale"],
+            "catjur": bloc["categorieJuridiqueUniteLegale"],
+            "etat_administratif": bloc["etatAdministratifUniteLegale"],
+            "tranche_effectif": bloc["trancheEffectifsUniteLegale"],
+            "date_dernier_traitement": bloc["dateDernierTraitementUniteLegale"],
+        })
+        base_locale.upsert_unites_legales(conn, _lignes(bloc))
+        base_locale.rescorer(conn, bloc["siren"])
+        conn.commit()
+        nb_ul += len(bloc)
+        max_ul = _date_max(max_ul, bloc["date_dernier_traitement"])
+
+    if max_ul:
+        base_locale.ecrire_meta(conn, WATERMARK_UL, max_ul)
+    if max_etab:
+        base_locale.ecrire_meta(conn, WATERMARK_ETAB, max_etab)
+    base_locale.ecrire_meta(conn, base_locale.ETABLISSEMENTS_COMPLETS, "1")
+    conn.commit()
+
+    return {"unites_legales": nb_ul, "etablissements": nb_etab}
+
+
+def synchroniser(conn, depuis: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Exécute une synchronisation incrémentale complète.
+
+    Les watermarks ne sont enregistrés qu'une fois toutes les modifications
+    appliquées : un job interrompu repart du watermark précédent (les upserts
+    sont idempotents). Refusée sur une base neuve non amorcée (BaseNonAmorcee).
+    """
+    premiere = base_locale.lire_meta(conn, WATERMARK_UL) is None and base_locale.lire_meta(conn, WATERMARK_ETAB) is None
+    if premiere and not base_locale.etablissements_complets(conn):
+        raise BaseNonAmorcee(
+            "Base locale non amorcée : importer d'abord les stocks Sirene (--stock-ul / --stock-etab)"
+        )
+
+    defaut = depuis or (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S")
+    depuis_ul = base_locale.lire_meta(conn, WATERMARK_UL) or defaut
+    depuis_etab = base_locale.lire_meta(conn, WATERMARK_ETAB) or defaut
+
+    nb_ul, sirens_ul, max_ul = _appliquer_par_lots(
+        conn,
+        iterer_modifications(
+            "siren", "dateDernierTraitementUniteLegale", depuis_ul, "unitesLegales", CHAMPS_UNITE_LEGALE
+        ),
+        convertir_unite_legale,
+        base_locale.upsert_unites_legales,
+    )
+
+    nb_etab, sirens_etab, max_etab = _appliquer_par_lots(
+        conn,
+        iterer_modifications(
+            "siret", "dateDernierTraitementEtablissement", depuis_etab, "etablissements", CHAMPS_ETABLISSEMENT
+        ),
+        convertir_etablissement,
+        base_locale.upsert_etablissements,
+    )
+
+    nb_rescores = base_locale.rescorer(conn, sirens_ul | sirens_etab)
+
+    if max_ul:
+        base_locale.ecrire_meta(conn, WATERMARK_UL, max_ul)
+    if max_etab:
+        base_locale.ecrire_meta(conn, WATERMARK_ETAB, max_etab)
+    conn.commit()
+
+    return {
+        "unites_legales": nb_ul,
+        "etablissements": nb_etab,
+        "rescores": nb_rescores,
+        "watermark_unites_legales": max_ul or depuis_ul,
+        "watermark_etablissements": max_etab or depuis_etab,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronisation incrémentale Sirene vers la base locale")
+    parser.add_argument("--db", default=None, help="Chemin de la base SQLite (défaut : SBD_DB_PATH)")
+    parser.add_argument("--depuis", default=None, help="Watermark initial si aucun n'est enregistré (ISO 8601)")
+    parser.add_argument("--stock-ul", default=None, help="StockUniteLegale (CSV ou Parquet) : amorçage de la base")
+    parser.add_argument("--stock-etab", default=None, help="StockEtablissement (CSV ou Parquet) : amorçage de la base")
+    parser.add_argument("--taille-bloc", type=int, default=100_000)
+    args = parser.parse_args()
+    if bool(args.stock_ul) != bool(args.stock_etab):
+        parser.error("--stock-ul et --stock-etab vont ensemble")
+
+    conn = base_locale.connecter(args.db)
+    try:
+        if args.stock_ul:
+            amorce = amorcer(conn, args.stock_ul, args.stock_etab, args.taille_bloc)
+            print(f"Amorçage OK - {amorce['unites_legales']} unités légales, {amorce['etablissements']} établissements")
+        bilan = synchroniser(conn, depuis=args.depuis)
+    except BaseNonAmorcee as e:
+        parser.error(str(e))
+    finally:
+        conn.close()
+
+    print(
+        f"Sync OK - {bilan['unites_legales']} unités légales, "
+        f"{bilan['etablissements']} établissements, {bilan['rescores']} entreprises rescorées"
+    )
+    print(f"Watermarks : UL={bilan['watermark_unites_legales']} / ETAB={bilan['watermark_etablissements']}")
+
+
+if __name__ == "__main__":
+    main()
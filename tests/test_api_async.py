@@ -0,0 +1,152 @@
+"""
+Client asynchrone contre un serveur amont local (aiohttp.test_utils.TestServer) :
+concurrence, échéance, erreurs HTTP et disjoncteur, sans réseau.
+"""
+
+import asyncio
+import time
+
+import pytest
+import requests
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import api_sirene
+from api_async import ApiAmont, ClientAsync, ErreurHTTP
+from api_sirene import Disjoncteur
+
+
+@pytest.fixture(autouse=True)
+def cle_insee(monkeypatch):
+    monkeypatch.setattr(api_sirene, "INSEE_API_KEY", "cle-de-test")
+
+
+class Amont:
+    """Stub INSEE + recherche-entreprises ; compte les requêtes simultanées"""
+
+    def __init__(self, delai: float = 0.05, lents=(), statut_insee: int = 200):
+        self.delai = delai
+        self.lents = set(lents)
+        self.statut_insee = statut_insee
+        self.en_vol = 0
+        self.max_en_vol = 0
+        self.requetes = 0
+
+    async def recherche(self, request):
+        self.requetes += 1
+        self.en_vol += 1
+        self.max_en_vol = max(self.max_en_vol, self.en_vol)
+        try:
+            siren = request.query.get("siren")
+            await asyncio.sleep(5 if siren in self.lents else self.delai)
+            return web.json_response({"results": [{
+                "siren": siren,
+                "tranche_effectif_salarie": "12",
+                "nombre_etablissements_ouverts": 3,
+            }]})
+        finally:
+            self.en_vol -= 1
+
+    async def siren(self, request):
+        self.requetes += 1
+        if self.statut_insee != 200:
+            return web.json_response({"header": {"statut": self.statut_insee}}, status=self.statut_insee)
+        return web.json_response({"unitesLegales": [{"siren": "552032534"}]})
+
+    def application(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/recherche", self.recherche)
+        app.router.add_get("/siren", self.siren)
+        return app
+
+
+async def _avec_client(amont: Amont, coroutine, concurrence: int = 16):
+    serveur = TestServer(amont.application())
+    await serveur.start_server()
+    try:
+        client = ClientAsync(
+            insee=ApiAmont(str(serveur.make_url("/")), Disjoncteur("INSEE test", min_appels=3), None, concurrence),
+            datagouv=ApiAmont(str(serveur.make_url("/recherche")), Disjoncteur("data.gouv test"), None, concurrence),
+        )
+        async with client:
+            return await coroutine(client)
+    finally:
+        await serveur.close()
+
+
+def test_enrichir_lot_concurrent():
+    amont = Amont(delai=0.05)
+    sirens = [f"{i:09d}" for i in range(64)]
+
+    debut = time.perf_counter()
+    resultats = asyncio.run(_avec_client(amont, lambda c: c.enrichir_lot(sirens), concurrence=16))
+    duree = time.perf_counter() - debut
+
+    assert list(resultats) == sirens
+    assert all(r["nombre_etablissements_ouverts"] == 3 for r in resultats.values())
+    # Concurrence bornée par le sémaphore, et réellement exploitée
+    assert 1 < amont.max_en_vol <= 16
+    assert duree < 64 * amont.delai
+
+
+def test_enrichir_lot_echeance_resultats_partiels():
+    amont = Amont(delai=0.01, lents={"000000001"})
+    resultats = asyncio.run(_avec_client(amont, lambda c: c.enrichir_lot(["000000000", "000000001"], echeance=0.5)))
+
+    assert resultats["000000000"] is not None
+    assert resultats["000000001"] is None
+
+
+def test_client_cree_hors_boucle():
+    # Sémaphores créés dans ouvrir(), sur la boucle qui les utilise
+    client = ClientAsync(
+        insee=ApiAmont("http://127.0.0.1:1", Disjoncteur("INSEE test"), None, 2),
+        datagouv=ApiAmont("http://127.0.0.1:1", Disjoncteur("data.gouv test"), None, 2),
+    )
+
+    async def ouvrir_fermer():
+        async with client:
+            return client.insee.semaphore is not None
+
+    assert asyncio.run(ouvrir_fermer())
+
+
+def test_search_by_naf_404_vide():
+    amont = Amont(statut_insee=404)
+    resultat = asyncio.run(_avec_client(amont, lambda c: c.search_by_naf("62.01Z")))
+    assert resultat == {"unitesLegales": []}
+
+
+def test_erreur_http_est_une_requests_http_error():
+    amont = Amont(statut_insee=503)
+
+    async def appel(client):
+        with pytest.raises(requests.HTTPError) as e:
+            await client.call_insee("siren", {"q": "x"})
+        return e.value.response.status_code
+
+    assert asyncio.run(_avec_client(amont, appel)) == 503
+
+
+def test_erreurs_5xx_ouvrent_le_disjoncteur():
+    amont = Amont(statut_insee=503)
+
+    async def appels(client):
+        erreurs = 0
+        for _ in range(5):
+            try:
+                await client.call_insee("siren", {"q": "x"})
+            except ErreurHTTP as e:
+                assert e.status == 503
+                erreurs += 1
+            except Exception:
+                break
+        return erreurs, client.insee.disjoncteur.statistiques()["etat"]
+
+    erreurs, etat = asyncio.run(_avec_client(amont, appels))
+    assert erreurs >= 3
+    assert etat == "ouvert"
+    # Disjoncteur ouvert : plus aucune requête n'atteint l'amont
+    assert amont.requetes == erreurs
@@ -0,0 +1,58 @@
+"""
+File d'exports : cache par empreinte, export en erreur relancé à la demande seulement.
+"""
+
+import time
+
+import pandas as pd
+import pytest
+
+import exports
+from exports import FileExports
+
+
+@pytest.fixture
+def file():
+    file = FileExports(workers=1)
+    yield file
+    file.executeur.shutdown(wait=True)
+
+
+def attendre(file: FileExports, cle: str):
+    debut = time.monotonic()
+    while file.travail(cle) is not None and file.travail(cle).etat in ("en_attente", "en_cours"):
+        assert time.monotonic() - debut < 30
+        time.sleep(0.01)
+
+
+def test_meme_contenu_meme_export(file):
+    df = pd.DataFrame({"SIREN": ["552032534"], "Score Santé IA": [72]})
+    cle = file.soumettre(df, "Rapport")
+    attendre(file, cle)
+
+    assert file.soumettre(df.copy(), "Rapport") == cle
+    assert file.resultat(cle)[:2] == b"PK"
+    assert file.soumettre(df, "Autre titre") != cle
+
+
+def test_export_en_erreur_relance_a_la_demande(file, monkeypatch):
+    appels = []
+
+    def echec(df, titre, progression):
+        appels.append(titre)
+        raise RuntimeError("disque plein")
+
+    monkeypatch.setattr(exports, "construire_classeur", echec)
+    df = pd.DataFrame({"SIREN": ["552032534"]})
+    cle = file.soumettre(df)
+    attendre(file, cle)
+    assert file.travail(cle).erreur == "disque plein"
+
+    # Reruns suivants : l'erreur reste affichée, pas de nouvel essai
+    file.soumettre(df)
+    attendre(file, cle)
+    assert len(appels) == 1
+
+    file.soumettre(df, relancer=True)
+    attendre(file, cle)
+    assert len(appels) == 2
@@ -0,0 +1,78 @@
+"""
+Hedging des GET INSEE : choix de la réponse, disjoncteur avant jeton de débit.
+"""
+
+import threading
+import time
+
+import pytest
+import requests
+
+import api_sirene
+from api_sirene import Disjoncteur, LimiteurDebit, PolitiqueHedging, requete_avec_hedging
+
+
+def reponse(statut: int) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = statut
+    return resp
+
+
+@pytest.fixture
+def amont(monkeypatch):
+    """requests.get : la i-ème requête attend delais[i] puis répond statuts[i]"""
+    appels = []
+    verrou = threading.Lock()
+
+    def configurer(*copies):
+        def get(url, **kwargs):
+            with verrou:
+                delai, statut = copies[len(appels)]
+                appels.append(statut)
+            time.sleep(delai)
+            return reponse(statut)
+
+        monkeypatch.setattr(api_sirene.requests, "get", get)
+        return appels
+
+    return configurer
+
+
+def politique() -> PolitiqueHedging:
+    return PolitiqueHedging(delai_initial=0.05, taux_max=1.0)
+
+
+def test_copie_en_erreur_n_emporte_pas(amont):
+    amont((0.3, 200), (0.0, 503))
+    resp = requete_avec_hedging(politique(), Disjoncteur("test"), LimiteurDebit(10, 1), "http://amont")
+    assert resp.status_code == 200
+
+
+def test_copie_valide_emporte(amont):
+    amont((0.3, 503), (0.0, 404))
+    p = politique()
+    resp = requete_avec_hedging(p, Disjoncteur("test"), LimiteurDebit(10, 1), "http://amont")
+    assert resp.status_code == 404
+    assert p.nb_hedges_gagnants == 1
+
+
+def test_aucune_reponse_valide_renvoie_la_principale(amont):
+    amont((0.2, 502), (0.0, 503))
+    resp = requete_avec_hedging(politique(), Disjoncteur("test"), LimiteurDebit(10, 1), "http://amont")
+    assert resp.status_code == 502
+
+
+def test_semi_ouvert_pas_de_copie_ni_de_jeton(amont):
+    appels = amont((0.2, 200), (0.0, 200))
+    disjoncteur = Disjoncteur("test")
+    disjoncteur.etat = Disjoncteur.SEMI_OUVERT
+    limiteur = LimiteurDebit(10, 1000)
+    p = politique()
+
+    resp = requete_avec_hedging(p, disjoncteur, limiteur, "http://amont")
+
+    assert resp.status_code == 200
+    assert appels == [200]
+    assert p.nb_hedges == 0
+    assert limiteur.jetons == pytest.approx(9, abs=0.01)
+    assert disjoncteur.etat == Disjoncteur.FERME
@@ -0,0 +1,63 @@
+"""
+Indicateurs de tendance de l'historique : fermeture définitive et cessations passées.
+"""
+
+import datetime
+
+import pytest
+
+from historique import depuis_unites_legales
+
+
+def unite(siren, *etats, naf="62.01Z"):
+    """Une période par état, une par an depuis 2000"""
+    return {
+        "siren": siren,
+        "periodesUniteLegale": [
+            {
+                "dateDebut": f"{2000 + i}-01-01",
+                "etatAdministratifUniteLegale": etat,
+                "categorieJuridiqueUniteLegale": "5710",
+                "activitePrincipaleUniteLegale": naf,
+                "nomenclatureActivitePrincipaleUniteLegale": "NAFRev2",
+            }
+            for i, etat in enumerate(etats)
+        ],
+    }
+
+
+@pytest.fixture
+def tendances():
+    index = depuis_unites_legales([
+        unite("100000001", "A"),
+        unite("100000002", "C"),
+        unite("100000003", "A", "C"),
+        unite("100000004", "A", "C", "A"),
+        unite("100000005", "A", "C", "A", "C"),
+        unite("100000006", "A", "C", "A", "C", "A"),
+    ])
+    df = index.tendances(
+        ["100000001", "100000002", "100000003", "100000004", "100000005", "100000006"],
+        date_reference=datetime.date(2006, 1, 1),
+    )
+    return df.set_index("siren")
+
+
+@pytest.mark.parametrize("siren, cessee, nb_cessations", [
+    ("100000001", False, 0),   # active depuis l'origine
+    ("100000002", True, 0),    # cessée dès sa seule période
+    ("100000003", True, 0),    # fermeture définitive : comptée par `cessee` seulement
+    ("100000004", False, 1),   # fermeture suivie d'une reprise
+    ("100000005", True, 1),    # reprise puis fermeture définitive
+    ("100000006", False, 2),
+])
+def test_cessations(tendances, siren, cessee, nb_cessations):
+    assert bool(tendances.loc[siren, "cessee"]) == cessee
+    assert tendances.loc[siren, "nb_cessations"] == nb_cessations
+
+
+def test_fermeture_definitive_penalisee_une_fois(tendances):
+    # Derniers changements entre 1 et 10 ans avant la référence : ni malus récent ni bonus de stabilité
+    assert tendances.loc["100000002", "tendance"] == -30
+    assert tendances.loc["100000003", "tendance"] == -30
+    assert tendances.loc["100000005", "tendance"] == -40
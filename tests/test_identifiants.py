@@ -0,0 +1,58 @@
+"""
+Identifiants SIREN / SIRET : clé de Luhn, exception La Poste, saisies libres.
+"""
+
+import pytest
+
+from identifiants import (
+    IdentifiantInvalide,
+    analyser_saisie,
+    luhn_valide,
+    siren_valide,
+    siret_valide,
+    sirens_de,
+    valider_siren,
+    valider_siret,
+)
+
+
+@pytest.mark.parametrize("chiffres, valide", [
+    ("552032534", True),     # Danone
+    ("443061841", True),     # Google France
+    ("443061842", False),
+    ("44306184100047", True),
+    ("44306184100048", False),
+])
+def test_luhn(chiffres, valide):
+    assert luhn_valide(chiffres) == valide
+
+
+def test_siren():
+    assert siren_valide("552032534")
+    assert not siren_valide("55203253")
+    assert not siren_valide("55203253A")
+    assert valider_siren("552 032 534") == "552032534"
+    with pytest.raises(IdentifiantInvalide):
+        valider_siren("552032535")
+
+
+def test_siret_la_poste():
+    # La Poste : somme des chiffres multiple de 5, pas de clé de Luhn
+    assert siret_valide("35600000000051")
+    assert not luhn_valide("35600000000051")
+    assert not siret_valide("35600000000052")
+    assert not siret_valide("35600000000014")   # clé de Luhn correcte, somme non multiple de 5
+
+
+def test_siret():
+    assert valider_siret("443 061 841 00047") == "44306184100047"
+    with pytest.raises(IdentifiantInvalide):
+        valider_siret("44306184100048")
+
+
+def test_analyser_saisie():
+    saisie = analyser_saisie("552 032 534, 443061841 44306184100047;123456789\n552032534")
+    assert saisie.sirens == ["552032534", "443061841"]
+    assert saisie.sirets == ["44306184100047"]
+    assert saisie.invalides == ["123456789"]
+    assert sirens_de(saisie) == ["552032534", "443061841"]
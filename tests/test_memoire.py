@@ -0,0 +1,94 @@
+"""
+Budget mémoire d'une session : données brutes, exports partagés, recherches non affichées.
+"""
+
+import time
+
+import pandas as pd
+import pytest
+
+from exports import FileExports
+from memoire import BudgetSession
+from resultats import COLONNES_SIREN, ResultSet
+from resultats_session import ResultatsSession, cle_requete
+
+
+def jeu(n: int = 50) -> ResultSet:
+    rs = ResultSet(COLONNES_SIREN)
+    for i in range(n):
+        siren = f"{i:09d}"
+        rs.ajouter(brut={"siren": siren, "historique": [siren * 8] * 20}, siren=siren, nom=f"Entreprise {i}", score=60)
+    return rs
+
+
+def exporter(file: FileExports, df: pd.DataFrame) -> str:
+    cle = file.soumettre(df)
+    debut = time.monotonic()
+    while file.resultat(cle) is None:
+        assert time.monotonic() - debut < 30, file.travail(cle).erreur
+        time.sleep(0.01)
+    return cle
+
+
+@pytest.fixture
+def magasin():
+    magasin = ResultatsSession()
+    magasin.enregistrer(cle_requete("siren", q="ancienne"), jeu())
+    magasin.enregistrer(cle_requete("siren", q="affichee"), jeu())
+    return magasin
+
+
+@pytest.fixture
+def file():
+    file = FileExports(workers=1)
+    yield file
+    file.executeur.shutdown(wait=True)
+
+
+def test_donnees_brutes_d_abord(magasin):
+    budget = BudgetSession(magasin)
+    budget.budget = budget.utilisation()["octets"] - 1
+
+    assert budget.appliquer() > 0
+    assert budget.evictions == {"bruts": 1, "exports": 0, "recherches": 0}
+    assert len(magasin) == 2
+    assert [e["bruts"] for e in magasin.empreintes()] == [False, True]
+
+
+def test_export_retenu_par_une_autre_session_n_est_pas_libere(magasin, file):
+    cle = exporter(file, jeu().to_dataframe())
+    budget, autre = BudgetSession(magasin, file), BudgetSession(ResultatsSession(), file)
+    budget.noter_export(cle)
+    autre.noter_export(cle)
+    # Au-delà de ce que libèrent les données brutes : l'export ne libère rien, la recherche ancienne part
+    budget.budget = sum(e["octets"] for e in magasin.empreintes()) // 2
+
+    budget.appliquer()
+
+    assert file.resultat(cle) is not None
+    assert budget.evictions["exports"] == 0
+    assert budget.evictions["recherches"] == 1
+    assert budget.utilisation()["exports"] == 0
+
+
+def test_export_de_la_seule_session_retire_du_cache(magasin, file):
+    cle = exporter(file, jeu().to_dataframe())
+    budget = BudgetSession(magasin, file)
+    budget.noter_export(cle)
+    taille = file.taille(cle)
+    budget.budget = budget.utilisation()["octets"] - magasin.empreintes()[0]["octets"] - 1
+
+    liberes = budget.appliquer()
+
+    assert file.resultat(cle) is None
+    assert budget.evictions["exports"] == 1
+    assert liberes >= taille
+
+
+def test_recherche_affichee_jamais_evincee(magasin):
+    budget = BudgetSession(magasin, budget=0)
+
+    budget.appliquer()
+
+    assert budget.evictions["recherches"] == 1
+    assert [e["affichee"] for e in magasin.empreintes()] == [True]
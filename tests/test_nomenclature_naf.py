@@ -0,0 +1,50 @@
+"""
+Nomenclature NAF locale : normalisation, validation avec suggestions, jokers.
+"""
+
+import pytest
+
+from nomenclature_naf import CodeNafInvalide, developper, motifs_couvrants, normaliser_code, valider
+
+
+@pytest.mark.parametrize("saisie, code", [
+    ("6201Z", "62.01Z"),
+    (" 62.01z ", "62.01Z"),
+    ("620", "62.0"),
+    ("section j", "J"),
+])
+def test_normaliser_code(saisie, code):
+    assert normaliser_code(saisie) == code
+
+
+def test_valider_code_inconnu_avec_suggestions():
+    assert valider("6201z") == "62.01Z"
+    with pytest.raises(CodeNafInvalide) as e:
+        valider("62.99Z")
+    assert "62.09Z" in e.value.suggestions
+    assert "62.09Z" in str(e.value)
+
+
+def test_developper_postes_et_jokers():
+    assert developper("62.01Z") == ["62.01Z"]
+    assert developper("62") == ["62.01Z", "62.02A", "62.02B", "62.03Z", "62.09Z"]
+    assert developper("62*") == developper("62")
+    assert developper("62.0?") == developper("62")
+    assert all(code.startswith("47.1") for code in developper("47.1*"))
+    assert len(developper("J")) > len(developper("62"))
+
+
+@pytest.mark.parametrize("saisie", ["*", "?", ".*", "*.?", "**"])
+def test_joker_seul_refuse(saisie):
+    with pytest.raises(CodeNafInvalide, match="trop large"):
+        developper(saisie)
+
+
+def test_motif_sans_correspondance():
+    with pytest.raises(CodeNafInvalide):
+        developper("99.9*")
+
+
+def test_motifs_couvrants():
+    assert motifs_couvrants(developper("62")) == ["62*"]
+    assert motifs_couvrants(["62.01Z", "62.02A"]) == ["62.01Z", "62.02A"]
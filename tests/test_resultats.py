@@ -0,0 +1,74 @@
+"""
+Jeu de résultats colonnaire : DataFrame, Arrow et données brutes.
+"""
+
+import pandas as pd
+import pytest
+
+from resultats import COLONNES_SIREN, LIBELLES_STATUT, ResultSet
+
+
+LIGNES = [
+    {"siren": "552032534", "nom": "DANONE", "naf": "70.10Z", "catjur": "5599", "tranche_effectif": "53", "nb_etab": 12, "score": 88},
+    {"siren": "443061841", "nom": "GOOGLE FRANCE", "naf": "62.01Z", "catjur": "5710", "tranche_effectif": None, "nb_etab": None, "score": 55},
+    {"siren": "100000001", "nom": None, "naf": "70.10Z", "catjur": "", "tranche_effectif": "00", "nb_etab": 0, "score": 120},
+]
+
+
+def valeurs(df: pd.DataFrame) -> pd.DataFrame:
+    """Valeurs Python, manquantes à None, quel que soit le dtype"""
+    return df.astype(object).where(df.notna(), None)
+
+
+@pytest.fixture
+def rs():
+    rs = ResultSet(COLONNES_SIREN)
+    for ligne in LIGNES:
+        rs.ajouter(brut={"siren": ligne["siren"], "periodes": [ligne["naf"]] * 3}, **ligne)
+    return rs
+
+
+def test_to_dataframe(rs):
+    df = rs.to_dataframe()
+
+    assert list(df.columns) == list(COLONNES_SIREN.values())
+    assert df["SIREN"].tolist() == ["552032534", "443061841", "100000001"]
+    assert df["Code NAF"].dtype == "category"
+    assert df["Code NAF"].tolist() == ["70.10Z", "62.01Z", "70.10Z"]
+    assert df["Catégorie juridique"].isna().tolist() == [False, False, True]
+    assert df["Établissements ouverts"].tolist() == [12, pd.NA, 0]
+    assert df["Score Santé IA"].tolist() == [88, 55, 100]
+    assert df["Statut"].tolist() == [LIBELLES_STATUT[0], LIBELLES_STATUT[2], LIBELLES_STATUT[0]]
+    assert [rs.ligne(i) for i in range(len(rs))] == valeurs(df).to_dict("records")
+
+
+def test_to_arrow(rs):
+    pa = pytest.importorskip("pyarrow")
+    table = rs.to_arrow()
+
+    assert table.column_names == list(COLONNES_SIREN.values())
+    assert pa.types.is_dictionary(table.schema.field("Code NAF").type)
+    assert table.column("Établissements ouverts").to_pylist() == [12, None, 0]
+    assert table.column("Tranche effectif salarié").to_pylist() == ["53", None, "00"]
+    pd.testing.assert_frame_equal(valeurs(table.to_pandas()), valeurs(rs.to_dataframe()))
+
+
+def test_liberer_bruts(rs):
+    assert rs.brut(1) == {"siren": "443061841", "periodes": ["62.01Z"] * 3}
+    taille = rs.nbytes
+    liberes = rs.liberer_bruts()
+
+    assert liberes > 0
+    assert rs.nbytes == taille - liberes
+    assert rs.nbytes_bruts == 0
+    assert rs.brut(1) is None
+    assert rs.liberer_bruts() == 0
+    # Colonnes intactes
+    assert rs.to_dataframe()["SIREN"].tolist() == ["552032534", "443061841", "100000001"]
+
+
+def test_nbytes_compte_les_chaines(rs):
+    vide = ResultSet(COLONNES_SIREN)
+    vide.ajouter(siren=None, nom=None, score=0)
+    rs.liberer_bruts()
+    assert rs.nbytes > vide.nbytes + len("GOOGLE FRANCE")
@@ -0,0 +1,42 @@
+"""
+Rescoring d'un portefeuille : Bareme() redonne calculer_scores_vectorises.
+"""
+
+import numpy as np
+
+from ia_model import EFFECTIF_SCORES, SECTEUR_RISQUES, calculer_scores_vectorises
+from simulation import Bareme, Portefeuille
+
+
+def entrees_aleatoires(n: int = 5000, graine: int = 0):
+    rng = np.random.default_rng(graine)
+    tranches = np.array(list(EFFECTIF_SCORES) + ["NN", "", None, np.nan], dtype=object)
+    nafs = np.array([f"{d}.01Z" for d in SECTEUR_RISQUES] + ["99.00Z", "", None], dtype=object)
+    return (
+        tranches[rng.integers(len(tranches), size=n)],
+        np.where(rng.random(n) < 0.1, np.nan, rng.integers(0, 40, size=n)),
+        nafs[rng.integers(len(nafs), size=n)],
+    )
+
+
+def test_bareme_actuel_redonne_calculer_scores_vectorises():
+    tranches, nb_etab, nafs = entrees_aleatoires()
+    portefeuille = Portefeuille.depuis_colonnes(tranches, nb_etab, nafs)
+    np.testing.assert_array_equal(
+        portefeuille.scorer(Bareme()),
+        calculer_scores_vectorises(tranches, nb_etab, nafs),
+    )
+
+
+def test_tranche_manquante_vaut_effectif_defaut():
+    portefeuille = Portefeuille.depuis_colonnes([None, "00"], [0, 0], ["", ""])
+    scores = portefeuille.scorer(Bareme(effectif_defaut=7))
+    assert scores.tolist() == [57, 50 + EFFECTIF_SCORES["00"]]
+
+
+def test_enregistrer_charger(tmp_path):
+    tranches, nb_etab, nafs = entrees_aleatoires(200)
+    portefeuille = Portefeuille.depuis_colonnes(tranches, nb_etab, nafs)
+    chemin = tmp_path / "portefeuille.npz"
+    portefeuille.enregistrer(chemin)
+    np.testing.assert_array_equal(Portefeuille.charger(chemin).scorer(Bareme()), portefeuille.scorer(Bareme()))
@@ -0,0 +1,44 @@
+"""
+Suggestions de noms : bornes de préfixe, noms vus, élagage.
+"""
+
+from suggestions import IndexSuggestions, POIDS_VU
+
+
+def index(nb_vus_max: int = 100) -> IndexSuggestions:
+    return IndexSuggestions([
+        ("Capgemini", "330703844", 5.0),
+        ("Cap Vert", "100000001", 1.0),
+        ("Carrefour", "652014051", 9.0),
+        ("Société Générale", "552120222", 8.0),
+    ], k=3, nb_vus_max=nb_vus_max)
+
+
+def test_prefixe_sans_deborder():
+    assert [s["nom"] for s in index().suggerer("cap")] == ["Capgemini", "Cap Vert"]
+    assert [s["nom"] for s in index().suggerer("CAPG")] == ["Capgemini"]
+    assert [s["nom"] for s in index().suggerer("societe gen")] == ["Société Générale"]
+    assert index().suggerer("zz") == []
+
+
+def test_noms_vus_fusionnes_et_renommes():
+    idx = index()
+    idx.ajouter_vus([("Cap Vert", "100000001"), ("Capitole", "200000002")])
+    suggestions = {s["siren"]: s["poids"] for s in idx.suggerer("cap")}
+    assert suggestions["100000001"] == 1.0 + POIDS_VU
+    assert suggestions["200000002"] == POIDS_VU
+
+    # Même SIREN sous un autre nom : l'ancienne clé disparaît
+    idx.ajouter_vus([("Zénith", "200000002")])
+    assert "200000002" not in {s["siren"] for s in idx.suggerer("capi")}
+    assert [s["siren"] for s in idx.suggerer("zen")] == ["200000002"]
+
+
+def test_elagage_garde_les_plus_vus():
+    idx = index(nb_vus_max=10)
+    idx.ajouter_vus([(f"Vu {i}", f"{i:09d}") for i in range(10)])
+    idx.ajouter_vus([("Vu 3", "000000003")] * 3)
+    idx.ajouter_vus([("Nouveau", "999999999")])
+    assert len(idx.vus) == 9
+    assert "000000003" in idx.vus
+    assert idx.cles_vus == sorted(idx.cles_vus)
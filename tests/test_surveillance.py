@@ -0,0 +1,41 @@
+"""
+Watchlist : un enrichissement data.gouv manquant conserve l'état précédent.
+"""
+
+import pytest
+
+import base_locale
+import surveillance
+
+
+UNITE_LEGALE = {"uniteLegale": {"siren": "552032534", "periodesUniteLegale": [
+    {"denominationUniteLegale": "DANONE", "activitePrincipaleUniteLegale": "70.10Z"},
+]}}
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(surveillance, "get_unite_legale_by_siren", lambda siren: UNITE_LEGALE)
+    conn = base_locale.connecter(str(tmp_path / "sbd.sqlite3"))
+    base_locale.ajouter_watchlist(conn, ["552032534"])
+    yield conn
+    conn.close()
+
+
+def etat(conn):
+    return dict(conn.execute("SELECT tranche_effectif, nb_etab, score FROM watchlist_etat").fetchone())
+
+
+def test_enrichissement_indisponible_conserve_l_etat(conn, monkeypatch):
+    monkeypatch.setattr(surveillance, "enrichir_par_datagouv", lambda siren: {
+        "tranche_effectif_salarie": "53", "nombre_etablissements_ouverts": 12,
+    })
+    assert surveillance.rafraichir_watchlist(conn)["rafraichis"] == 1
+    avant = etat(conn)
+
+    monkeypatch.setattr(surveillance, "enrichir_par_datagouv", lambda siren: None)
+    bilan = surveillance.rafraichir_watchlist(conn)
+
+    assert bilan == {"rafraichis": 0, "changements": 0, "erreurs": 1}
+    assert etat(conn) == avant
+    assert conn.execute("SELECT COUNT(*) FROM watchlist_diffs").fetchone()[0] == 0
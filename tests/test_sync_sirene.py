@@ -0,0 +1,75 @@
+"""
+Amorçage de la base locale depuis les stocks, avant toute synchronisation incrémentale.
+"""
+
+import pandas as pd
+import pytest
+
+import api_sirene
+import base_locale
+import sync_sirene
+
+
+@pytest.fixture
+def stocks(tmp_path):
+    ul = pd.DataFrame({
+        "siren": ["552032534", "443061841"],
+        "denominationUniteLegale": ["DANONE", None],
+        "nomUniteLegale": [None, "DUPONT"],
+        "prenom1UniteLegale": [None, "JEAN"],
+        "etatAdministratifUniteLegale": ["A", "A"],
+        "categorieJuridiqueUniteLegale": ["5599", "1000"],
+        "activitePrincipaleUniteLegale": ["70.10Z", "62.01Z"],
+        "trancheEffectifsUniteLegale": ["53", None],
+        "dateDernierTraitementUniteLegale": ["2024-03-01T10:00:00.000", "2024-05-02T08:00:00.000"],
+    })
+    etab = pd.DataFrame({
+        "siret": ["55203253400646", "55203253400778", "55203253400000", "44306184100047"],
+        "siren": ["552032534", "552032534", "552032534", "443061841"],
+        "activitePrincipaleEtablissement": ["70.10Z"] * 4,
+        "etatAdministratifEtablissement": ["A", "A", "F", "A"],
+        "dateDernierTraitementEtablissement": ["2024-01-01T00:00:00.000", None, "2024-06-01T00:00:00.000", None],
+    })
+    ul.to_csv(tmp_path / "ul.csv", index=False)
+    etab.to_csv(tmp_path / "etab.csv", index=False)
+    return str(tmp_path / "ul.csv"), str(tmp_path / "etab.csv")
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = base_locale.connecter(str(tmp_path / "sbd.sqlite3"))
+    yield conn
+    conn.close()
+
+
+def test_synchronisation_refusee_sans_amorcage(conn):
+    with pytest.raises(sync_sirene.BaseNonAmorcee):
+        sync_sirene.synchroniser(conn)
+
+
+def test_amorcage(conn, stocks):
+    bilan = sync_sirene.amorcer(conn, *stocks, taille_bloc=1)
+
+    assert bilan == {"unites_legales": 2, "etablissements": 4}
+    assert base_locale.etablissements_complets(conn)
+    assert base_locale.compter_etablissements_ouverts(conn, "552032534") == 2
+    assert base_locale.lire_unite_legale(conn, "443061841")["denomination"] == "JEAN DUPONT"
+    assert base_locale.lire_unite_legale(conn, "552032534")["score"] is not None
+    assert base_locale.lire_meta(conn, sync_sirene.WATERMARK_UL) == "2024-05-02T08:00:00.000"
+    assert base_locale.lire_meta(conn, sync_sirene.WATERMARK_ETAB) == "2024-06-01T00:00:00.000"
+
+
+def test_repli_ignore_une_base_partielle(conn, monkeypatch, tmp_path):
+    monkeypatch.setattr(base_locale, "SBD_DB_PATH", str(tmp_path / "sbd.sqlite3"))
+    base_locale.upsert_unites_legales(conn, [{
+        "siren": "552032534", "denomination": "DANONE", "naf": "70.10Z", "catjur": "5599",
+        "etat_administratif": "A", "tranche_effectif": "53", "date_dernier_traitement": None,
+    }])
+    conn.commit()
+    assert api_sirene.enrichissement_de_repli("552032534") is None
+
+    base_locale.ecrire_meta(conn, base_locale.ETABLISSEMENTS_COMPLETS, "1")
+    conn.commit()
+    assert api_sirene.enrichissement_de_repli("552032534") == {
+        "tranche_effectif_salarie": "53", "nombre_etablissements_ouverts": 0,
+    }